@@ -5,3 +5,7 @@ class CalendarsConfig(AppConfig):
     """Configuración del calendario."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calendars'
+
+    def ready(self):
+        """Registrar las señales que mantienen la versión de los calendarios."""
+        from calendars import signals  # noqa: F401
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendars', '0004_create_calendar_and_schedules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendar',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -41,6 +41,21 @@ class Calendar(models.Model):
         default=list,
         help_text="Lista de días cerrados"
     )
+    # Cambia al modificar el calendario o sus horarios (ver utils.calendar_index)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    def save(self, *args, **kwargs):
+        """Guardar el calendario aumentando su versión."""
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        # Se incrementa en la base de datos para no pisar los cambios de versión hechos por los horarios
+        self.version = models.F('version') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
 
     def __str__():
         """Devuelve una representación simple del calendario"""
@@ -0,0 +1,20 @@
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from calendars.models import Calendar
+from schedules.models import Schedule
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def update_calendar_version(sender, instance, raw=False, **kwargs):
+    """Aumentar la versión de los calendarios que usan un horario al modificarlo o eliminarlo."""
+    if raw:
+        return
+
+    Calendar.objects.filter(
+        Q(pk=instance.calendar_id)
+        | Q(normal_week_schedule=instance)
+        | Q(summer_week_schedule=instance)
+        | Q(winter_week_schedule=instance)
+    ).update(version=F('version') + 1)
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+from uuid import uuid4
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from cartcodes.models import CartCode
+from utils.cart_codes import redeem_cart_code, set_cart_code_counter
+
+
+def run_cart_code_benchmark(counter_shards, orders, workers, hold_ms):
+    """
+    Canjea un código temporal desde varios hilos a la vez y devuelve los pedidos por segundo.
+
+    Cada canje se hace dentro de una transacción que se mantiene abierta hold_ms milisegundos,
+    como el resto del pedido, así que la fila bloqueada por el canje espera ese tiempo.
+    """
+    cart_code = CartCode.objects.create(
+        code=f'benchmark-{uuid4()}', percent_discount=10, fixed_discount=0, available_uses=0,
+    )
+    set_cart_code_counter(cart_code, orders, counter_shards)
+
+    def place_order(_):
+        try:
+            with transaction.atomic():
+                redeem_cart_code(cart_code)
+                sleep(hold_ms / 1000)
+        finally:
+            connection.close()
+
+    try:
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(place_order, range(orders)))
+        return orders / (perf_counter() - start)
+    finally:
+        cart_code.delete()
+
+
+class Command(BaseCommand):
+    """Mide los canjes por segundo de un código de carrito con el contador en una fila o repartido."""
+    help = 'Compara los pedidos por segundo que canjean el mismo código con 1 y con N partes del contador de usos.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument('--shards', type=int, default=16, help='Partes del contador repartido.')
+        parser.add_argument('--orders', type=int, default=500, help='Pedidos que canjean el código.')
+        parser.add_argument('--workers', type=int, default=16, help='Pedidos simultáneos (hilos).')
+        parser.add_argument('--hold-ms', type=float, default=10, help='Duración del resto de la transacción del pedido.')
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        for counter_shards in (1, options['shards']):
+            throughput = run_cart_code_benchmark(counter_shards, options['orders'], options['workers'], options['hold_ms'])
+            self.stdout.write(f"{counter_shards} partes: {throughput:.0f} pedidos/s")
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartcodes', '0004_alter_cartcode_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartcode',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='CartCodeShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('available_uses', models.IntegerField(default=0)),
+                ('cart_code', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='cartcodes.cartcode')),
+            ],
+            options={
+                'unique_together': {('cart_code', 'index')},
+            },
+        ),
+    ]
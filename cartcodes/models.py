@@ -11,7 +11,33 @@ class CartCode(models.Model):
     fixed_discount = models.FloatField()
     available_uses = models.IntegerField()
     expiration_date = models.DateTimeField(null=True, blank=True)
+    # Filas entre las que se reparte el contador de usos (1 = los usos están en available_uses)
+    counter_shards = models.PositiveSmallIntegerField(default=1)
+
+    @property
+    def is_sharded(self):
+        """Indica si los usos del código están repartidos en varias CartCodeShard."""
+        return self.counter_shards > 1
 
     def __str__(self):
         """Return id, code, percent_discount, fixed_discount, available_uses, expiration_date"""
-        return f'{self.id}, {self.code}, {self.percent_discount}, {self.fixed_discount}, {self.available_uses}, {self.expiration_date}'
\ No newline at end of file
+        return f'{self.id}, {self.code}, {self.percent_discount}, {self.fixed_discount}, {self.available_uses}, {self.expiration_date}'
+
+class CartCodeShard(models.Model):
+    """
+    Parte del contador de usos de un CartCode con contador repartido (counter_shards > 1).
+
+    Cada canje descuenta un uso de una parte elegida al azar, así que los pedidos simultáneos
+    no esperan todos a la misma fila. Los usos disponibles del código son la suma de sus partes.
+    """
+    cart_code = models.ForeignKey(CartCode, on_delete=models.CASCADE, related_name='shards')
+    index = models.PositiveSmallIntegerField()
+    available_uses = models.IntegerField(default=0)
+
+    class Meta:
+        """Meta options."""
+        unique_together = ('cart_code', 'index')
+
+    def __str__(self):
+        """Devuelve la representación en string de la parte del contador."""
+        return f'{self.cart_code_id} [{self.index}]: {self.available_uses}'
@@ -2,6 +2,7 @@
 from rest_framework import serializers
 # Model
 from cartcodes.models import CartCode
+from utils.cart_codes import MAX_COUNTER_SHARDS, get_available_uses, set_cart_code_counter
 
 class CartCodeModelSerializer(serializers.ModelSerializer):
     """CartCode Model Serializer"""
@@ -28,7 +29,18 @@ class CartCodeSerializer(serializers.Serializer):
     fixed_discount = serializers.FloatField()
     available_uses = serializers.IntegerField()
     expiration_date = serializers.DateTimeField(required=False, allow_null=True)
+    counter_shards = serializers.IntegerField(min_value=1, max_value=MAX_COUNTER_SHARDS, required=False)
 
+    def to_representation(self, instance):
+        """
+        Devuelve el código con sus usos disponibles (la suma de sus partes si el contador está repartido).
+
+        Los códigos del listado vienen anotados con la suma (ver annotate_shard_uses), así que no hay una
+        consulta por código.
+        """
+        data = super().to_representation(instance)
+        data['available_uses'] = get_available_uses(instance)
+        return data
 
     def validate_code(self, value):
         """
@@ -49,12 +61,23 @@ class CartCodeSerializer(serializers.Serializer):
         instance.is_active = validated_data.get('is_active', instance.is_active)
         instance.percent_discount = validated_data.get('percent_discount', instance.percent_discount)
         instance.fixed_discount = validated_data.get('fixed_discount', instance.fixed_discount)
-        instance.available_uses = validated_data.get('available_uses', instance.available_uses)
         instance.expiration_date = validated_data.get('expiration_date', instance.expiration_date)
-        instance.save()
+        instance.save(update_fields=['code', 'is_active', 'percent_discount', 'fixed_discount', 'expiration_date'])
+
+        # Los usos se guardan aparte para repartirlos entre las partes del contador sin perder canjes;
+        # si solo cambia el reparto, set_cart_code_counter mantiene los usos que haya al bloquear el código
+        if 'available_uses' in validated_data or 'counter_shards' in validated_data:
+            set_cart_code_counter(
+                instance,
+                validated_data.get('available_uses'),
+                validated_data.get('counter_shards', instance.counter_shards),
+            )
         return instance
 
     def create(self, validated_data):
         """Crea un nuevo código de carrito."""
+        counter_shards = validated_data.pop('counter_shards', 1)
         cart_code = CartCode.objects.create(**validated_data)
+        if counter_shards > 1:
+            set_cart_code_counter(cart_code, cart_code.available_uses, counter_shards)
         return cart_code
\ No newline at end of file
@@ -1,10 +1,17 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.urls import reverse
 from users.models import User
 from cartcodes.models import CartCode
 from rest_framework.authtoken.models import Token
+from cartcodes.management.commands.benchmark_cart_code_shards import run_cart_code_benchmark
+from utils.cart_codes import CartCodeError, get_available_uses, redeem_cart_code, refund_cart_code, set_cart_code_counter
 
 class CartCodeTests(TestCase):
     """Test para el modelo CartCode"""
@@ -120,6 +127,34 @@ class CartCodeTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['code'], 'NEWCODE')
 
+    def test_list_sharded_cart_codes_query_count(self):
+        """Test para listar códigos repartidos con sus usos sin una consulta por código"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+
+        def create_sharded_codes(count):
+            for _ in range(count):
+                cart_code = CartCode.objects.create(
+                    code=f'SHARDED{CartCode.objects.count()}', percent_discount=10, fixed_discount=0, available_uses=1,
+                )
+                set_cart_code_counter(cart_code, 10, 4)
+
+        create_sharded_codes(2)
+        with CaptureQueriesContext(connection) as few_codes:
+            response = self.client.get('/cartcodes/')
+        self.assertEqual([code['available_uses'] for code in response.data['results']], [10, 10])
+
+        create_sharded_codes(3)
+        with CaptureQueriesContext(connection) as many_codes:
+            response = self.client.get('/cartcodes/')
+        self.assertEqual([code['available_uses'] for code in response.data['results']], [10] * 5)
+        self.assertEqual(len(few_codes.captured_queries), len(many_codes.captured_queries))
+
+        cart_code = CartCode.objects.first()
+        response = self.client.patch(f'/cartcodes/{cart_code.pk}/', {'available_uses': 7, 'counter_shards': 2}, format='json')
+        self.assertEqual(response.data['available_uses'], 7)
+        response = self.client.patch(f'/cartcodes/{cart_code.pk}/', {'counter_shards': 1}, format='json')
+        self.assertEqual(response.data['available_uses'], 7)
+
     def test_destroy_cart_code_as_admin(self):
         """Test para eliminar un código de carrito con un administrador"""
         cart_code = CartCode.objects.create(
@@ -272,3 +307,140 @@ class IncorrectCartCodeTests(TestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CartCodeRedemptionTests(TestCase):
+    """Test para canjear y devolver usos de un código de carrito"""
+    def setUp(self):
+        """Configuración inicial de los tests"""
+        self.cart_code = CartCode.objects.create(
+            code='FLASH', percent_discount=10, fixed_discount=0, available_uses=1,
+        )
+
+    def test_redeem_cart_code(self):
+        """Test para descontar un uso y rechazar el segundo canje"""
+        redeem_cart_code(self.cart_code)
+        self.cart_code.refresh_from_db()
+        self.assertEqual(self.cart_code.available_uses, 0)
+
+        with self.assertRaisesMessage(CartCodeError, "El código de carrito no tiene usos disponibles."):
+            redeem_cart_code(self.cart_code)
+        self.cart_code.refresh_from_db()
+        self.assertEqual(self.cart_code.available_uses, 0)
+
+    def test_redeem_inactive_cart_code(self):
+        """Test para rechazar un código desactivado"""
+        CartCode.objects.filter(pk=self.cart_code.pk).update(is_active=False)
+
+        with self.assertRaisesMessage(CartCodeError, "El código de carrito no está activo."):
+            redeem_cart_code(self.cart_code)
+
+    def test_redeem_expired_cart_code(self):
+        """Test para rechazar un código caducado"""
+        CartCode.objects.filter(pk=self.cart_code.pk).update(expiration_date=timezone.now() - timedelta(minutes=1))
+
+        with self.assertRaisesMessage(CartCodeError, "El código de carrito ha caducado."):
+            redeem_cart_code(self.cart_code)
+        self.cart_code.refresh_from_db()
+        self.assertEqual(self.cart_code.available_uses, 1)
+
+    def test_set_cart_code_counter(self):
+        """Test para repartir los usos de un código y volver a juntarlos"""
+        set_cart_code_counter(self.cart_code, 10, 4)
+
+        self.assertEqual(sorted(self.cart_code.shards.values_list('available_uses', flat=True)), [2, 2, 3, 3])
+        self.assertEqual(get_available_uses(self.cart_code), 10)
+
+        redeem_cart_code(self.cart_code)
+        self.assertEqual(get_available_uses(self.cart_code), 9)
+        refund_cart_code(self.cart_code)
+        self.assertEqual(get_available_uses(self.cart_code), 10)
+
+        set_cart_code_counter(self.cart_code, get_available_uses(self.cart_code), 1)
+        self.cart_code.refresh_from_db()
+        self.assertEqual(self.cart_code.available_uses, 10)
+        self.assertFalse(self.cart_code.shards.exists())
+
+    def test_set_cart_code_counter_keeps_uses(self):
+        """Test para cambiar el reparto sin perder los canjes hechos después de cargar el código"""
+        set_cart_code_counter(self.cart_code, 10, 4)
+        stale = CartCode.objects.get(pk=self.cart_code.pk)
+        redeem_cart_code(self.cart_code)
+
+        set_cart_code_counter(stale, counter_shards=2)
+        self.assertEqual(get_available_uses(stale), 9)
+        self.assertEqual(stale.shards.count(), 2)
+
+    def test_refund_cart_code_after_reshard(self):
+        """Test para devolver el uso con el reparto actual aunque el código se cargara con otro"""
+        sharded = CartCode.objects.get(pk=self.cart_code.pk)
+        set_cart_code_counter(sharded, 10, 4)
+        refund_cart_code(self.cart_code)
+        self.assertEqual(get_available_uses(sharded), 11)
+
+        set_cart_code_counter(self.cart_code, counter_shards=1)
+        refund_cart_code(sharded)
+        self.cart_code.refresh_from_db()
+        self.assertEqual(self.cart_code.available_uses, 12)
+
+    def test_redeem_sharded_cart_code_until_empty(self):
+        """Test para gastar todas las partes aunque el azar elija una vacía"""
+        set_cart_code_counter(self.cart_code, 3, 4)
+
+        for _ in range(3):
+            redeem_cart_code(self.cart_code)
+        with self.assertRaisesMessage(CartCodeError, "El código de carrito no tiene usos disponibles."):
+            redeem_cart_code(self.cart_code)
+
+    def test_refund_cart_code(self):
+        """Test para devolver un uso"""
+        redeem_cart_code(self.cart_code)
+        refund_cart_code(self.cart_code)
+        self.cart_code.refresh_from_db()
+        self.assertEqual(self.cart_code.available_uses, 1)
+
+
+class CartCodeConcurrencyTests(TransactionTestCase):
+    """Test para canjes simultáneos de un mismo código de carrito"""
+    REDEMPTIONS = 200
+    WORKERS = 20
+
+    def redeem(self, cart_code):
+        """Canjear el código desde un hilo (con su propia conexión) e indicar si se ha podido."""
+        try:
+            redeem_cart_code(cart_code)
+            return True
+        except CartCodeError:
+            return False
+        finally:
+            connection.close()
+
+    def test_parallel_redemptions(self):
+        """Test para que cientos de canjes a la vez no gasten más usos de los disponibles"""
+        cart_code = CartCode.objects.create(code='RACE', percent_discount=10, fixed_discount=0, available_uses=50)
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            results = list(executor.map(self.redeem, [cart_code] * self.REDEMPTIONS))
+
+        cart_code.refresh_from_db()
+        self.assertEqual(results.count(True), 50)
+        self.assertEqual(cart_code.available_uses, 0)
+
+    def test_parallel_sharded_redemptions(self):
+        """Test para que el contador repartido tampoco gaste más usos de los disponibles"""
+        cart_code = CartCode.objects.create(code='SHARDS', percent_discount=10, fixed_discount=0, available_uses=0)
+        set_cart_code_counter(cart_code, 50, 8)
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            results = list(executor.map(self.redeem, [cart_code] * self.REDEMPTIONS))
+
+        self.assertEqual(results.count(True), 50)
+        self.assertEqual(get_available_uses(cart_code), 0)
+        self.assertFalse(cart_code.shards.filter(available_uses__lt=0).exists())
+
+    def test_benchmark_cart_code_shards(self):
+        """Test para el benchmark de canjes simultáneos (no deja códigos creados)"""
+        throughput = run_cart_code_benchmark(4, 40, 4, 0)
+
+        self.assertGreater(throughput, 0)
+        self.assertFalse(CartCode.objects.exists())
@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated
 from users.permissions import (IsStandardUser, IsAdminUser)
 from cartcodes.serializers import CartCodeSerializer
 from cartcodes.models import CartCode
+from utils.cart_codes import annotate_shard_uses
 
 class CartCodeViewSet(mixins.CreateModelMixin,
                       mixins.RetrieveModelMixin,
@@ -12,7 +13,8 @@ class CartCodeViewSet(mixins.CreateModelMixin,
                       mixins.ListModelMixin,
                       viewsets.GenericViewSet):
     serializer_class = CartCodeSerializer
-    queryset = CartCode.objects.all()
+    # Los usos de los códigos repartidos se suman en la misma consulta (ver CartCodeSerializer.to_representation)
+    queryset = annotate_shard_uses(CartCode.objects.all())
     """ViewSet para CartCodes."""
 
     def get_permissions(self):
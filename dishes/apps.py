@@ -5,3 +5,7 @@ class DishesConfig(AppConfig):
     """Configuración de los platos."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dishes'
+
+    def ready(self):
+        """Registrar las señales que mantienen los ingredientes normalizados de los platos."""
+        from dishes import signals  # noqa: F401
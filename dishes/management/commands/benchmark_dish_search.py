@@ -0,0 +1,108 @@
+import random
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from dishes.models import Dish
+from restaurant_dish_link.models import RestaurantDishLink
+from restaurants.models import Restaurant
+from utils.dish_search import search_dishes
+
+# Palabras con las que se generan los platos y las búsquedas
+BENCHMARK_WORDS = (
+    'pollo', 'ternera', 'cerdo', 'salmón', 'atún', 'merluza', 'gambas', 'calamares', 'pulpo', 'arroz',
+    'pasta', 'patatas', 'tomate', 'cebolla', 'ajo', 'pimiento', 'champiñones', 'queso', 'jamón', 'chorizo',
+    'huevo', 'lentejas', 'garbanzos', 'espinacas', 'berenjena', 'calabacín', 'limón', 'naranja', 'chocolate', 'nata',
+    'parrilla', 'horno', 'frito', 'guisado', 'asado', 'plancha', 'salsa', 'crema', 'ensalada', 'sopa',
+)
+BENCHMARK_CATEGORIES = ('Carne', 'Pescado', 'Verdura', 'Postre', 'Bebida', 'Entrante')
+BENCHMARK_BATCH_SIZE = 5000
+
+
+def build_benchmark_dishes(count, rng):
+    """Genera en memoria (sin guardar) platos con nombres, descripciones e ingredientes aleatorios."""
+    for _ in range(count):
+        yield Dish(
+            name=' '.join(rng.sample(BENCHMARK_WORDS, 3)),
+            description=' '.join(rng.sample(BENCHMARK_WORDS, 8)),
+            price=rng.randint(100, 3000) / 100,
+            dish_type=Dish.DishType.MAIN_COURSE,
+            ingredients=rng.sample(BENCHMARK_WORDS, 5),
+            calories=rng.randint(50, 1200),
+            preparation_time=rng.randint(5, 60),
+            category=rng.choice(BENCHMARK_CATEGORIES),
+        )
+
+
+def add_typo(word, rng):
+    """Cambia una letra de una palabra para simular una errata."""
+    index = rng.randrange(len(word))
+    return word[:index] + rng.choice('aeiourst') + word[index + 1:]
+
+
+def percentile(timings, ratio):
+    """Devuelve el percentil ratio (de 0 a 1) de unos tiempos."""
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * ratio))]
+
+
+def run_dish_search_benchmark(count, searches, menu_ratio=0.01, seed=0):
+    """
+    Inserta count platos, mide searches búsquedas (con y sin erratas, la mitad en el menú de un restaurante)
+    y devuelve (p50, p95, máximo) en milisegundos. Los datos se crean en una transacción que se deshace al terminar.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        restaurant = Restaurant.objects.create(name='Benchmark')
+        dishes = build_benchmark_dishes(count, rng)
+        while True:
+            batch = Dish.objects.bulk_create([dish for _, dish in zip(range(BENCHMARK_BATCH_SIZE), dishes)])
+            if not batch:
+                break
+            RestaurantDishLink.objects.bulk_create([
+                RestaurantDishLink(restaurant=restaurant, dish=dish, stock=10)
+                for dish in batch if rng.random() < menu_ratio
+            ])
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT gin_clean_pending_list('dishes_search_vector_idx'::regclass)")
+            cursor.execute("SELECT gin_clean_pending_list('dishes_name_search_vector_idx'::regclass)")
+            cursor.execute("SELECT gin_clean_pending_list('dish_search_words_trgm_idx'::regclass)")
+            cursor.execute(f'ANALYZE {Dish._meta.db_table}')
+            cursor.execute(f'ANALYZE {RestaurantDishLink._meta.db_table}')
+
+        timings = []
+        for index in range(searches):
+            words = rng.sample(BENCHMARK_WORDS, rng.randint(1, 2))
+            if index % 3 == 0:
+                words[0] = add_typo(words[0], rng)
+            restaurant_id = restaurant.pk if index % 2 else None
+
+            start = perf_counter()
+            list(search_dishes(' '.join(words), restaurant_id))
+            timings.append((perf_counter() - start) * 1000)
+
+        transaction.set_rollback(True)
+
+    return percentile(timings, 0.5), percentile(timings, 0.95), max(timings)
+
+
+class Command(BaseCommand):
+    """Mide la latencia de la búsqueda de platos."""
+    help = 'Mide la latencia (p50, p95 y máxima) de la búsqueda de platos sobre platos generados, que se eliminan al terminar.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument('--dishes', type=int, default=1_000_000, help='Número de platos generados.')
+        parser.add_argument('--searches', type=int, default=500, help='Número de búsquedas a medir.')
+        parser.add_argument('--menu-ratio', type=float, default=0.01, help='Proporción de platos en el menú del restaurante.')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos generados.')
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        p50, p95, worst = run_dish_search_benchmark(
+            options['dishes'], options['searches'], options['menu_ratio'], options['seed']
+        )
+        self.stdout.write(
+            f"{options['dishes']} platos, {options['searches']} búsquedas: "
+            f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, máximo {worst:.2f} ms"
+        )
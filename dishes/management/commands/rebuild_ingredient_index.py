@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from utils.ingredients import rebuild_ingredient_index
+
+
+class Command(BaseCommand):
+    """Reconstruye los ingredientes normalizados de los platos."""
+    help = 'Reconstruye desde cero los ingredientes normalizados de los platos (Dish.ingredient_index) a partir de Dish.ingredients.'
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        links = rebuild_ingredient_index()
+        self.stdout.write(self.style.SUCCESS(f'Índice de ingredientes reconstruido: {links} enlaces plato-ingrediente.'))
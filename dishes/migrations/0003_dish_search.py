@@ -0,0 +1,117 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:35
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# Mantiene Dish.search_vector: nombre (peso A), categoría e ingredientes (B) y descripción (C), y
+# Dish.name_search_vector: solo el nombre
+SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION dishes_dish_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.name_search_vector := to_tsvector('spanish', coalesce(NEW.name, ''));
+    NEW.search_vector :=
+        setweight(to_tsvector('spanish', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('spanish', coalesce(NEW.category, '')), 'B')
+        || setweight(jsonb_to_tsvector('spanish', coalesce(NEW.ingredients, '[]'::jsonb), '["string"]'), 'B')
+        || setweight(to_tsvector('spanish', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER dishes_dish_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, category, ingredients, description ON dishes_dish
+    FOR EACH ROW EXECUTE PROCEDURE dishes_dish_search_vector_update();
+
+UPDATE dishes_dish SET name = name;
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER IF EXISTS dishes_dish_search_vector_trigger ON dishes_dish;
+DROP FUNCTION IF EXISTS dishes_dish_search_vector_update();
+"""
+
+# Palabras (sin raíces, en minúsculas) de los platos de new_dishes, como en Dish.search_vector
+DISH_WORDS = """
+SELECT DISTINCT word FROM new_dishes, unnest(tsvector_to_array(
+    to_tsvector('simple', coalesce(new_dishes.name, '') || ' ' || coalesce(new_dishes.category, '') || ' ' || coalesce(new_dishes.description, ''))
+    || jsonb_to_tsvector('simple', coalesce(new_dishes.ingredients, '[]'::jsonb), '["string"]')
+)) AS word
+WHERE length(word) > 2
+ORDER BY word
+"""
+
+# Mantiene el vocabulario de la búsqueda con una consulta por sentencia (también en bulk_create)
+SEARCH_WORDS_TRIGGER = f"""
+CREATE FUNCTION dishes_dish_search_words_update() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO dishes_dishsearchword (word)
+    {DISH_WORDS}
+    ON CONFLICT (word) DO NOTHING;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER dishes_dish_search_words_insert_trigger
+    AFTER INSERT ON dishes_dish REFERENCING NEW TABLE AS new_dishes
+    FOR EACH STATEMENT EXECUTE PROCEDURE dishes_dish_search_words_update();
+
+CREATE TRIGGER dishes_dish_search_words_update_trigger
+    AFTER UPDATE ON dishes_dish REFERENCING NEW TABLE AS new_dishes
+    FOR EACH STATEMENT EXECUTE PROCEDURE dishes_dish_search_words_update();
+
+WITH new_dishes AS (SELECT * FROM dishes_dish)
+INSERT INTO dishes_dishsearchword (word)
+{DISH_WORDS}
+ON CONFLICT (word) DO NOTHING;
+"""
+
+DROP_SEARCH_WORDS_TRIGGER = """
+DROP TRIGGER IF EXISTS dishes_dish_search_words_insert_trigger ON dishes_dish;
+DROP TRIGGER IF EXISTS dishes_dish_search_words_update_trigger ON dishes_dish;
+DROP FUNCTION IF EXISTS dishes_dish_search_words_update();
+"""
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0002_add_dishes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='dish',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='name_search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_TRIGGER, DROP_SEARCH_VECTOR_TRIGGER),
+        migrations.AddIndex(
+            model_name='dish',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='dishes_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_search_vector'], name='dishes_name_search_vector_idx'),
+        ),
+        migrations.CreateModel(
+            name='DishSearchWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.TextField(unique=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dishsearchword',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['word'], name='dish_search_words_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(SEARCH_WORDS_TRIGGER, DROP_SEARCH_WORDS_TRIGGER),
+    ]
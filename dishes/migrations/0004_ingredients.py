@@ -0,0 +1,94 @@
+# Generated by Django 3.2.4 on 2026-10-18 18:10
+
+import unicodedata
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# Alérgenos de los ingredientes de los platos de prueba (ver 0002_add_dishes.py)
+INGREDIENT_ALLERGENS = {
+    'aderezo cesar': ['huevos', 'lacteos', 'pescado'],
+    'bizcocho': ['gluten', 'huevos', 'lacteos'],
+    'brotes de soja': ['soja'],
+    'cacahuetes': ['cacahuetes'],
+    'camarones': ['crustaceos'],
+    'chocolate': ['lacteos'],
+    'crutones': ['gluten'],
+    'filete de salmon': ['pescado'],
+    'galleta': ['gluten'],
+    'harina': ['gluten'],
+    'huevo': ['huevos'],
+    'mantequilla': ['lacteos'],
+    'mascarpone': ['lacteos'],
+    'nata': ['lacteos'],
+    'nueces': ['frutos de cascara'],
+    'pan crujiente': ['gluten'],
+    'pasta fettuccine': ['gluten', 'huevos'],
+    'queso crema': ['lacteos'],
+    'queso parmesano': ['lacteos'],
+    'salmon fresco': ['pescado'],
+    'tofu': ['soja'],
+    'vino blanco': ['sulfitos'],
+}
+
+
+def get_ingredient_names(ingredients):
+    # Nombres normalizados de los ingredientes de un plato: minúsculas, sin tildes y con espacios simples
+    # (como en utils/ingredients.py)
+    if not isinstance(ingredients, list):
+        return set()
+    names = set()
+    for ingredient in ingredients:
+        if isinstance(ingredient, str):
+            text = unicodedata.normalize('NFKD', ingredient)
+            text = ''.join(char for char in text if not unicodedata.combining(char))
+            names.add(' '.join(text.lower().split())[:255])
+    names.discard('')
+    return names
+
+
+def build_ingredient_index(apps, schema_editor):
+    # Obtén los modelos de plato e ingrediente
+    Dish = apps.get_model('dishes', 'Dish')
+    Ingredient = apps.get_model('dishes', 'Ingredient')
+    through = Dish.ingredient_index.through
+
+    dish_names = {dish_id: get_ingredient_names(ingredients) for dish_id, ingredients in Dish.objects.values_list('pk', 'ingredients')}
+    names = set().union(*dish_names.values())
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, allergens=INGREDIENT_ALLERGENS.get(name, [])) for name in sorted(names)],
+        ignore_conflicts=True,
+    )
+    ingredient_ids = dict(Ingredient.objects.values_list('name', 'pk'))
+    through.objects.bulk_create([
+        through(dish_id=dish_id, ingredient_id=ingredient_ids[name])
+        for dish_id, names in dish_names.items() for name in names
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0003_dish_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('allergens', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['allergens'], name='ingredients_allergens_idx'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='ingredient_index',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='dishes', to='dishes.Ingredient'),
+        ),
+        migrations.RunPython(build_ingredient_index, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,32 @@ from django.db import models
 from ckeditor.fields import RichTextField
 from django.core.validators import MinValueValidator
 from django.db.models import JSONField
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from categories.models import Category
 
+class Ingredient(models.Model):
+    """
+    Ingrediente normalizado (en minúsculas y sin tildes, ver utils/ingredients.py) y sus alérgenos.
+
+    Con Dish.ingredient_index forma el índice invertido de Dish.ingredients: de cada ingrediente a
+    los platos que lo llevan.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    allergens = ArrayField(models.CharField(max_length=50), default=list, blank=True)
+
+    class Meta:
+        """Meta options."""
+        indexes = [
+            GinIndex(fields=['allergens'], name='ingredients_allergens_idx'),
+        ]
+
+    def __str__(self):
+        """Retorna name"""
+        return self.name
+
+
 class Dish(models.Model):
     """Modelo de platos."""
     class DishType(models.TextChoices):
@@ -26,6 +50,21 @@ class Dish(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Nombre, categoría, ingredientes y descripción para la búsqueda de texto completo. Lo calcula un
+    # trigger de la base de datos al insertar o modificar el plato (ver dishes/migrations/0003_dish_search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Solo el nombre, con su propio índice: el índice GIN de search_vector no guarda los pesos, así que no
+    # sirve para encontrar deprisa los platos cuyo nombre coincide con la búsqueda (ver utils/dish_search.py)
+    name_search_vector = SearchVectorField(null=True, editable=False)
+    # Ingredientes normalizados del plato: se mantienen al guardar el plato (ver dishes/signals.py)
+    ingredient_index = models.ManyToManyField(Ingredient, related_name='dishes', blank=True, editable=False)
+
+    class Meta:
+        """Meta options."""
+        indexes = [
+            GinIndex(fields=['search_vector'], name='dishes_search_vector_idx'),
+            GinIndex(fields=['name_search_vector'], name='dishes_name_search_vector_idx'),
+        ]
 
     def __str__(self):
         """Retorna name, description, price, dish_type, ingredients, calories, image, preparation_time, category"""
@@ -33,4 +72,23 @@ class Dish(models.Model):
 
     def save(self, *args, **kwargs):
         """Método para guardar."""
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class DishSearchWord(models.Model):
+    """
+    Palabra de los platos (nombre, categoría, ingredientes y descripción): el vocabulario con el que la
+    búsqueda corrige las erratas (ver utils/dish_search.py). La rellena un trigger de la base de datos
+    al insertar o modificar platos (ver dishes/migrations/0003_dish_search.py).
+    """
+    word = models.TextField(unique=True)
+
+    class Meta:
+        """Meta options."""
+        indexes = [
+            GinIndex(fields=['word'], name='dish_search_words_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    def __str__(self):
+        """Retorna word"""
+        return self.word
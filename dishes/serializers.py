@@ -26,6 +26,24 @@ class DishModelSerializer(serializers.ModelSerializer):
             'updated_at',
         )
 
+class MenuDishSerializer(DishModelSerializer):
+    """Plato del menú de un restaurante, indicando si queda stock (atributo in_stock del plato)."""
+    in_stock = serializers.BooleanField(read_only=True)
+
+    class Meta(DishModelSerializer.Meta):
+        """Meta class."""
+
+        fields = DishModelSerializer.Meta.fields + ('in_stock',)
+
+class DishSearchSerializer(DishModelSerializer):
+    """Plato encontrado en una búsqueda, con su relevancia (atributo rank del plato)."""
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(DishModelSerializer.Meta):
+        """Meta class."""
+
+        fields = DishModelSerializer.Meta.fields + ('rank',)
+
 class DishSerializer(serializers.Serializer):
     """Serializer para crear/actualizar platos"""
     name = serializers.CharField(max_length=255)
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_init, post_save, pre_save
+from django.dispatch import receiver
+from dishes.models import Dish, Ingredient
+from utils.ingredients import get_ingredient_names, normalize_ingredient, sync_dish_ingredients
+
+
+@receiver(pre_save, sender=Ingredient)
+def normalize_ingredient_fields(sender, instance, raw=False, **kwargs):
+    """Normalizar el nombre y los alérgenos del ingrediente, como los términos de los filtros del menú."""
+    instance.name = normalize_ingredient(instance.name)
+    instance.allergens = sorted({normalize_ingredient(allergen) for allergen in instance.allergens or []} - {''})
+
+
+@receiver(post_init, sender=Dish)
+def store_loaded_dish_ingredients(sender, instance, **kwargs):
+    """Recordar los ingredientes con los que se cargó el plato."""
+    instance._loaded_ingredient_names = get_ingredient_names(instance.__dict__.get('ingredients'))
+
+
+@receiver(post_save, sender=Dish)
+def update_dish_ingredient_index(sender, instance, created=False, raw=False, **kwargs):
+    """Actualizar los ingredientes normalizados del plato al crearlo o cambiar sus ingredientes."""
+    if raw:
+        return
+
+    names = get_ingredient_names(instance.ingredients)
+    if names != getattr(instance, '_loaded_ingredient_names', None) or (created and names):
+        sync_dish_ingredients(instance)
+    instance._loaded_ingredient_names = names
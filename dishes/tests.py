@@ -3,8 +3,10 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 from users.models import User
-from dishes.models import Dish
+from dishes.models import Dish, DishSearchWord, Ingredient
 from categories.models import Category
+from restaurants.models import Restaurant
+from restaurant_dish_link.models import RestaurantDishLink
 
 class DishTests(TestCase):
     """Test para platos."""
@@ -262,4 +264,114 @@ class IncorrectDishTests(TestCase):
 
         response = self.client.get('/dishes/999/')
 
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DishSearchTests(TestCase):
+    """Tests para la búsqueda de platos."""
+    def setUp(self):
+        """Configuración inicial"""
+        self.client = APIClient()
+        self.restaurant = Restaurant.objects.create(name='Test Restaurant')
+        self.quiche = Dish.objects.create(
+            name='Quiche lorraine', description='Tarta salada al horno', price=8.5, dish_type='MAIN_COURSE',
+            ingredients=['Beicon', 'Huevo', 'Nata'], calories=450, preparation_time=40, category='Entrante',
+        )
+        self.gazpacho = Dish.objects.create(
+            name='Gazpacho andaluz', description='Sopa fría de tomate', price=6, dish_type='APPETIZER',
+            ingredients=['Tomate', 'Pepino', 'Pimiento'], calories=120, preparation_time=15, category='Entrante',
+        )
+        RestaurantDishLink.objects.create(restaurant=self.restaurant, dish=self.gazpacho, stock=5)
+
+    def test_search_dishes_by_ingredient(self):
+        """Test para buscar platos por sus ingredientes"""
+        response = self.client.get('/dishes/search/', {'q': 'pepino'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([dish['pk'] for dish in response.data], [self.gazpacho.pk])
+        self.assertGreater(response.data[0]['rank'], 0)
+
+    def test_search_dishes_with_typo(self):
+        """Test para encontrar un plato aunque el nombre tenga erratas"""
+        response = self.client.get('/dishes/search/', {'q': 'quiche loraine'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['pk'], self.quiche.pk)
+
+    def test_search_dishes_in_restaurant(self):
+        """Test para buscar solo entre los platos del menú de un restaurante"""
+        response = self.client.get('/dishes/search/', {'q': 'entrante', 'restaurant': self.restaurant.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([dish['pk'] for dish in response.data], [self.gazpacho.pk])
+
+    def test_search_words_from_bulk_create(self):
+        """Test para añadir al vocabulario de la búsqueda las palabras de los platos creados en bloque"""
+        Dish.objects.bulk_create([Dish(
+            name='Pisto manchego', description='Verduras guisadas', price=7, dish_type='MAIN_COURSE',
+            ingredients=['Calabacín'], calories=200, preparation_time=30, category='Verdura',
+        )])
+
+        words = set(DishSearchWord.objects.values_list('word', flat=True))
+        self.assertTrue({'pisto', 'manchego', 'verduras', 'guisadas', 'calabacín', 'verdura'} <= words)
+
+        response = self.client.get('/dishes/search/', {'q': 'pisto manchgo'})
+        self.assertEqual(response.data[0]['name'], 'Pisto manchego')
+
+    def test_search_dishes_prefers_name_matches(self):
+        """Test para encontrar el plato cuyo nombre coincide aunque se haya creado después de muchos otros que coinciden"""
+        Dish.objects.bulk_create([Dish(
+            name=f'Guiso {index}', description='Guiso marinero con lamprea', price=12, dish_type='MAIN_COURSE',
+            ingredients=['Arroz'], calories=500, preparation_time=60, category='Pescado',
+        ) for index in range(150)])
+        lamprea = Dish.objects.create(
+            name='Lamprea a la bordelesa', description='Guiso tradicional', price=20, dish_type='MAIN_COURSE',
+            ingredients=['Vino tinto'], calories=600, preparation_time=90, category='Pescado',
+        )
+
+        response = self.client.get('/dishes/search/', {'q': 'lamprea'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['pk'], lamprea.pk)
+        self.assertEqual(response.data, self.client.get('/dishes/search/', {'q': 'lamprea'}).data)
+
+    def test_search_dishes_without_text(self):
+        """Test para rechazar una búsqueda sin texto"""
+        response = self.client.get('/dishes/search/')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class IngredientIndexTests(TestCase):
+    """Tests para los ingredientes normalizados de los platos."""
+    def setUp(self):
+        """Configuración inicial"""
+        self.dish = Dish.objects.create(
+            name='Tarta de queso', description='Tarta al horno', price=5, dish_type='DESSERT',
+            ingredients=['Queso crema', 'Huevo', 'Azúcar', ' azucar '], calories=400, preparation_time=60, category='Postre',
+        )
+
+    def get_index(self, dish):
+        """Devuelve los nombres de los ingredientes normalizados de un plato."""
+        return set(dish.ingredient_index.values_list('name', flat=True))
+
+    def test_create_dish_indexes_ingredients(self):
+        """Test para normalizar los ingredientes al crear un plato"""
+        self.assertSetEqual(self.get_index(self.dish), {'queso crema', 'huevo', 'azucar'})
+
+    def test_update_dish_ingredients(self):
+        """Test para actualizar los ingredientes normalizados al cambiar los del plato"""
+        dish = Dish.objects.get(pk=self.dish.pk)
+        dish.ingredients = ['Queso crema', 'Galleta']
+        dish.save()
+
+        self.assertSetEqual(self.get_index(dish), {'queso crema', 'galleta'})
+        self.assertTrue(Ingredient.objects.filter(name='huevo').exists())
+
+    def test_ingredient_allergens_are_normalized(self):
+        """Test para normalizar los alérgenos de un ingrediente"""
+        ingredient = Ingredient.objects.get(name='queso crema')
+        ingredient.allergens = ['Lácteos', 'lacteos', '']
+        ingredient.save()
+
+        ingredient.refresh_from_db()
+        self.assertListEqual(ingredient.allergens, ['lacteos'])
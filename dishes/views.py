@@ -2,9 +2,11 @@ from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from users.permissions import IsStandardUser, IsAdminUser
-from .serializers import DishModelSerializer, DishSerializer
+from .serializers import DishModelSerializer, DishSearchSerializer, DishSerializer
 from .models import Dish
 from rest_framework.views import APIView
+from rest_framework.decorators import action
+from utils.dish_search import DISH_SEARCH_MAX_LENGTH, DISH_SEARCH_MAX_RESULTS, search_dishes
 
 class DishViewSet(mixins.CreateModelMixin,
                   mixins.RetrieveModelMixin,
@@ -18,7 +20,9 @@ class DishViewSet(mixins.CreateModelMixin,
 
     def get_permissions(self):
         """Asigna permisos basados en la acción."""
-        if self.action in ['list', 'retrieve']:
+        if self.action == 'search':
+            permission_classes = []
+        elif self.action in ['list', 'retrieve']:
             permission_classes = [IsAuthenticated, IsStandardUser]
         else:
             permission_classes = [IsAuthenticated, IsAdminUser]
@@ -56,6 +60,28 @@ class DishViewSet(mixins.CreateModelMixin,
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """Buscar platos por texto (?q), con erratas, ordenados por relevancia y opcionalmente del menú de un restaurante (?restaurant)."""
+        text = request.query_params.get('q', '').strip()
+        if not text or len(text) > DISH_SEARCH_MAX_LENGTH:
+            return Response(
+                {"error": f"El texto de búsqueda (q) debe tener entre 1 y {DISH_SEARCH_MAX_LENGTH} caracteres."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            restaurant_id = request.query_params.get('restaurant')
+            restaurant_id = int(restaurant_id) if restaurant_id else None
+            limit = min(max(int(request.query_params.get('limit', DISH_SEARCH_MAX_RESULTS)), 1), DISH_SEARCH_MAX_RESULTS)
+        except ValueError:
+            return Response(
+                {"error": "Los parámetros 'restaurant' y 'limit' deben ser números enteros."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(DishSearchSerializer(search_dishes(text, restaurant_id, limit), many=True).data)
+
 class DishImageUpdateAPIView(APIView):
     """Vista para actualizar la imagen de un plato."""
     def patch(self, request, pk):
@@ -5,3 +5,7 @@ class OrdersConfig(AppConfig):
     """Configuración de pedidos."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        """Registrar las señales que mantienen los resúmenes diarios de pedidos."""
+        from orders import signals  # noqa: F401
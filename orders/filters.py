@@ -0,0 +1,18 @@
+import django_filters
+from .models import Order, OrderStatus
+
+
+class OrderFilter(django_filters.FilterSet):
+    """
+    Filtros del listado de pedidos: restaurante, estado y rango de fechas de creación.
+
+    Las combinaciones se apoyan en los índices (restaurante, estado, fecha) y (estado, fecha) de Order.
+    """
+    status = django_filters.ChoiceFilter(choices=OrderStatus.choices)
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+
+    class Meta:
+        """Clase Meta."""
+        model = Order
+        fields = ('restaurant', 'status', 'created_after', 'created_before')
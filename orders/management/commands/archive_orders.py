@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from utils.order_archive import ORDER_ARCHIVE_BATCH_SIZE, ORDER_ARCHIVE_MONTHS, archive_orders
+
+
+class Command(BaseCommand):
+    """Archiva los pedidos antiguos."""
+    help = 'Mueve en lotes a ArchivedOrder los pedidos finalizados o cancelados de hace más de N meses, con sus líneas y reservas.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument('--months', type=int, default=ORDER_ARCHIVE_MONTHS, help='Antigüedad en meses de los pedidos que se archivan.')
+        parser.add_argument('--batch-size', type=int, default=ORDER_ARCHIVE_BATCH_SIZE, help='Pedidos archivados por transacción.')
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        archived = archive_orders(options['months'], options['batch_size'])
+        self.stdout.write(f"Pedidos archivados: {archived}")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from utils.idempotency import IDEMPOTENCY_CLEANUP_BATCH_SIZE, delete_expired_idempotency_keys
+
+
+class Command(BaseCommand):
+    """Elimina las claves de idempotencia caducadas."""
+    help = 'Elimina en lotes las claves Idempotency-Key de pedidos cuyo tiempo de reintento ha caducado.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument('--batch-size', type=int, default=IDEMPOTENCY_CLEANUP_BATCH_SIZE, help='Claves eliminadas por consulta.')
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        deleted = delete_expired_idempotency_keys(options['batch_size'])
+        self.stdout.write(f"Claves de idempotencia caducadas eliminadas: {deleted}")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from utils.order_rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    """Reconstruye y verifica los resúmenes diarios de pedidos."""
+    help = 'Reconstruye desde cero los resúmenes diarios de pedidos (OrderDailyRollup) a partir de los pedidos activos y archivados y los verifica.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Solo verificar los resúmenes, sin reconstruirlos.',
+        )
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        if not options['verify_only']:
+            rows = rebuild_rollups()
+            self.stdout.write(f'Resúmenes reconstruidos: {rows} filas.')
+
+        differences = verify_rollups()
+        for (restaurant_id, day, status), expected, stored in differences[:20]:
+            self.stderr.write(f'Restaurante {restaurant_id}, {day}, {status}: esperado {expected}, guardado {stored}')
+
+        if differences:
+            raise CommandError(f'Los resúmenes no coinciden con los pedidos ({len(differences)} diferencias).')
+
+        self.stdout.write(self.style.SUCCESS('Los resúmenes coinciden con los pedidos.'))
@@ -0,0 +1,41 @@
+from multiprocessing import Process
+from django.core.management.base import BaseCommand
+from django.db import connections
+from utils.order_intake import INTAKE_BATCH_SIZE, run_intake_worker
+
+
+class Command(BaseCommand):
+    """Procesa la cola de pedidos asíncronos con varios procesos."""
+    help = 'Arranca un grupo de procesos que crean los pedidos encolados con /users/order/?async=1.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument('--workers', type=int, default=4, help='Número de procesos.')
+        parser.add_argument('--batch-size', type=int, default=INTAKE_BATCH_SIZE, help='Pedidos que reserva cada proceso de cada vez.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Segundos de espera cuando la cola está vacía.')
+        parser.add_argument('--once', action='store_true', help='Terminar cuando la cola se quede vacía.')
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        kwargs = {
+            'batch_size': options['batch_size'],
+            'poll_interval': options['poll_interval'],
+            'once': options['once'],
+        }
+        if options['workers'] <= 1:
+            processed = run_intake_worker(**kwargs)
+            self.stdout.write(f"Pedidos procesados: {processed}")
+            return
+
+        # Cada proceso abre su propia conexión a la base de datos
+        connections.close_all()
+        workers = [Process(target=run_intake_worker, kwargs=kwargs) for _ in range(options['workers'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+        self.stdout.write(f"Workers terminados: {len(workers)}")
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:15
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0002_add_restaurants'),
+        ('orders', '0007_archivedorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('confirmed', 'Confirmada'), ('cancelled', 'Cancelada'), ('completed', 'Completada')], max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('dishes', models.IntegerField(default=0)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rollups', to='restaurants.restaurant')),
+            ],
+            options={
+                'unique_together': {('restaurant', 'day', 'status')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderdailyrollup',
+            index=models.Index(fields=['day'], name='orders_rollup_day_idx'),
+        ),
+    ]
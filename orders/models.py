@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from restaurants.models import Restaurant
 from users.models import User
 from cartcodes.models import CartCode
@@ -18,6 +19,8 @@ class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     total = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)], default=0)
     total_dishes = models.PositiveIntegerField(validators=[MinValueValidator(0)], default=0)
+    # Descuento aplicado por el código de carrito (ya restado de total)
+    discount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)], default=0)
     is_deleted = models.BooleanField(default=False)
     status = models.CharField(
         max_length=20,
@@ -29,7 +32,144 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     finished_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        """Meta options."""
+        indexes = [
+            models.Index(fields=['restaurant', 'status', 'created_at'], name='orders_restaurant_status_idx'),
+            models.Index(fields=['status', 'created_at'], name='orders_status_created_idx'),
+            models.Index(fields=['created_at'], name='orders_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='orders_user_created_idx'),
+        ]
+
     def __str__(self):
         """Devuelve la representación en string del pedido."""
         return f"Order {self.pk} - {self.status}"
 
+
+
+class IdempotencyKey(models.Model):
+    """
+    Clave de idempotencia (cabecera Idempotency-Key) de una petición que crea un pedido.
+
+    Guarda la huella de la petición y su respuesta para devolverla sin repetir el pedido si el cliente
+    reintenta con la misma clave antes de expires_at.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        """Meta options."""
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        """Devuelve la representación en string de la clave de idempotencia."""
+        return f"{self.key} ({self.user_id})"
+
+
+class OrderIntakeStatus(models.TextChoices):
+    """Estados de un pedido en la cola de entrada."""
+    PENDING = 'pending', 'Pendiente'
+    PROCESSING = 'processing', 'Procesando'
+    DONE = 'done', 'Creado'
+    FAILED = 'failed', 'Fallido'
+
+
+class OrderIntake(models.Model):
+    """
+    Petición de pedido encolada para crearse en segundo plano (modo asíncrono de /users/order/).
+
+    Los workers (comando run_order_workers) la procesan con el mismo código que el modo síncrono
+    y guardan aquí el código de estado y la respuesta que habría devuelto la petición.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_intakes')
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(
+        max_length=20,
+        choices=OrderIntakeStatus.choices,
+        default=OrderIntakeStatus.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name='intakes')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """Meta options."""
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='orders_intake_status_idx'),
+            models.Index(fields=['finished_at'], name='orders_intake_finished_idx'),
+        ]
+
+    def __str__(self):
+        """Devuelve la representación en string del pedido encolado."""
+        return f"OrderIntake {self.pk} - {self.status}"
+
+
+
+class ArchivedOrder(models.Model):
+    """
+    Pedido finalizado o cancelado que se ha movido fuera de las tablas de pedidos, líneas y reservas
+    (ver utils/order_archive.py) para que no crezcan indefinidamente.
+
+    Conserva el id del pedido y guarda en data su representación completa (OrderSerializer, con
+    sus líneas y reservas) tal y como estaba al archivarse.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='archived_orders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_dishes = models.PositiveIntegerField(default=0)
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        """Meta options."""
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='orders_archived_user_idx'),
+            models.Index(fields=['restaurant', 'created_at'], name='orders_archived_rest_idx'),
+        ]
+
+    def __str__(self):
+        """Devuelve la representación en string del pedido archivado."""
+        return f"ArchivedOrder {self.pk} - {self.status}"
+
+
+class OrderDailyRollup(models.Model):
+    """
+    Resumen materializado de los pedidos por restaurante, día de creación y estado: número de pedidos,
+    ingresos, platos y descuentos de códigos de carrito.
+
+    Se mantiene al crear, modificar o eliminar un Order (ver orders/signals.py) e incluye los pedidos
+    archivados. Se puede reconstruir y verificar con el comando rebuild_order_rollups.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='order_rollups')
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    dishes = models.IntegerField(default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        """Meta options."""
+        unique_together = ('restaurant', 'day', 'status')
+        indexes = [
+            models.Index(fields=['day'], name='orders_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        """Devuelve la representación en string del resumen."""
+        return f"Restaurante {self.restaurant_id} el {self.day} ({self.status}): {self.orders} pedidos, {self.revenue}"
@@ -5,8 +5,10 @@ from users.models import User
 from cartcodes.models import CartCode
 from order_lines.serializers import OrderLineSerializer
 from reserves.serializers import ReserveSerializer
-from reserves.models import Reserve
+from reserves.models import Reserve, RESERVE_OVERLAP_MESSAGE, is_reserve_overlap_error
 from datetime import timedelta
+from django.db import IntegrityError, transaction
+from rest_framework.settings import api_settings
 
 class OrderSerializer(serializers.ModelSerializer):
     """Serializer para el modelo Order."""
@@ -26,6 +28,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'user_name',
             'total',
             'total_dishes',
+            'discount',
             'is_deleted',
             'status',
             'cart_code',
@@ -36,7 +39,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'finished_at',
         )
 
-        read_only_fields = ('total', 'total_dishes')
+        read_only_fields = ('total', 'total_dishes', 'discount')
 
     def validate_status(self, value):
         """Validar que el estado sea uno de los valores permitidos."""
@@ -77,5 +80,12 @@ class OrderSerializer(serializers.ModelSerializer):
         instance.status = validated_data.get("status", instance.status)
         instance.cart_code = validated_data.get("cart_code", instance.cart_code)
 
-        instance.save()
+        # Reactivar un pedido cancelado puede chocar con reservas creadas mientras estaba cancelado
+        try:
+            with transaction.atomic():
+                instance.save()
+        except IntegrityError as error:
+            if not is_reserve_overlap_error(error):
+                raise
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [RESERVE_OVERLAP_MESSAGE]})
         return instance
\ No newline at end of file
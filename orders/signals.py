@@ -0,0 +1,21 @@
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from orders.models import Order
+from utils.order_rollups import apply_order_rollup_change, get_order_rollup
+
+
+@receiver(post_init, sender=Order)
+def store_loaded_order_rollup(sender, instance, **kwargs):
+    """Recordar lo que sumaba el pedido a los resúmenes diarios cuando se cargó."""
+    instance._loaded_rollup = get_order_rollup(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_order_rollup(sender, instance, raw=False, **kwargs):
+    """Actualizar los resúmenes diarios al crear un pedido o cambiar su estado, total, platos o descuento."""
+    if raw:
+        return
+
+    current = get_order_rollup(instance)
+    apply_order_rollup_change(getattr(instance, '_loaded_rollup', None), current)
+    instance._loaded_rollup = current
@@ -1,13 +1,30 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from unittest import mock
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 from users.models import User
 from restaurants.models import Restaurant
 from dishes.models import Dish
-from orders.models import Order, OrderStatus
+from orders.models import Order, OrderDailyRollup, OrderStatus, OrderIntake, OrderIntakeStatus
+from django.utils import timezone
+from datetime import timedelta
 from cartcodes.models import CartCode
 from decimal import Decimal
+from tables.models import Table
+from order_lines.models import OrderLine
+from reserves.models import Reserve
+from utils.order_archive import archive_orders
+from utils.order_rollups import rebuild_rollups, verify_rollups
+from utils.kitchen_feed import KitchenFeedBroker, ORDER_CREATED, ORDER_FINISHED, get_feed_token_user_id, get_kitchen_event, kitchen_feed_app
 
 class OrderTests(TestCase):
     """Tests para el modelo Order."""
@@ -69,6 +86,290 @@ class OrderTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_intake_metrics_as_admin(self):
+        """Test para obtener las métricas de la cola de pedidos asíncronos"""
+        now = timezone.now()
+        OrderIntake.objects.create(user=self.admin_user, payload={})
+        done = OrderIntake.objects.create(user=self.admin_user, payload={}, status=OrderIntakeStatus.DONE, finished_at=now)
+        OrderIntake.objects.filter(pk=done.pk).update(created_at=now - timedelta(seconds=5))
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        response = self.client.get('/orders/intake-metrics/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['depth'], 1)
+        self.assertEqual(response.data['processing'], 0)
+        self.assertEqual(response.data['processed_last_minute'], 1)
+        self.assertGreaterEqual(response.data['lag_seconds'], 0)
+
+    def test_finish_order_publishes_kitchen_event(self):
+        """Test para comprobar que finalizar un pedido avisa a las pantallas de la cocina"""
+        order = self.create_orders(1)[0]
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/orders/{order.pk}/finish/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        notify = [query['sql'] for query in queries if 'pg_notify' in query['sql']]
+        self.assertEqual(len(notify), 1)
+        self.assertIn(ORDER_FINISHED, notify[0])
+
+    def test_kitchen_feed_broker_dispatch(self):
+        """Test para repartir un evento solo entre las pantallas de su restaurante"""
+        order = self.create_orders(1)[0]
+        feed_broker = KitchenFeedBroker()
+        feed_broker.listener = object()
+        queue = feed_broker.subscribe(order.restaurant_id)
+        other_queue = feed_broker.subscribe(order.restaurant_id + 1)
+
+        event = get_kitchen_event(order, ORDER_CREATED)
+        feed_broker.dispatch(json.dumps(event, cls=DjangoJSONEncoder))
+
+        self.assertEqual(queue.get_nowait()["order"], order.pk)
+        self.assertTrue(queue.empty())
+        self.assertTrue(other_queue.empty())
+        self.assertEqual(event["order_lines"][0]["dish_name"], self.dish.name)
+
+    def test_kitchen_feed_requires_admin_token(self):
+        """Test para rechazar la conexión al feed de la cocina sin token"""
+        messages = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/orders/kitchen-feed/{self.restaurant.pk}/', 'headers': []}
+        asyncio.run(kitchen_feed_app(scope, receive, send, feed_broker=KitchenFeedBroker()))
+
+        self.assertEqual(messages[0]['status'], status.HTTP_401_UNAUTHORIZED)
+
+    def test_asgi_serves_only_kitchen_feed(self):
+        """Test para comprobar que la aplicación ASGI no sirve el resto de la API (se sirve por WSGI)"""
+        from restaurants_api.asgi import application
+        messages = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/orders/export/', 'headers': [], 'query_string': b''}
+        asyncio.run(application(scope, receive, send))
+
+        self.assertEqual(messages[0]['status'], status.HTTP_404_NOT_FOUND)
+
+    def test_kitchen_feed_token(self):
+        """Test para abrir el feed de la cocina con un token firmado del restaurante y no con el de la API"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+        response = self.client.post(f'/orders/kitchen-feed-token/{self.restaurant.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        token = response.data['token']
+
+        self.assertEqual(get_feed_token_user_id(token, self.restaurant.pk), self.admin_user.pk)
+        self.assertIsNone(get_feed_token_user_id(token, self.restaurant.pk + 1))
+        self.assertIsNone(get_feed_token_user_id(self.admin_token.key, self.restaurant.pk))
+        with mock.patch('utils.kitchen_feed.KITCHEN_FEED_TOKEN_MAX_AGE', -1):
+            self.assertIsNone(get_feed_token_user_id(token, self.restaurant.pk))
+
+    def test_order_rollups_incremental(self):
+        """Test para mantener los resúmenes diarios al crear, finalizar, cancelar y eliminar pedidos"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Order.objects.create(restaurant=self.restaurant, user=self.admin_user, total=Decimal('10.50'), total_dishes=2, discount=Decimal('1.50'))
+            second = Order.objects.create(restaurant=self.restaurant, user=self.admin_user, total=20, total_dishes=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/orders/{first.pk}/finish/')
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = OrderStatus.CANCELLED
+            second.save()
+
+        today = timezone.localdate()
+        completed = OrderDailyRollup.objects.get(restaurant=self.restaurant, day=today, status=OrderStatus.COMPLETED)
+        self.assertEqual((completed.orders, completed.revenue, completed.dishes, completed.discount), (1, Decimal('10.50'), 2, Decimal('1.50')))
+        self.assertEqual(OrderDailyRollup.objects.get(restaurant=self.restaurant, day=today, status=OrderStatus.PENDING).orders, 0)
+        self.assertEqual(verify_rollups(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/orders/{second.pk}/')
+        self.assertEqual(verify_rollups(), [])
+
+    def test_rebuild_order_rollups(self):
+        """Test para reconstruir los resúmenes diarios a partir de los pedidos"""
+        self.create_orders(2, total=15, total_dishes=1)
+        OrderDailyRollup.objects.all().delete()
+
+        self.assertEqual(rebuild_rollups(), 1)
+
+        self.assertEqual(verify_rollups(), [])
+        self.assertEqual(OrderDailyRollup.objects.get().revenue, Decimal('30.00'))
+
+    def test_revenue_report(self):
+        """Test para obtener el informe de ingresos solo con los resúmenes diarios"""
+        self.create_orders(2, total=15, total_dishes=1)
+        rebuild_rollups()
+        today = timezone.localdate().isoformat()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        # Autenticación, permiso de administrador, restaurantes y resúmenes
+        with self.assertNumQueries(4):
+            response = self.client.get('/orders/revenue/', {'start_date': today, 'end_date': today})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['restaurants'][0]['orders'], 2)
+        self.assertEqual(response.data['restaurants'][0]['revenue'], Decimal('30.00'))
+        self.assertEqual(response.data['days'][0]['status'], OrderStatus.PENDING)
+
+    def create_orders(self, count, restaurant=None, **fields):
+        """Crear pedidos con una línea y una reserva cada uno."""
+        table = Table.objects.create(
+            x_position=Table.objects.count(), y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant,
+        )
+        orders = []
+        for index in range(count):
+            order = Order.objects.create(user=self.admin_user, restaurant=restaurant or self.restaurant, **fields)
+            OrderLine.objects.create(order=order, dish=self.dish, quantity=1, price=self.dish.price)
+            start = timezone.now() + timedelta(days=index + 1)
+            Reserve.objects.create(
+                start_reserve=start, finish_reserve=start + timedelta(hours=1),
+                assigned_order=order, assigned_chairs=2, table=table,
+            )
+            orders.append(order)
+        return orders
+
+    def test_list_orders_paginated(self):
+        """Test para listar los pedidos paginados con un número fijo de consultas"""
+        self.create_orders(3)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        # Autenticación, permiso de administrador, total, página, líneas con sus platos y reservas
+        with self.assertNumQueries(6):
+            small_page = self.client.get('/orders/?limit=1')
+        self.create_orders(12)
+        with self.assertNumQueries(6):
+            response = self.client.get('/orders/')
+
+        self.assertEqual(small_page.data['count'], 3)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['order_lines'][0]['dish_name'], self.dish.name)
+
+    def test_list_orders_with_cursor(self):
+        """Test para elegir la paginación por cursor y recorrer los pedidos en los dos sentidos"""
+        orders = self.create_orders(9)
+        # Pedidos con la misma fecha: el orden se desempata por pk
+        Order.objects.update(created_at=timezone.now())
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        first = self.client.get('/orders/', {'pagination': 'cursor', 'page_size': 4})
+        self.assertNotIn('count', first.data)
+        self.assertIsNone(first.data['previous'])
+
+        # Autenticación, permiso de administrador, página, líneas con sus platos y reservas (sin COUNT)
+        with self.assertNumQueries(5):
+            second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+        self.assertIsNone(third.data['next'])
+
+        pks = [order['pk'] for page in (first, second, third) for order in page.data['results']]
+        self.assertEqual(pks, sorted((order.pk for order in orders), reverse=True))
+
+        previous = self.client.get(third.data['previous'])
+        self.assertEqual(previous.data['results'], second.data['results'])
+
+        response = self.client.get('/orders/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_orders(self):
+        """Test para filtrar los pedidos por restaurante, estado y fechas"""
+        other_restaurant = Restaurant.objects.create(name='Other Restaurant')
+        self.create_orders(2)
+        cancelled = Order.objects.create(user=self.admin_user, restaurant=self.restaurant, status=OrderStatus.CANCELLED)
+        other = Order.objects.create(user=self.admin_user, restaurant=other_restaurant)
+        Order.objects.filter(pk=other.pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        response = self.client.get('/orders/', {'restaurant': self.restaurant.pk, 'status': OrderStatus.CANCELLED})
+        self.assertEqual([order['pk'] for order in response.data['results']], [cancelled.pk])
+
+        response = self.client.get('/orders/', {'created_before': (timezone.now() - timedelta(days=1)).isoformat()})
+        self.assertEqual([order['pk'] for order in response.data['results']], [other.pk])
+
+        response = self.client.get('/orders/', {'status': 'unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_orders_csv(self):
+        """Test para exportar en CSV los pedidos de un restaurante con una fila por línea"""
+        orders = self.create_orders(3)
+        OrderLine.objects.create(order=orders[0], dish=self.dish, quantity=2, price=self.dish.price)
+        empty = Order.objects.create(user=self.admin_user, restaurant=self.restaurant)
+        Order.objects.create(user=self.admin_user, restaurant=Restaurant.objects.create(name='Other Restaurant'))
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        response = self.client.get('/orders/export/', {'restaurant': self.restaurant.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [orders[0].pk] * 2 + [order.pk for order in orders[1:]] + [empty.pk])
+        self.assertEqual(rows[0]['line_dish_name'], self.dish.name)
+        self.assertEqual(rows[-1]['line_id'], '')
+
+    def test_export_orders_ndjson_gzip(self):
+        """Test para exportar en NDJSON comprimido los pedidos de un rango de fechas con sus líneas"""
+        orders = self.create_orders(2)
+        Order.objects.filter(pk=orders[0].pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        response = self.client.get(
+            '/orders/export/',
+            {'output': 'ndjson', 'created_after': (timezone.now() - timedelta(days=1)).isoformat()},
+            HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        exported = [json.loads(line) for line in lines]
+        self.assertEqual([order['id'] for order in exported], [orders[1].pk])
+        self.assertEqual(exported[0]['order_lines'][0]['dish__name'], self.dish.name)
+
+        response = self.client.get('/orders/export/', {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_orders_includes_archived(self):
+        """Test para exportar los pedidos archivados junto a los demás, ordenados por fecha y con los mismos filtros"""
+        orders = [Order.objects.create(user=self.admin_user, restaurant=self.restaurant) for _ in range(2)]
+        OrderLine.objects.create(order=orders[0], dish=self.dish, quantity=2, price=self.dish.price)
+        Order.objects.filter(pk=orders[0].pk).update(
+            status=OrderStatus.COMPLETED, created_at=timezone.now() - timedelta(days=400),
+        )
+        other = Order.objects.create(
+            user=self.admin_user, restaurant=Restaurant.objects.create(name='Other Restaurant'),
+            status=OrderStatus.CANCELLED,
+        )
+        Order.objects.filter(pk=other.pk).update(created_at=timezone.now() - timedelta(days=300))
+        self.assertEqual(archive_orders(months=6), 2)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        response = self.client.get('/orders/export/', {'restaurant': self.restaurant.pk})
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [orders[0].pk, orders[1].pk])
+        self.assertEqual(rows[0]['line_dish_name'], self.dish.name)
+        self.assertEqual(rows[0]['status'], OrderStatus.COMPLETED)
+
+        response = self.client.get('/orders/export/', {'output': 'ndjson'})
+
+        exported = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([order['id'] for order in exported], [orders[0].pk, other.pk, orders[1].pk])
+        self.assertEqual(exported[0]['order_lines'][0]['quantity'], 2)
+        self.assertEqual(exported[1]['order_lines'], [])
+
     def test_update_order_as_admin(self):
         """Test para actualizar un Order como administrador"""
         order = Order.objects.create(
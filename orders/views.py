@@ -3,7 +3,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from .serializers import OrderSerializer
-from .models import Order
+from .filters import OrderFilter
+from django.db import transaction
+from django.db.models import Prefetch
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import ArchivedOrder, Order
 from users.permissions import IsStandardUser, IsAdminUser
 from django.utils import timezone
 from restaurants.models import Restaurant
@@ -14,6 +18,14 @@ from order_lines.models import OrderLine
 from decimal import Decimal
 from reserves.models import Reserve
 from reserves.serializers import ReserveSerializer
+from utils.order_intake import get_intake_metrics
+from utils.export import export_response, get_export_format, iter_order_export
+from utils.kitchen_feed import KITCHEN_FEED_TOKEN_MAX_AGE, ORDER_FINISHED, create_feed_token, publish_kitchen_event
+from utils.order_rollups import apply_order_rollup_change, get_order_rollup, get_revenue_report
+from datetime import datetime
+
+# Máximo de días que se pueden consultar de una vez en el informe de ingresos
+MAX_REVENUE_RANGE_DAYS = 366
 
 class OrderViewSet(
     mixins.CreateModelMixin,
@@ -26,7 +38,13 @@ class OrderViewSet(
     """ViewSet para manejar las operaciones CRUD de Order."""
 
     serializer_class = OrderSerializer
-    queryset = Order.objects.all()
+    # Los datos relacionados que muestra OrderSerializer se cargan con un número fijo de consultas por página
+    queryset = Order.objects.select_related('restaurant', 'user').prefetch_related(
+        Prefetch('order_lines', queryset=OrderLine.objects.select_related('dish')),
+        'reserves',
+    ).order_by('-created_at', '-pk')
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderFilter
 
     def get_permissions(self):
         """Define permisos de administrador."""
@@ -55,9 +73,19 @@ class OrderViewSet(
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_destroy(self, instance):
+        """Elimina un Order y lo resta de los resúmenes diarios."""
+        with transaction.atomic():
+            apply_order_rollup_change(get_order_rollup(instance), None)
+            instance.delete()
+
     def list(self, request, *args, **kwargs):
-        """Lista todos los pedidos."""
+        """Lista los pedidos paginados, filtrando por restaurante, estado y fechas (ver OrderFilter)."""
         queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -72,5 +100,92 @@ class OrderViewSet(
         """Marcar un pedido como finalizado."""
         instance = self.get_object()
         instance.finished_at = timezone.now()
-        instance.save()
-        return Response(self.get_serializer(instance).data)
\ No newline at end of file
+        with transaction.atomic():
+            instance.save()
+            publish_kitchen_event(instance, ORDER_FINISHED)
+        return Response(self.get_serializer(instance).data)
+
+    @action(detail=False, methods=["post"], url_path=r"kitchen-feed-token/(?P<restaurant_id>\d+)")
+    def kitchen_feed_token(self, request, restaurant_id=None):
+        """
+        Devolver un token firmado y de corta duración para abrir el feed de la cocina de un restaurante
+        (/orders/kitchen-feed/<id>/?token=...). Al caducar, para reconectar se pide uno nuevo.
+        """
+        if not Restaurant.objects.filter(pk=restaurant_id).exists():
+            return Response({"error": "Restaurante no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        token = create_feed_token(request.user, int(restaurant_id))
+        return Response({
+            "token": token,
+            "expires_in": KITCHEN_FEED_TOKEN_MAX_AGE,
+            "url": f"/orders/kitchen-feed/{restaurant_id}/?token={token}",
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"], url_path="intake-metrics")
+    def intake_metrics(self, request):
+        """Devolver la profundidad, el retraso y el rendimiento de la cola de pedidos asíncronos."""
+        return Response(get_intake_metrics())
+
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Exportar en CSV o NDJSON (?output) los pedidos con sus líneas, filtrados como el listado (ver OrderFilter).
+
+        Incluye los pedidos archivados (ArchivedOrder) con los mismos filtros, ordenados por fecha junto a los demás.
+        """
+        export_format = get_export_format(request)
+        orders = self.filter_queryset(Order.objects.all())
+        # DjangoFilterBackend solo admite querysets del modelo de OrderFilter: se aplica directamente
+        archived_orders = OrderFilter(request.query_params, queryset=ArchivedOrder.objects.all(), request=request).qs
+        return export_response(
+            request, iter_order_export(orders, export_format, archived_orders), export_format, 'orders',
+        )
+
+    @action(detail=False, methods=["get"], url_path="revenue")
+    def revenue(self, request):
+        """Devolver los pedidos, ingresos, platos y descuentos por restaurante y día, leídos de los resúmenes diarios."""
+        start_date_str = request.query_params.get("start_date")
+        end_date_str = request.query_params.get("end_date")
+
+        if not start_date_str or not end_date_str:
+            return Response(
+                {"error": "Debes proporcionar 'start_date' y 'end_date'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use 'YYYY-MM-DD'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if start_date > end_date:
+            return Response(
+                {"error": "La fecha de inicio no puede ser posterior a la fecha de fin."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if (end_date - start_date).days + 1 > MAX_REVENUE_RANGE_DAYS:
+            return Response(
+                {"error": f"El rango de fechas no puede superar los {MAX_REVENUE_RANGE_DAYS} días."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Restaurantes separados por comas; por defecto, todos
+        restaurants_str = request.query_params.get("restaurants")
+        if restaurants_str:
+            try:
+                restaurant_ids = [int(restaurant_id) for restaurant_id in restaurants_str.split(",")]
+            except ValueError:
+                return Response(
+                    {"error": "El parámetro 'restaurants' debe ser una lista de IDs separados por comas."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            restaurant_ids = list(Restaurant.objects.values_list('id', flat=True))
+
+        return Response(get_revenue_report(restaurant_ids, start_date, end_date), status=status.HTTP_200_OK)
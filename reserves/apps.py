@@ -5,3 +5,7 @@ class ReservesConfig(AppConfig):
     """Configuración de reservas."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reserves'
+
+    def ready(self):
+        """Registrar las señales que mantienen la ocupación de las mesas."""
+        from reserves import signals  # noqa: F401
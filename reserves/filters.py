@@ -0,0 +1,14 @@
+import django_filters
+from .models import Reserve
+
+
+class ReserveFilter(django_filters.FilterSet):
+    """Filtros de las reservas: restaurante (el de su mesa) y rango de fechas de inicio."""
+    restaurant = django_filters.NumberFilter(field_name='table__assigned_restaurant')
+    start_after = django_filters.IsoDateTimeFilter(field_name='start_reserve', lookup_expr='gte')
+    start_before = django_filters.IsoDateTimeFilter(field_name='start_reserve', lookup_expr='lt')
+
+    class Meta:
+        """Clase Meta."""
+        model = Reserve
+        fields = ('restaurant', 'start_after', 'start_before')
@@ -0,0 +1,59 @@
+from datetime import date, datetime, timedelta
+from time import perf_counter
+import numpy as np
+from django.core.management.base import BaseCommand
+from utils.fleet_occupancy import DAY_SECONDS, EPOCH_DATE, compute_fleet_occupancy
+from utils.occupancy import compute_occupancy
+
+
+def build_benchmark_reserves(reserves, restaurants, tables_per_restaurant, days, start_date, seed=0):
+    """Genera en memoria mesas y reservas aleatorias (de 1 a 3 horas, empezando entre las 9:00 y las 22:00)."""
+    rng = np.random.default_rng(seed)
+    table_ids = np.arange(1, restaurants * tables_per_restaurant + 1)
+    table_restaurants = (table_ids - 1) // tables_per_restaurant + 1
+
+    reserve_tables = rng.choice(table_ids, size=reserves)
+    day_starts = ((start_date - EPOCH_DATE).days + rng.integers(0, days, size=reserves)) * DAY_SECONDS
+    start_epochs = day_starts + rng.integers(18, 44, size=reserves) * 1800
+    finish_epochs = start_epochs + rng.integers(2, 7, size=reserves) * 1800
+    return table_ids, table_restaurants, reserve_tables, start_epochs.astype(np.float64), finish_epochs.astype(np.float64)
+
+
+class Command(BaseCommand):
+    """Mide el rendimiento del cálculo de ocupación de muchos restaurantes a la vez."""
+    help = 'Mide cuánto tarda compute_fleet_occupancy (NumPy) con reservas generadas en memoria y, opcionalmente, el cálculo en Python.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument('--reserves', type=int, default=1000000, help='Número de reservas.')
+        parser.add_argument('--restaurants', type=int, default=500, help='Número de restaurantes.')
+        parser.add_argument('--tables', type=int, default=20, help='Mesas por restaurante.')
+        parser.add_argument('--days', type=int, default=31, help='Días del rango.')
+        parser.add_argument('--python', action='store_true', help='Medir también el cálculo reserva a reserva en Python.')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos generados.')
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        start_date = date(2030, 1, 1)
+        data = build_benchmark_reserves(
+            options['reserves'], options['restaurants'], options['tables'], options['days'], start_date, options['seed']
+        )
+
+        start = perf_counter()
+        result = compute_fleet_occupancy(*data, start_date, options['days'])
+        elapsed = perf_counter() - start
+        self.stdout.write(
+            f"NumPy: {options['reserves']} reservas, {len(data[0])} mesas, {options['days']} días: "
+            f"{elapsed * 1000:.0f} ms ({int(result['tables'].sum())} franjas ocupadas)"
+        )
+
+        if options['python']:
+            epoch = datetime(1970, 1, 1)
+            reservations = [
+                (table_id, epoch + timedelta(seconds=start_epoch), epoch + timedelta(seconds=finish_epoch))
+                for table_id, start_epoch, finish_epoch in zip(data[2].tolist(), data[3].tolist(), data[4].tolist())
+            ]
+            start = perf_counter()
+            occupancy = compute_occupancy(reservations)
+            elapsed = perf_counter() - start
+            self.stdout.write(f"Python: {elapsed * 1000:.0f} ms ({len(occupancy)} franjas ocupadas)")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from utils.occupancy import rebuild_occupancy, verify_occupancy
+
+
+class Command(BaseCommand):
+    """Reconstruye y verifica la ocupación materializada de las mesas."""
+    help = 'Reconstruye desde cero la ocupación de las mesas (TableOccupancy) a partir de las reservas y la verifica.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Solo verificar la ocupación, sin reconstruirla.',
+        )
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        if not options['verify_only']:
+            rows = rebuild_occupancy()
+            self.stdout.write(f'Ocupación reconstruida: {rows} franjas ocupadas.')
+
+        differences = verify_occupancy()
+        for (table_id, day, slot), expected, stored in differences[:20]:
+            self.stderr.write(f'Mesa {table_id}, {day}, franja {slot}: esperado {expected}, guardado {stored}')
+
+        if differences:
+            raise CommandError(f'La ocupación no coincide con las reservas ({len(differences)} diferencias).')
+
+        self.stdout.write(self.style.SUCCESS('La ocupación coincide con las reservas.'))
@@ -0,0 +1,75 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:19
+
+from collections import defaultdict
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+# Franjas de media hora del día y margen al final de la reserva (como en utils/slots.py y utils/availability.py)
+SLOT_SECONDS = 30 * 60
+SLOTS_PER_DAY = 48
+FINISH_MARGIN_SECONDS = 5 * 60
+
+
+def time_to_microseconds(value):
+    # Microsegundos transcurridos desde las 00:00 para la hora de un datetime en la zona horaria actual
+    value = timezone.localtime(value).time()
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+
+def get_reserve_slots(start_reserve, finish_reserve):
+    # Franjas que ocupa una reserva: inicio <= franja < fin - 5 minutos, comparando solo la hora del día
+    slot_us = SLOT_SECONDS * 1000000
+    start_us = time_to_microseconds(start_reserve)
+    finish_us = time_to_microseconds(finish_reserve) - FINISH_MARGIN_SECONDS * 1000000
+    if finish_us < 0:
+        finish_us += 24 * 3600 * 1000000
+    return range(-(-start_us // slot_us), min(-(-finish_us // slot_us), SLOTS_PER_DAY))
+
+
+def fill_occupancy(apps, schema_editor):
+    # Calcular la ocupación de las reservas existentes (no canceladas)
+    Reserve = apps.get_model('reserves', 'Reserve')
+    TableOccupancy = apps.get_model('reserves', 'TableOccupancy')
+
+    reservations = Reserve.objects.exclude(assigned_order__status='cancelled').values_list(
+        'table_id', 'start_reserve', 'finish_reserve'
+    )
+    occupancy = defaultdict(int)
+    for table_id, start_reserve, finish_reserve in reservations.iterator(chunk_size=2000):
+        day = timezone.localtime(start_reserve).date()
+        for slot in get_reserve_slots(start_reserve, finish_reserve):
+            occupancy[(table_id, day, slot)] += 1
+
+    TableOccupancy.objects.bulk_create(
+        [
+            TableOccupancy(table_id=table_id, day=day, slot=slot, reserves=reserves)
+            for (table_id, day, slot), reserves in occupancy.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0005_add_tables'),
+        ('reserves', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('reserves', models.IntegerField(default=0)),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='tables.table')),
+            ],
+            options={
+                'unique_together': {('table', 'day', 'slot')},
+            },
+        ),
+        migrations.RunPython(fill_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:22
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from datetime import timedelta
+from django.db import migrations, models
+from psycopg2.extras import DateTimeTZRange
+
+# Margen al final de una reserva (como RESERVE_FINISH_MARGIN en reserves/models.py)
+RESERVE_FINISH_MARGIN = timedelta(minutes=5)
+BATCH_SIZE = 2000
+
+
+def fill_periods(apps, schema_editor):
+    # Calcular el rango y el estado de las reservas existentes antes de crear la restricción, por lotes
+    Reserve = apps.get_model('reserves', 'Reserve')
+
+    reserves = Reserve.objects.select_related('assigned_order').only(
+        'start_reserve', 'finish_reserve', 'assigned_order__status',
+    )
+    batch = []
+    for reserve in reserves.iterator(chunk_size=BATCH_SIZE):
+        finish_reserve = max(reserve.start_reserve, reserve.finish_reserve - RESERVE_FINISH_MARGIN)
+        reserve.period = DateTimeTZRange(reserve.start_reserve, finish_reserve, '[)')
+        reserve.is_active = reserve.assigned_order.status != 'cancelled'
+        batch.append(reserve)
+        if len(batch) == BATCH_SIZE:
+            Reserve.objects.bulk_update(batch, ['period', 'is_active'], batch_size=BATCH_SIZE)
+            batch = []
+    Reserve.objects.bulk_update(batch, ['period', 'is_active'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reserves', '0002_tableoccupancy'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='reserve',
+            name='is_active',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reserve',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_periods, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reserve',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('is_active', True)), expressions=[('table', '='), ('period', '&&')], name='reserve_table_period_excl'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reserves', '0003_reserve_period_exclusion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserve',
+            index=models.Index(fields=['start_reserve', 'id'], name='reserves_start_id_idx'),
+        ),
+    ]
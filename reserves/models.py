@@ -1,11 +1,38 @@
 from django.db import models
+from django.db.models import Q
 from django.core.validators import MinValueValidator
+from django.core.exceptions import ValidationError
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.utils.dateparse import parse_datetime
+from psycopg2.extras import DateTimeTZRange
 from restaurants.models import Restaurant
-from orders.models import Order
+from orders.models import Order, OrderStatus
 from uuid import uuid4
 from tables.models import Table
 from datetime import timedelta
 
+# Margen al final de una reserva: una reserva hasta las 12:00 no impide otra que empiece a las 11:55
+RESERVE_FINISH_MARGIN = timedelta(minutes=5)
+# Restricción de la base de datos que impide reservas superpuestas en la misma mesa
+RESERVE_OVERLAP_CONSTRAINT = 'reserve_table_period_excl'
+RESERVE_OVERLAP_MESSAGE = "Ya existe una reserva que ocupa este rango horario para la mesa especificada."
+
+
+def is_reserve_overlap_error(error):
+    """Indica si un IntegrityError se debe a la restricción de reservas superpuestas."""
+    return RESERVE_OVERLAP_CONSTRAINT in str(error)
+
+
+def get_reserve_period(start_reserve, finish_reserve):
+    """Dado el inicio y el fin de una reserva, devuelve el rango [inicio, fin - margen) que ocupa."""
+    if isinstance(start_reserve, str):
+        start_reserve = parse_datetime(start_reserve)
+    if isinstance(finish_reserve, str):
+        finish_reserve = parse_datetime(finish_reserve)
+    return DateTimeTZRange(start_reserve, max(start_reserve, finish_reserve - RESERVE_FINISH_MARGIN), '[)')
+
+
 class Reserve(models.Model):
     """Modelo para representar una reserva."""
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
@@ -24,26 +51,78 @@ class Reserve(models.Model):
         on_delete=models.CASCADE,
         related_name='reserves'
     )
+    # Rango [inicio, fin - margen) y si el pedido no está cancelado. Se calculan al guardar y
+    # los usa la restricción de exclusión para impedir reservas superpuestas en la misma mesa.
+    period = DateTimeRangeField(null=True, blank=True, editable=False)
+    is_active = models.BooleanField(default=True, editable=False)
+
+    class Meta:
+        """Meta options."""
+        constraints = [
+            ExclusionConstraint(
+                name=RESERVE_OVERLAP_CONSTRAINT,
+                expressions=[
+                    ('table', RangeOperators.EQUAL),
+                    ('period', RangeOperators.OVERLAPS),
+                ],
+                condition=Q(is_active=True),
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['start_reserve', 'id'], name='reserves_start_id_idx'),
+        ]
 
     def clean(self):
-        """Validar que no haya reservas que se superpongan para la misma mesa"""
+        """Validar que no haya reservas que se superpongan para la misma mesa (la base de datos también lo impide)"""
         overlapping_reservations = Reserve.objects.filter(
             table=self.table,
-            start_reserve__lt=self.finish_reserve - timedelta(minutes=5),
-            finish_reserve__gt=self.start_reserve,
-        ).exclude(assigned_order__status='cancelled')
-
-        if self.id:  # Si estamos actualizando, excluir la reserva actual
-            overlapping_reservations = overlapping_reservations.exclude(id=self.id)
+            is_active=True,
+            period__overlap=get_reserve_period(self.start_reserve, self.finish_reserve),
+        ).exclude(id=self.id)
 
         if overlapping_reservations.exists():
-            raise ValidationError("Ya existe una reserva que se superpone con el rango de tiempo especificado.")
+            raise ValidationError(RESERVE_OVERLAP_MESSAGE)
 
     def save(self, *args, **kwargs):
-        """Aplicar la validación antes de guardar la reserva"""
-        self.clean()  # Validar antes de guardar
+        """
+        Calcular el rango y el estado de la reserva antes de guardarla.
+
+        Las reservas superpuestas las rechaza la restricción RESERVE_OVERLAP_CONSTRAINT con un IntegrityError.
+        """
+        self.update_period()
         super().save(*args, **kwargs)
 
+    def update_period(self):
+        """Calcular el rango que ocupa la reserva y si cuenta para la ocupación (su pedido no está cancelado)."""
+        self.period = get_reserve_period(self.start_reserve, self.finish_reserve)
+        self.is_active = self.assigned_order.status != OrderStatus.CANCELLED
+
     def __str__(self):
         """Devuelve la representación en string de la reserva."""
         return f'Reserva de {self.start_reserve} a {self.finish_reserve} en la mesa {self.table.id}, con {self.assigned_chairs} sillas.'
+
+
+class TableOccupancy(models.Model):
+    """
+    Ocupación materializada de las mesas: número de reservas activas por mesa, día y franja de media hora.
+
+    Se mantiene al guardar o eliminar una Reserve y al cancelar o reactivar un Order (ver reserves/signals.py).
+    Se puede reconstruir y verificar con el comando rebuild_occupancy.
+    """
+    table = models.ForeignKey(
+        'tables.Table',
+        on_delete=models.CASCADE,
+        related_name='occupancy'
+    )
+    day = models.DateField()
+    slot = models.PositiveSmallIntegerField()
+    reserves = models.IntegerField(default=0)
+
+    class Meta:
+        """Meta options."""
+        unique_together = ('table', 'day', 'slot')
+
+    def __str__(self):
+        """Devuelve la representación en string de la ocupación."""
+        return f'Mesa {self.table_id} el {self.day}, franja {self.slot}: {self.reserves} reservas.'
+
@@ -1,7 +1,7 @@
 from rest_framework import serializers
-from .models import Reserve
-from datetime import timedelta
-from orders.models import OrderStatus
+from rest_framework.settings import api_settings
+from django.db import IntegrityError, transaction
+from .models import Reserve, RESERVE_OVERLAP_MESSAGE, is_reserve_overlap_error
 
 class ReserveSerializer(serializers.ModelSerializer):
     """Serializer para el modelo Reserve."""
@@ -10,27 +10,6 @@ class ReserveSerializer(serializers.ModelSerializer):
         model = Reserve
         fields = ['id', 'start_reserve', 'finish_reserve', 'assigned_order', 'assigned_chairs', 'table']
 
-    def validate_overlapping(self, data):
-        """Validar que no haya superposiciones para la misma mesa"""
-        start_reserve = data.get('start_reserve')
-        finish_reserve = data.get('finish_reserve')
-        table = data.get('table')
-
-        overlapping_reservations = Reserve.objects.filter(
-            table=table,
-            start_reserve__lt=finish_reserve - timedelta(minutes=5),
-            finish_reserve__gt=start_reserve,
-        ).exclude(assigned_order__status='cancelled')  # Excluir reservas canceladas
-
-        # Si estamos actualizando, excluir la reserva actual
-        if self.instance:
-            overlapping_reservations = overlapping_reservations.exclude(id=self.instance.id)
-
-        if overlapping_reservations.exists():
-            raise serializers.ValidationError("Ya existe una reserva que se superpone para esta mesa y rango de tiempo.")
-
-        return data
-
     def validate_assigned_chairs(self, value):
         """Validar que el número de sillas asignadas esté entre min_chairs y max_chairs de la mesa asociada"""
         table = self.initial_data.get('table')
@@ -64,19 +43,23 @@ class ReserveSerializer(serializers.ModelSerializer):
         if not table_id:
             raise serializers.ValidationError("Debe asignarse una mesa a la reserva.")
 
-        # Verificar superposiciones excluyendo reservas canceladas
-        overlapping_reservations = Reserve.objects.filter(
-            table=table_id,
-            start_reserve__lt=finish_reserve - timedelta(minutes=5),
-            finish_reserve__gt=start_reserve,
-        ).exclude(assigned_order__status=OrderStatus.CANCELLED)  # Excluir reservas canceladas
+        # Las superposiciones las impide la restricción de la base de datos (ver create/update)
+        return data
 
-        # Si estamos actualizando, excluir la reserva actual
-        instance = getattr(self, 'instance', None)
-        if instance:
-            overlapping_reservations = overlapping_reservations.exclude(id=instance.id)
+    def create(self, validated_data):
+        """Crear una reserva, convirtiendo una superposición en un error de validación."""
+        return self.save_reserve(super().create, validated_data)
 
-        if overlapping_reservations.exists():
-            raise serializers.ValidationError("Ya existe una reserva que ocupa este rango horario para la mesa especificada.")
+    def update(self, instance, validated_data):
+        """Actualizar una reserva, convirtiendo una superposición en un error de validación."""
+        return self.save_reserve(super().update, instance, validated_data)
 
-        return data
+    def save_reserve(self, save, *args):
+        """Guardar la reserva y devolver un 400 si la base de datos detecta una superposición."""
+        try:
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError as error:
+            if not is_reserve_overlap_error(error):
+                raise
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [RESERVE_OVERLAP_MESSAGE]})
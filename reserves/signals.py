@@ -0,0 +1,89 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from orders.models import Order, OrderStatus
+from reserves.models import Reserve
+from tables.models import Table
+from utils.availability import reserve_day
+from utils.availability_cache import invalidate_availability_day
+from utils.occupancy import update_occupancy, update_reserves_occupancy
+
+
+def invalidate_reserve_availability(table_id, start_reserve, restaurant_id=None):
+    """Invalidar la disponibilidad cacheada del restaurante y día de una reserva."""
+    if restaurant_id is None:
+        restaurant_id = Table.objects.filter(pk=table_id).values_list('assigned_restaurant_id', flat=True).first()
+    invalidate_availability_day(restaurant_id, reserve_day(start_reserve))
+
+
+@receiver(pre_save, sender=Reserve)
+def store_previous_reserve(sender, instance, raw=False, **kwargs):
+    """Guardar la ocupación anterior de la reserva antes de actualizarla."""
+    instance._previous_occupancy = None
+    if raw or instance._state.adding:
+        return
+
+    instance._previous_occupancy = Reserve.objects.filter(pk=instance.pk).values_list(
+        'table_id', 'start_reserve', 'finish_reserve', 'is_active', 'table__assigned_restaurant_id'
+    ).first()
+
+
+@receiver(post_save, sender=Reserve)
+def update_reserve_occupancy(sender, instance, raw=False, **kwargs):
+    """Actualizar la ocupación de la mesa al crear o modificar una reserva."""
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_occupancy', None)
+    restaurant_id = None
+    if previous:
+        if previous[3]:
+            update_occupancy(previous[0], previous[1], previous[2], -1)
+        invalidate_reserve_availability(previous[0], previous[1], previous[4])
+        if previous[0] == instance.table_id:
+            restaurant_id = previous[4]
+
+    if instance.is_active:
+        update_occupancy(instance.table_id, instance.start_reserve, instance.finish_reserve, 1)
+    invalidate_reserve_availability(instance.table_id, instance.start_reserve, restaurant_id)
+
+
+@receiver(post_delete, sender=Reserve)
+def remove_reserve_occupancy(sender, instance, **kwargs):
+    """Liberar la ocupación de la mesa al eliminar una reserva (también en borrados en cascada)."""
+    if instance.is_active:
+        update_occupancy(instance.table_id, instance.start_reserve, instance.finish_reserve, -1)
+    invalidate_reserve_availability(instance.table_id, instance.start_reserve)
+
+
+@receiver(post_init, sender=Order)
+def store_loaded_order_status(sender, instance, **kwargs):
+    """Recordar el estado con el que se cargó el pedido."""
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Order)
+def update_order_reserves(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Activar o desactivar las reservas de un pedido cuando pasa a cancelado o deja de estarlo
+    (por ejemplo, desde UserViewSet.cancel_order), invalidando la disponibilidad cacheada.
+
+    Al reactivar un pedido, la restricción de reservas superpuestas puede lanzar un IntegrityError
+    si otra reserva ha ocupado sus mesas mientras estaba cancelado.
+    """
+    loaded_status = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if raw or created or loaded_status is None:
+        return
+
+    was_active = loaded_status != OrderStatus.CANCELLED
+    is_active = instance.status != OrderStatus.CANCELLED
+    if was_active == is_active:
+        return
+
+    reserves = instance.reserves.all()
+    reserves.update(is_active=is_active)
+
+    reservations = list(reserves.values_list('table_id', 'start_reserve', 'finish_reserve', 'table__assigned_restaurant_id'))
+    update_reserves_occupancy([reservation[:3] for reservation in reservations], 1 if is_active else -1)
+    for table_id, start_reserve, finish_reserve, restaurant_id in reservations:
+        invalidate_reserve_availability(table_id, start_reserve, restaurant_id)
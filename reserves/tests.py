@@ -6,9 +6,18 @@ from users.models import User
 from orders.models import Order
 from restaurants.models import Restaurant
 from tables.models import Table
-from reserves.models import Reserve
+from reserves.models import Reserve, TableOccupancy
+from orders.models import OrderStatus
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, datetime, date
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
+from io import StringIO
+import csv
+from utils.fleet_occupancy import compute_fleet_occupancy, get_fleet_occupancy
+from utils.occupancy import compute_occupancy
+from reserves.management.commands.benchmark_fleet_occupancy import build_benchmark_reserves
 
 class ReserveTests(TestCase):
     """Tests para el modelo Reserve."""
@@ -47,6 +56,54 @@ class ReserveTests(TestCase):
             status="PENDING",
         )
 
+    def test_list_reserves_with_cursor(self):
+        """Test para recorrer las reservas por cursor, sin total y sin repetir ninguna"""
+        start = timezone.now() + timedelta(days=1)
+        reserves = [
+            Reserve.objects.create(
+                start_reserve=start + timedelta(hours=2 * (index // 2)),
+                finish_reserve=start + timedelta(hours=2 * (index // 2), minutes=30),
+                assigned_order=self.order, assigned_chairs=2,
+                table=Table.objects.create(x_position=10 + index, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant),
+            )
+            for index in range(7)
+        ]
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        seen = []
+        url = '/reserves/?pagination=cursor&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen += [reserve['id'] for reserve in response.data['results']]
+            url = response.data['next']
+
+        expected = sorted(reserves, key=lambda reserve: (reserve.start_reserve, str(reserve.pk)), reverse=True)
+        self.assertEqual(seen, [str(reserve.pk) for reserve in expected])
+
+    def test_export_reserves(self):
+        """Test para exportar en CSV las reservas de un restaurante"""
+        start = timezone.now() + timedelta(days=1)
+        reserve = Reserve.objects.create(
+            start_reserve=start, finish_reserve=start + timedelta(hours=1),
+            assigned_order=self.order, assigned_chairs=2, table=self.table,
+        )
+        other_restaurant = Restaurant.objects.create(name="Other Restaurant")
+        Reserve.objects.create(
+            start_reserve=start, finish_reserve=start + timedelta(hours=1),
+            assigned_order=self.order, assigned_chairs=2,
+            table=Table.objects.create(x_position=1, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=other_restaurant),
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        response = self.client.get('/reserves/export/', {'restaurant': self.restaurant.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['id'] for row in rows], [str(reserve.pk)])
+        self.assertEqual(rows[0]['assigned_chairs'], '2')
+
     def test_create_reserve_as_admin(self):
         """Test para crear una reserva como administrador"""
         self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
@@ -82,6 +139,9 @@ class ReserveTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data), 1)
+        # Sin ?pagination=cursor se mantiene la paginación por límite y desplazamiento, con total
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(self.client.get("/reserves/", {'limit': 1, 'offset': 1}).data['results']), 0)
 
     def test_retrieve_reserve(self):
         """Test para obtener detalles de una reserva"""
@@ -260,4 +320,241 @@ class IncorrectReserveTests(TestCase):
 
         response = self.client.patch(f"/reserves/{reserve1.pk}/", data, format="json")
 
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_database_rejects_superposition(self):
+        """Probar que la base de datos impide reservas superpuestas aunque no pasen por el serializer"""
+        now = timezone.now()
+        Reserve.objects.create(
+            start_reserve=now + timedelta(days=1),
+            finish_reserve=now + timedelta(days=1, hours=2),
+            assigned_order=self.order,
+            assigned_chairs=2,
+            table=self.table,
+        )
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reserve.objects.create(
+                start_reserve=now + timedelta(days=1, hours=1),
+                finish_reserve=now + timedelta(days=1, hours=3),
+                assigned_order=self.order,
+                assigned_chairs=2,
+                table=self.table,
+            )
+
+        # Una reserva que empieza 5 minutos antes del fin de la anterior no se superpone
+        Reserve.objects.create(
+            start_reserve=now + timedelta(days=1, hours=2) - timedelta(minutes=5),
+            finish_reserve=now + timedelta(days=1, hours=3),
+            assigned_order=self.order,
+            assigned_chairs=2,
+            table=self.table,
+        )
+        self.assertEqual(Reserve.objects.count(), 2)
+
+    def test_cancelled_order_does_not_block_table(self):
+        """Probar que las reservas de un pedido cancelado no impiden reservar la mesa"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        now = timezone.now()
+        Reserve.objects.create(
+            start_reserve=now + timedelta(days=1),
+            finish_reserve=now + timedelta(days=1, hours=2),
+            assigned_order=self.order,
+            assigned_chairs=2,
+            table=self.table,
+        )
+        self.order.status = OrderStatus.CANCELLED
+        self.order.save()
+
+        other_order = Order.objects.create(restaurant=self.restaurant, user=self.admin_user)
+        data = {
+            'start_reserve': now + timedelta(days=1),
+            'finish_reserve': now + timedelta(days=1, hours=2),
+            'assigned_order': other_order.pk,
+            'assigned_chairs': 2,
+            'table': self.table.pk,
+        }
+
+        response = self.client.post("/reserves/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Reactivar el pedido cancelado ya no es posible porque su mesa está ocupada
+        response = self.client.patch(f"/orders/{self.order.pk}/", {'status': OrderStatus.PENDING}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TableOccupancyTests(TestCase):
+    """Tests para la ocupación materializada de las mesas."""
+    def setUp(self):
+        """Configuración inicial de los tests."""
+        self.user = User.objects.create_user(
+            username='standard',
+            email='standard@example.com',
+            password='standard123',
+        )
+        self.restaurant = Restaurant.objects.create(name="Test Restaurant")
+        self.table = Table.objects.create(
+            x_position=1,
+            y_position=1,
+            min_chairs=2,
+            max_chairs=4,
+            assigned_restaurant=self.restaurant,
+        )
+        self.order = Order.objects.create(restaurant=self.restaurant, user=self.user)
+        self.start = timezone.make_aware(datetime(2030, 3, 4, 12, 0))
+
+    def create_reserve(self, start, hours=1):
+        """Crear una reserva para la mesa de los tests."""
+        return Reserve.objects.create(
+            start_reserve=start,
+            finish_reserve=start + timedelta(hours=hours),
+            assigned_order=self.order,
+            assigned_chairs=2,
+            table=self.table,
+        )
+
+    def occupied_slots(self):
+        """Devuelve las franjas ocupadas de la mesa."""
+        return list(
+            TableOccupancy.objects.filter(table=self.table, reserves__gt=0)
+            .order_by('day', 'slot')
+            .values_list('day', 'slot')
+        )
+
+    def test_create_reserve_occupies_slots(self):
+        """Test para comprobar que crear una reserva ocupa sus franjas"""
+        self.create_reserve(self.start)
+
+        self.assertListEqual(self.occupied_slots(), [(date(2030, 3, 4), 24), (date(2030, 3, 4), 25)])
+
+    def test_update_reserve_moves_slots(self):
+        """Test para comprobar que mover una reserva libera las franjas anteriores"""
+        reserve = self.create_reserve(self.start)
+        reserve.start_reserve = self.start + timedelta(days=1, hours=2)
+        reserve.finish_reserve = self.start + timedelta(days=1, hours=3)
+        reserve.save()
+
+        self.assertListEqual(self.occupied_slots(), [(date(2030, 3, 5), 28), (date(2030, 3, 5), 29)])
+
+    def test_delete_reserve_frees_slots(self):
+        """Test para comprobar que eliminar una reserva libera sus franjas"""
+        reserve = self.create_reserve(self.start)
+        reserve.delete()
+
+        self.assertListEqual(self.occupied_slots(), [])
+
+    def test_delete_order_frees_slots(self):
+        """Test para comprobar que eliminar el pedido (borrado en cascada) libera las franjas"""
+        self.create_reserve(self.start)
+        self.order.delete()
+
+        self.assertListEqual(self.occupied_slots(), [])
+
+    def test_cancel_order_frees_and_restores_slots(self):
+        """Test para comprobar que cancelar y reactivar el pedido libera y vuelve a ocupar las franjas"""
+        self.create_reserve(self.start)
+
+        self.order.status = OrderStatus.CANCELLED
+        self.order.save()
+        self.assertListEqual(self.occupied_slots(), [])
+
+        self.order.status = OrderStatus.PENDING
+        self.order.save()
+        self.assertEqual(len(self.occupied_slots()), 2)
+
+    def test_rebuild_occupancy_command(self):
+        """Test para reconstruir y verificar la ocupación con el comando rebuild_occupancy"""
+        self.create_reserve(self.start)
+        self.create_reserve(self.start + timedelta(hours=3), hours=2)
+        expected = self.occupied_slots()
+        TableOccupancy.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_occupancy', '--verify-only', stdout=StringIO(), stderr=StringIO())
+
+        call_command('rebuild_occupancy', stdout=StringIO())
+        self.assertListEqual(self.occupied_slots(), expected)
+
+
+class FleetOccupancyTests(TestCase):
+    """Tests para la ocupación de varios restaurantes calculada con NumPy."""
+    def setUp(self):
+        """Configuración inicial de los tests."""
+        self.client = APIClient()
+        self.admin_user = User.objects.create_user(
+            username='admin23',
+            email='admin@example.com',
+            password='admin123',
+            is_admin=True,
+        )
+        self.admin_token = Token.objects.create(user=self.admin_user)
+
+        self.restaurants = [Restaurant.objects.create(name=f"Restaurant {i}") for i in range(2)]
+        self.tables = [
+            Table.objects.create(x_position=i, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=restaurant)
+            for restaurant in self.restaurants
+            for i in range(1, 3)
+        ]
+        self.order = Order.objects.create(restaurant=self.restaurants[0], user=self.admin_user)
+
+        start = timezone.make_aware(datetime(2030, 3, 4, 12, 0))
+        for table, offset, minutes in [
+            (self.tables[0], timedelta(0), 60),
+            (self.tables[0], timedelta(hours=2, minutes=10), 95),
+            (self.tables[1], timedelta(days=1), 120),
+            (self.tables[2], timedelta(hours=9, minutes=30), 45),
+        ]:
+            Reserve.objects.create(
+                start_reserve=start + offset,
+                finish_reserve=start + offset + timedelta(minutes=minutes),
+                assigned_order=self.order,
+                assigned_chairs=2,
+                table=table,
+            )
+
+    def test_fleet_occupancy_matches_materialized_occupancy(self):
+        """Test para comprobar que el cálculo con NumPy coincide con la ocupación materializada"""
+        occupancy = get_fleet_occupancy([restaurant.pk for restaurant in self.restaurants], date(2030, 3, 1), date(2030, 3, 31))
+
+        expected = {table.pk: TableOccupancy.objects.filter(table=table, reserves__gt=0).count() for table in self.tables}
+        self.assertDictEqual({table["pk"]: table["occupied_slots"] for table in occupancy["tables"]}, expected)
+
+        restaurants = {restaurant["pk"]: restaurant["occupied_slots"] for restaurant in occupancy["restaurants"]}
+        self.assertEqual(restaurants[self.restaurants[0].pk], expected[self.tables[0].pk] + expected[self.tables[1].pk])
+        self.assertEqual(occupancy["slots"]["12:00:00"], 2)
+        self.assertEqual(occupancy["slots"]["21:30:00"], 1)
+        self.assertEqual(sum(occupancy["slots"].values()), sum(expected.values()))
+
+    def test_fleet_occupancy_matches_python(self):
+        """Test para comprobar que las franjas calculadas con NumPy coinciden con el cálculo en Python"""
+        data = build_benchmark_reserves(2000, 5, 4, 3, date(2030, 1, 1))
+        # Inicios y fines que no caen en una franja exacta
+        data = data[:3] + (data[3] + 7 * 60, data[4] - 11 * 60)
+        result = compute_fleet_occupancy(*data, date(2030, 1, 1), 3)
+
+        epoch = datetime(1970, 1, 1)
+        expected = compute_occupancy(
+            (table_id, epoch + timedelta(seconds=start), epoch + timedelta(seconds=finish))
+            for table_id, start, finish in zip(data[2].tolist(), data[3].tolist(), data[4].tolist())
+        )
+        self.assertEqual(int((result["occupancy"] > 0).sum()), len(expected))
+        self.assertEqual(int(result["occupancy"].sum()), sum(expected.values()))
+
+    def test_fleet_occupancy_endpoint(self):
+        """Test para obtener la ocupación de varios restaurantes como administrador"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        response = self.client.get(
+            f"/restaurants/occupancy/?start_date=2030-03-04&end_date=2030-03-04&restaurants={self.restaurants[1].pk}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["tables"]), 2)
+        self.assertEqual(response.data["restaurants"][0]["occupied_slots"], 2)
+
+    def test_fleet_occupancy_endpoint_requires_admin(self):
+        """Test para comprobar que la ocupación de varios restaurantes no es pública"""
+        response = self.client.get("/restaurants/occupancy/?start_date=2030-03-04&end_date=2030-03-04")
+
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
@@ -1,9 +1,13 @@
 from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from django_filters.rest_framework import DjangoFilterBackend
 from .models import Reserve
+from .filters import ReserveFilter
 from .serializers import ReserveSerializer
 from users.permissions import IsAdminUser, IsStandardUser
+from utils.export import export_response, get_export_format, iter_reserve_export
 
 class ReserveViewSet(
     mixins.CreateModelMixin,
@@ -17,7 +21,11 @@ class ReserveViewSet(
     Un ViewSet para manejar las operaciones CRUD del modelo Reserve.
     """
     serializer_class = ReserveSerializer
-    queryset = Reserve.objects.all()
+    queryset = Reserve.objects.order_by('-start_reserve', '-pk')
+    # Con ?pagination=cursor las reservas se paginan por cursor, de la más reciente a la más antigua
+    keyset_ordering = ('-start_reserve', '-pk')
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ReserveFilter
 
     def get_permissions(self):
         """Determinar permisos basados en la acción"""
@@ -53,3 +61,10 @@ class ReserveViewSet(
         instance = self.get_object()
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """Exportar en CSV o NDJSON (?output) las reservas filtradas por restaurante y fechas (ver ReserveFilter)."""
+        export_format = get_export_format(request)
+        reserves = self.filter_queryset(self.get_queryset())
+        return export_response(request, iter_reserve_export(reserves, export_format), export_format, 'reserves')
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.4 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant_dish_link', '0002_add_restaurant_dish_links'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantdishlink',
+            index=models.Index(fields=['restaurant', 'dish'], name='menu_restaurant_dish_idx'),
+        ),
+    ]
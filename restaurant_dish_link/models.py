@@ -10,6 +10,13 @@ class RestaurantDishLink(models.Model):
     dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='restaurants')
     stock = models.IntegerField()
 
+    class Meta:
+        """Clase Meta."""
+        indexes = [
+            # Recorre el menú de un restaurante ordenado por plato (ver utils/dish_search.py)
+            models.Index(fields=['restaurant', 'dish'], name='menu_restaurant_dish_idx'),
+        ]
+
     def __str__(self):
         """Return a string representation"""
         return f'{self.dish}'
@@ -5,3 +5,7 @@ class RestaurantsConfig(AppConfig):
     """Configuración de restaurantes."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restaurants'
+
+    def ready(self):
+        """Registrar las señales que invalidan la disponibilidad cacheada."""
+        from restaurants import signals  # noqa: F401
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0002_add_restaurants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSnapshot',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='menu_snapshot', serialize=False, to='restaurants.restaurant')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('built_version', models.PositiveIntegerField(default=0)),
+                ('content', models.BinaryField(default=b'')),
+                ('content_gzip', models.BinaryField(default=b'')),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -45,3 +45,23 @@ class Restaurant(models.Model):
             self.calendar.delete()
 
         super().delete(*args, **kwargs)
+
+
+class MenuSnapshot(models.Model):
+    """
+    Menú de un restaurante ya serializado en JSON, y una copia comprimida en gzip, para servirlo sin
+    consultar ni serializar los platos (ver utils/menu_snapshot.py).
+
+    version aumenta al cambiar un plato o un enlace del menú del restaurante; el menú guardado
+    corresponde a built_version y se vuelve a generar cuando no coinciden.
+    """
+    restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, primary_key=True, related_name='menu_snapshot')
+    version = models.PositiveIntegerField(default=1)
+    built_version = models.PositiveIntegerField(default=0)
+    content = models.BinaryField(default=b'')
+    content_gzip = models.BinaryField(default=b'')
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        """Return a string representation"""
+        return f'Menú del restaurante {self.restaurant_id} (versión {self.built_version})'
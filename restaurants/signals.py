@@ -0,0 +1,138 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from calendars.models import Calendar
+from dishes.models import Dish, Ingredient
+from restaurant_dish_link.models import RestaurantDishLink
+from restaurants.models import Restaurant
+from schedules.models import Schedule
+from tables.models import Table
+from utils.availability_cache import invalidate_availability_day, invalidate_availability_restaurant
+from utils.menu_snapshot import invalidate_menus
+
+
+def get_schedule_restaurant_ids(schedule):
+    """Dado un horario de temporada, devuelve los restaurantes cuyo calendario lo usa."""
+    return Restaurant.objects.filter(
+        Q(calendar__normal_week_schedule=schedule)
+        | Q(calendar__summer_week_schedule=schedule)
+        | Q(calendar__winter_week_schedule=schedule)
+    ).values_list('id', flat=True)
+
+
+def invalidate_schedule_availability(schedule, days):
+    """Invalidar la disponibilidad cacheada afectada por un horario."""
+    days = {day for day in days if day is not None}
+    if not days:
+        # Horario de temporada: afecta a todos los días de los restaurantes que lo usan
+        for restaurant_id in get_schedule_restaurant_ids(schedule):
+            invalidate_availability_restaurant(restaurant_id)
+        return
+
+    # Horario personalizado: solo afecta a sus días en el restaurante de su calendario
+    restaurant_id = Restaurant.objects.filter(calendar_id=schedule.calendar_id).values_list('id', flat=True).first()
+    for day in days:
+        invalidate_availability_day(restaurant_id, day)
+
+
+@receiver(post_save, sender=Restaurant)
+def invalidate_restaurant(sender, instance, raw=False, **kwargs):
+    """Invalidar la disponibilidad de un restaurante al modificarlo (por ejemplo, al cambiar su calendario)."""
+    if not raw:
+        invalidate_availability_restaurant(instance.pk)
+
+
+@receiver(post_init, sender=Table)
+def store_loaded_table_restaurant(sender, instance, **kwargs):
+    """Recordar el restaurante con el que se cargó la mesa."""
+    instance._loaded_restaurant_id = instance.__dict__.get('assigned_restaurant_id')
+
+
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def invalidate_table(sender, instance, raw=False, **kwargs):
+    """Invalidar la disponibilidad del restaurante (o restaurantes, si la mesa se ha movido) de una mesa."""
+    if raw:
+        return
+
+    for restaurant_id in {instance.assigned_restaurant_id, getattr(instance, '_loaded_restaurant_id', None)}:
+        invalidate_availability_restaurant(restaurant_id)
+    instance._loaded_restaurant_id = instance.assigned_restaurant_id
+
+
+@receiver(post_init, sender=Schedule)
+def store_loaded_schedule_day(sender, instance, **kwargs):
+    """Recordar el día con el que se cargó el horario."""
+    instance._loaded_day = instance.__dict__.get('day')
+
+
+@receiver(post_save, sender=Schedule)
+def invalidate_saved_schedule(sender, instance, raw=False, **kwargs):
+    """Invalidar la disponibilidad afectada al crear o modificar un horario."""
+    if raw:
+        return
+
+    invalidate_schedule_availability(instance, [instance.day, getattr(instance, '_loaded_day', None)])
+    instance._loaded_day = instance.day
+
+
+@receiver(pre_delete, sender=Schedule)
+def invalidate_deleted_schedule(sender, instance, **kwargs):
+    """Invalidar la disponibilidad afectada al eliminar un horario (antes de que se borre su calendario)."""
+    invalidate_schedule_availability(instance, [instance.day])
+
+
+@receiver(post_save, sender=Calendar)
+@receiver(pre_delete, sender=Calendar)
+def invalidate_calendar(sender, instance, raw=False, **kwargs):
+    """Invalidar la disponibilidad del restaurante de un calendario al modificarlo o eliminarlo."""
+    if raw:
+        return
+
+    for restaurant_id in Restaurant.objects.filter(calendar_id=instance.pk).values_list('id', flat=True):
+        invalidate_availability_restaurant(restaurant_id)
+
+
+@receiver(post_init, sender=RestaurantDishLink)
+def store_loaded_link_restaurant(sender, instance, **kwargs):
+    """Recordar el restaurante con el que se cargó el enlace del menú."""
+    instance._loaded_restaurant_id = instance.__dict__.get('restaurant_id')
+
+
+@receiver(post_save, sender=RestaurantDishLink)
+@receiver(post_delete, sender=RestaurantDishLink)
+def invalidate_link_menu(sender, instance, raw=False, **kwargs):
+    """Regenerar el menú del restaurante (o restaurantes, si el enlace se ha movido) de un enlace."""
+    if raw:
+        return
+
+    invalidate_menus([instance.restaurant_id, getattr(instance, '_loaded_restaurant_id', None)])
+    instance._loaded_restaurant_id = instance.restaurant_id
+
+
+@receiver(post_save, sender=Dish)
+def invalidate_dish_menus(sender, instance, raw=False, **kwargs):
+    """Regenerar el menú de los restaurantes que tienen el plato (al eliminarlo se eliminan sus enlaces)."""
+    if raw:
+        return
+
+    invalidate_menus(RestaurantDishLink.objects.filter(dish=instance).values_list('restaurant_id', flat=True).distinct())
+
+
+@receiver(post_init, sender=Ingredient)
+def store_loaded_ingredient_allergens(sender, instance, **kwargs):
+    """Recordar los alérgenos con los que se cargó el ingrediente."""
+    instance._loaded_allergens = instance.__dict__.get('allergens')
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_menus(sender, instance, created=False, raw=False, **kwargs):
+    """Regenerar el menú de los restaurantes con platos del ingrediente al cambiar sus alérgenos (y sus filtros)."""
+    if raw or created:
+        return
+
+    if instance.allergens != getattr(instance, '_loaded_allergens', None):
+        invalidate_menus(RestaurantDishLink.objects.filter(
+            dish__ingredient_index=instance,
+        ).values_list('restaurant_id', flat=True).distinct())
+    instance._loaded_allergens = instance.allergens
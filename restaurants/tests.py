@@ -11,8 +11,32 @@ from django.utils import timezone
 from django.utils.timezone import datetime
 from reserves.models import Reserve
 from orders.models import Order
-from dishes.models import Dish
+from dishes.models import Dish, Ingredient
 from restaurant_dish_link.models import RestaurantDishLink
+from schedules.models import Schedule
+from orders.models import OrderStatus
+from datetime import date
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from utils.ingredients import rebuild_ingredient_index
+import gzip
+import json
+
+
+def create_calendar(opened_hours):
+    """Crea un calendario (temporadas desde 2020) con el mismo horario en todas sus temporadas."""
+    calendar = Calendar.objects.create(
+        normal_start_date=date(2020, 1, 1),
+        summer_start_date=date(2020, 6, 1),
+        winter_start_date=date(2020, 12, 1),
+    )
+    schedule = Schedule.objects.create(calendar=calendar, opened_hours=opened_hours)
+    calendar.normal_week_schedule = schedule
+    calendar.summer_week_schedule = schedule
+    calendar.winter_week_schedule = schedule
+    calendar.save()
+    return calendar
 
 class RestaurantTests(TestCase):
     """Tests para el modelo Restaurant."""
@@ -311,6 +335,50 @@ class RestaurantSchedulesTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("La fecha de inicio no puede ser posterior a la fecha de fin.", response.data["error"])
 
+    def test_get_schedules_range_too_long(self):
+        """Test para obtener horarios de un rango de días demasiado largo"""
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/schedules/?start_date=2030-01-01&end_date=2031-01-02")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_schedules_query_count(self):
+        """Test para comprobar que el número de consultas no depende del número de días"""
+        with CaptureQueriesContext(connection) as one_week:
+            self.client.get(f"/restaurants/{self.restaurant.pk}/schedules/?start_date=2030-01-01&end_date=2030-01-07")
+        with CaptureQueriesContext(connection) as one_year:
+            response = self.client.get(f"/restaurants/{self.restaurant.pk}/schedules/?start_date=2030-01-01&end_date=2030-12-31")
+
+        self.assertEqual(len(response.data), 365)
+        self.assertLessEqual(len(one_year.captured_queries), len(one_week.captured_queries))
+
+    def test_get_schedules_compact(self):
+        """Test para obtener los horarios agrupando los días consecutivos iguales"""
+        calendar = Calendar.objects.create(
+            normal_start_date=date(2030, 1, 1),
+            summer_start_date=date(2030, 6, 1),
+            winter_start_date=date(2030, 12, 1),
+            closed_days=[date(2030, 1, 4)],
+        )
+        schedule = Schedule.objects.create(calendar=calendar, opened_hours=["12:00:00"])
+        calendar.normal_week_schedule = schedule
+        calendar.save()
+        Schedule.objects.create(calendar=calendar, day=date(2030, 1, 6), opened_hours=["20:00:00"])
+        restaurant = Restaurant.objects.create(name='Compact Restaurant', calendar=calendar)
+
+        response = self.client.get(f"/restaurants/{restaurant.pk}/schedules/?start_date=2030-01-01&end_date=2030-01-08&compact=true")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [(run["start_date"], run["end_date"], run["days"], run["schedule"]) for run in response.data],
+            [
+                ("2030-01-01", "2030-01-03", 3, ["12:00:00"]),
+                ("2030-01-04", "2030-01-04", 1, "Cerrado"),
+                ("2030-01-05", "2030-01-05", 1, ["12:00:00"]),
+                ("2030-01-06", "2030-01-06", 1, ["20:00:00"]),
+                ("2030-01-07", "2030-01-08", 2, ["12:00:00"]),
+            ]
+        )
+
 class RestaurantAvailableTablesTests(TestCase):
     """Tests para obtener mesas disponibles en un restaurante."""
     def setUp(self):
@@ -417,6 +485,210 @@ class RestaurantAvailableTablesTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+class RestaurantAvailableTablesHoursTests(TestCase):
+    """Tests para las horas disponibles de las mesas de un restaurante."""
+    def setUp(self):
+        """Configuración inicial de los tests."""
+        self.client = APIClient()
+
+        self.user = User.objects.create_user(
+            username='standard',
+            email='standard@example.com',
+            password='standard123',
+        )
+
+        self.calendar = create_calendar(["12:00:00", "12:30:00", "13:00:00", "13:30:00", "14:00:00"])
+        self.schedule = self.calendar.normal_week_schedule
+
+        self.restaurant = Restaurant.objects.create(name="Test Restaurant", calendar=self.calendar)
+        self.tables = [
+            Table.objects.create(
+                x_position=i,
+                y_position=1,
+                min_chairs=1,
+                max_chairs=4,
+                assigned_restaurant=self.restaurant,
+            )
+            for i in range(1, 4)
+        ]
+
+        self.order = Order.objects.create(restaurant=self.restaurant, user=self.user)
+        self.day = date(2030, 3, 4)
+        cache.clear()
+        Reserve.objects.create(
+            start_reserve=timezone.make_aware(datetime(2030, 3, 4, 12, 30)),
+            finish_reserve=timezone.make_aware(datetime(2030, 3, 4, 13, 30)),
+            assigned_order=self.order,
+            assigned_chairs=2,
+            table=self.tables[0],
+        )
+
+    def test_get_available_tables_hours(self):
+        """Test para comprobar las horas disponibles de cada mesa"""
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/available-tables/?day={self.day}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+        hours = {table["pk"]: table["available_hours"] for table in response.data}
+        self.assertListEqual(hours[self.tables[0].pk], ["12:00:00", "13:30:00", "14:00:00"])
+        self.assertListEqual(hours[self.tables[1].pk], ["12:00:00", "12:30:00", "13:00:00", "13:30:00", "14:00:00"])
+
+    def test_get_available_tables_closed_day(self):
+        """Test para comprobar que un día cerrado no tiene horas disponibles, igual que en el modo de rango"""
+        self.calendar.closed_days = [self.day]
+        self.calendar.save()
+
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/available-tables/?day={self.day}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([table["available_hours"] for table in response.data], [[], [], []])
+
+        response = self.client.get(
+            f"/restaurants/{self.restaurant.pk}/available-tables/?start_date={self.day}&end_date={self.day}"
+        )
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([table["available_hours"][str(self.day)] for table in data["tables"]], [[], [], []])
+
+    def test_get_available_tables_ignores_cancelled_orders(self):
+        """Test para comprobar que las reservas de pedidos cancelados no ocupan la mesa"""
+        self.order.status = OrderStatus.CANCELLED
+        self.order.save()
+
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/available-tables/?day={self.day}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        hours = {table["pk"]: table["available_hours"] for table in response.data}
+        self.assertEqual(len(hours[self.tables[0].pk]), 5)
+
+    def test_get_available_tables_query_count(self):
+        """Test para comprobar que el número de consultas no depende del número de mesas"""
+        url = f"/restaurants/{self.restaurant.pk}/available-tables/?day={self.day}"
+        # Compilar antes el índice del calendario y medir solo el cálculo de la disponibilidad
+        self.client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as few_tables:
+            self.client.get(url)
+
+        for i in range(4, 30):
+            Table.objects.create(x_position=i, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant)
+
+        with CaptureQueriesContext(connection) as many_tables:
+            self.client.get(url)
+
+        self.assertEqual(len(few_tables.captured_queries), len(many_tables.captured_queries))
+
+    def test_get_available_tables_range(self):
+        """Test para obtener la disponibilidad de las mesas en un rango de días"""
+        self.calendar.closed_days = [date(2030, 3, 5)]
+        self.calendar.save()
+
+        response = self.client.get(
+            f"/restaurants/{self.restaurant.pk}/available-tables/?start_date=2030-03-03&end_date=2030-03-05"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertListEqual([day["date"] for day in data["days"]], ["2030-03-03", "2030-03-04", "2030-03-05"])
+        self.assertEqual(data["days"][2]["schedule"], "Cerrado")
+        self.assertEqual(len(data["tables"]), 3)
+
+        hours = {table["pk"]: table["available_hours"] for table in data["tables"]}
+        self.assertListEqual(hours[self.tables[0].pk]["2030-03-04"], ["12:00:00", "13:30:00", "14:00:00"])
+        self.assertEqual(len(hours[self.tables[0].pk]["2030-03-03"]), 5)
+        self.assertListEqual(hours[self.tables[0].pk]["2030-03-05"], [])
+
+    def test_get_available_tables_range_too_long(self):
+        """Test para obtener la disponibilidad de un rango de días demasiado largo"""
+        response = self.client.get(
+            f"/restaurants/{self.restaurant.pk}/available-tables/?start_date=2030-01-01&end_date=2030-12-31"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_available_tables_range_missing_end_date(self):
+        """Test para obtener la disponibilidad de un rango sin fecha de fin"""
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/available-tables/?start_date=2030-01-01")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Debes proporcionar 'start_date' y 'end_date'.", response.data["error"])
+
+    def get_hours(self, day=None):
+        """Devuelve las horas disponibles de cada mesa para un día."""
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/available-tables/?day={day or self.day}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {table["pk"]: table["available_hours"] for table in response.data}
+
+    def test_get_available_tables_cache(self):
+        """Test para comprobar que la segunda consulta del mismo día se sirve desde la caché"""
+        url = f"/restaurants/{self.restaurant.pk}/available-tables/?day={self.day}"
+        with CaptureQueriesContext(connection) as miss:
+            first = self.client.get(url)
+        with CaptureQueriesContext(connection) as hit:
+            second = self.client.get(url)
+
+        self.assertEqual(first.data, second.data)
+        self.assertLess(len(hit.captured_queries), len(miss.captured_queries))
+
+        admin_user = User.objects.create_user(
+            username='admin23', email='admin@example.com', password='admin123', is_admin=True,
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=admin_user).key)
+        response = self.client.get("/restaurants/available-tables-cache/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["hits"], 1)
+        self.assertEqual(response.data["misses"], 1)
+
+    def test_get_available_tables_cache_stats_requires_admin(self):
+        """Test para comprobar que los contadores de la caché no son públicos"""
+        response = self.client.get("/restaurants/available-tables-cache/")
+
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+
+    def test_get_available_tables_cache_invalidated_by_reserve(self):
+        """Test para comprobar que una reserva invalida solo su día"""
+        self.get_hours()
+        self.get_hours(date(2030, 3, 5))
+
+        Reserve.objects.create(
+            start_reserve=timezone.make_aware(datetime(2030, 3, 4, 12, 0)),
+            finish_reserve=timezone.make_aware(datetime(2030, 3, 4, 13, 0)),
+            assigned_order=self.order,
+            assigned_chairs=2,
+            table=self.tables[1],
+        )
+
+        self.assertListEqual(self.get_hours()[self.tables[1].pk], ["13:00:00", "13:30:00", "14:00:00"])
+        with CaptureQueriesContext(connection) as other_day:
+            self.get_hours(date(2030, 3, 5))
+        self.assertEqual(len(other_day.captured_queries), 1)
+
+    def test_get_available_tables_cache_invalidated_by_cancel_order(self):
+        """Test para comprobar que cancelar un pedido invalida la caché"""
+        self.get_hours()
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+        response = self.client.post(f"/users/cancel_order/{self.order.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(self.get_hours()[self.tables[0].pk]), 5)
+
+    def test_get_available_tables_cache_invalidated_by_table_and_schedule(self):
+        """Test para comprobar que modificar una mesa o un horario invalida la caché"""
+        self.get_hours()
+
+        self.tables[2].is_active = False
+        self.tables[2].save()
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/available-tables/?day={self.day}")
+        self.assertFalse({table["pk"]: table["is_active"] for table in response.data}[self.tables[2].pk])
+
+        Schedule.objects.create(calendar=self.calendar, day=self.day, opened_hours=["20:00:00"])
+        self.assertListEqual(self.get_hours()[self.tables[0].pk], ["20:00:00"])
+
+        self.schedule.opened_hours = ["12:00:00"]
+        self.schedule.save()
+        self.assertListEqual(self.get_hours(date(2030, 3, 5))[self.tables[0].pk], ["12:00:00"])
+
 class RestaurantMenuTests(TestCase):
     """Tests para obtener el menú de un restaurante"""
     def setUp(self):
@@ -462,4 +734,127 @@ class RestaurantMenuTests(TestCase):
         response = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_get_menu_in_stock(self):
+        """Test para indicar qué platos del menú tienen stock sin consultas por plato"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+        self.link2.stock = 0
+        self.link2.save()
+        dish3 = Dish.objects.create(name='Dish 3', description='Description 3', price=5.0, calories=50, preparation_time=5)
+        RestaurantDishLink.objects.create(restaurant=self.restaurant, dish=dish3, stock=1)
+
+        # Autenticación, menú (todavía sin generar), restaurante, alta del menú, enlaces con sus platos y menú generado
+        with self.assertNumQueries(6):
+            response = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        in_stock = {dish['pk']: dish['in_stock'] for dish in response.json()}
+        self.assertDictEqual(in_stock, {self.dish1.pk: True, self.dish2.pk: False, dish3.pk: True})
+
+    def test_get_menu_snapshot(self):
+        """Test para servir el menú generado, comprimido y con ETag, y regenerarlo al cambiar un plato"""
+        first = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/")
+        etag = first['ETag']
+
+        # Solo se lee el menú generado
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+
+        compressed = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/", HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), first.content)
+        self.assertEqual(compressed['ETag'], etag[:-1] + '-gzip"')
+        not_modified = self.client.get(
+            f"/restaurants/{self.restaurant.pk}/menu/", HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(not_modified.status_code, status.HTTP_200_OK)
+        self.assertEqual(not_modified['Content-Encoding'], 'gzip')
+
+        self.dish1.name = 'Dish 1 renamed'
+        self.dish1.save()
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Dish 1 renamed', [dish['name'] for dish in response.json()])
+
+    def test_get_menu_not_found(self):
+        """Test para obtener el menú de un restaurante inexistente"""
+        response = self.client.get("/restaurants/99999/menu/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def set_ingredients(self):
+        """Asigna ingredientes a los platos del menú."""
+        self.dish1.ingredients = ['Leche de coco', 'Arroz', 'Nueces']
+        self.dish1.save()
+        self.dish2.ingredients = ['Lechuga', 'Queso parmesano', 'Pollo']
+        self.dish2.save()
+
+    def get_menu_pks(self, **params):
+        """Devuelve los platos del menú filtrado."""
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [dish['pk'] for dish in response.json()]
+
+    def test_get_menu_filter_ingredients(self):
+        """Test para filtrar el menú por ingredientes incluidos y excluidos"""
+        self.set_ingredients()
+
+        # "leche" no coincide con "lechuga"
+        self.assertListEqual(self.get_menu_pks(exclude_ingredients='Leche'), [self.dish2.pk])
+        self.assertListEqual(self.get_menu_pks(exclude_ingredients='nueces,queso'), [])
+        self.assertListEqual(self.get_menu_pks(include_ingredients='pollo,lechuga'), [self.dish2.pk])
+        self.assertListEqual(self.get_menu_pks(include_ingredients='arroz', exclude_ingredients='pollo'), [self.dish1.pk])
+
+    def test_get_menu_filter_allergens(self):
+        """Test para excluir los platos con ingredientes de unos alérgenos y actualizar el filtro al cambiarlos"""
+        self.set_ingredients()
+        Ingredient.objects.filter(name='nueces').update(allergens=['frutos de cascara'])
+        cheese = Ingredient.objects.get(name='queso parmesano')
+        cheese.allergens = []
+        cheese.save()
+
+        self.assertListEqual(self.get_menu_pks(exclude_allergens='Frutos de cáscara'), [self.dish2.pk])
+        self.assertCountEqual(self.get_menu_pks(exclude_allergens='lacteos'), [self.dish1.pk, self.dish2.pk])
+
+        cheese.allergens = ['lacteos']
+        cheese.save()
+        self.assertListEqual(self.get_menu_pks(exclude_allergens='lacteos'), [self.dish1.pk])
+
+    def test_get_menu_filter_cache(self):
+        """Test para servir el menú filtrado desde la caché hasta que cambie su versión"""
+        cache.clear()
+        self.set_ingredients()
+        first = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/", {'exclude_ingredients': 'nueces'})
+
+        # Solo se lee el menú generado
+        with self.assertNumQueries(1):
+            cached = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/", {'exclude_ingredients': 'nueces'})
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertNotEqual(first['ETag'], self.client.get(f"/restaurants/{self.restaurant.pk}/menu/")['ETag'])
+
+        self.dish2.ingredients = ['Nueces']
+        self.dish2.save()
+        self.assertListEqual(self.get_menu_pks(exclude_ingredients='nueces'), [])
+
+    def test_get_menu_filter_after_rebuild_ingredient_index(self):
+        """Test para no servir de la caché un menú filtrado después de reconstruir los ingredientes"""
+        cache.clear()
+        self.set_ingredients()
+        self.assertListEqual(self.get_menu_pks(exclude_ingredients='nueces'), [self.dish2.pk])
+
+        # Sin señales, como un bulk_update: el menú filtrado solo cambia al reconstruir los ingredientes
+        Dish.objects.filter(pk=self.dish2.pk).update(ingredients=['Nueces'])
+        self.assertEqual(rebuild_ingredient_index(), Dish.ingredient_index.through.objects.count())
+        self.assertListEqual(self.get_menu_pks(exclude_ingredients='nueces'), [])
+
+    def test_get_menu_filter_too_many_terms(self):
+        """Test para rechazar un filtro con demasiados ingredientes"""
+        terms = ','.join(f'ingrediente {index}' for index in range(50))
+        response = self.client.get(f"/restaurants/{self.restaurant.pk}/menu/", {'exclude_ingredients': terms})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
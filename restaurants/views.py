@@ -7,16 +7,31 @@ from users.permissions import IsStandardUser, IsAdminUser
 from rest_framework.decorators import action
 from tables.models import Table
 from tables.serializers import TableSerializer
-from reserves.models import Reserve
-from datetime import datetime, timedelta
+from datetime import datetime
 from django.core.exceptions import ObjectDoesNotExist
-from schedules.models import Schedule
-from utils.calendar_utils import get_schedule_for_day, get_occupied_hours, get_available_hours
-from orders.models import OrderStatus
+from utils.calendar_utils import get_opened_slots_for_range, get_schedules_for_range, compact_schedules
+from utils.availability import get_tables_availability, iter_tables_availability_range
+from utils.slots import mask_to_hours
+from utils.fleet_occupancy import get_fleet_occupancy
+from utils.availability_cache import get_cached_availability, get_availability_cache_stats
 from dishes.models import Dish
 from dishes.serializers import DishModelSerializer
 from rest_framework import generics
-from restaurant_dish_link.models import RestaurantDishLink
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.exceptions import NotFound
+from utils.export import accepts_gzip
+from utils.menu_snapshot import get_filtered_menu, get_menu_etag, get_menu_filter_digest, get_menu_snapshot
+from utils.ingredients import parse_ingredient_terms
+import json
+
+# Máximo de días que se pueden consultar de una vez en las mesas disponibles
+MAX_AVAILABILITY_RANGE_DAYS = 31
+# Máximo de días que se pueden consultar de una vez en los horarios
+MAX_SCHEDULES_RANGE_DAYS = 366
+# Máximo de días que se pueden consultar de una vez en la ocupación de varios restaurantes
+MAX_OCCUPANCY_RANGE_DAYS = 31
 
 class MenuView(generics.ListAPIView):
     """Vista para obtener el menú de un restaurante."""
@@ -61,12 +76,46 @@ class RestaurantViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'], url_path='menu')
     def get_menu(self, request, pk=None):
-        """Obtener el menú de un restaurante."""
-        restaurant = self.get_object()
-        menu_links = RestaurantDishLink.objects.filter(restaurant=restaurant)
-        dishes = [link.dish for link in menu_links]
-        serializer = DishModelSerializer(dishes, many=True)
-        return Response(serializer.data)
+        """
+        Obtener el menú de un restaurante ya serializado (ver utils/menu_snapshot.py), en gzip si el cliente
+        lo acepta. Con If-None-Match y el ETag de la versión actual devuelve 304 sin el menú.
+
+        Se puede filtrar por ingredientes separados por comas: include_ingredients (platos que los llevan
+        todos), exclude_ingredients (ninguno) y exclude_allergens (ningún ingrediente con esos alérgenos).
+        """
+        try:
+            restaurant_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        try:
+            filters = [
+                parse_ingredient_terms(request.query_params.get(param))
+                for param in ('include_ingredients', 'exclude_ingredients', 'exclude_allergens')
+            ]
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        filtered = any(filters)
+
+        # El menú filtrado se genera a partir del JSON, así que se envía sin comprimir
+        compressed = accepts_gzip(request) and not filtered
+        snapshot = get_menu_snapshot(restaurant_id, compressed)
+        if snapshot is None:
+            raise NotFound()
+
+        etag = get_menu_etag(snapshot, get_menu_filter_digest(*filters) if filtered else None, compressed)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif filtered:
+            response = HttpResponse(get_filtered_menu(snapshot, *filters), content_type='application/json')
+        elif compressed:
+            response = HttpResponse(snapshot.content_gzip, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(snapshot.content, content_type='application/json')
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
 
     @action(detail=True, methods=['get'], url_path='schedules')
     def get_schedules(self, request, pk=None):
@@ -106,43 +155,18 @@ class RestaurantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        response_data = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            custom_schedule = Schedule.objects.filter(calendar=calendar, day=current_date).first()
-
-            if custom_schedule:
-                response_data.append({
-                    "date": str(current_date),
-                    "schedule": [str(t) for t in custom_schedule.opened_hours],
-                })
-            elif current_date in calendar.closed_days:
-                response_data.append({
-                    "date": str(current_date),
-                    "schedule": "Cerrado",
-                })
-            else:
-                # Determinar la estación actual
-                if calendar.normal_start_date <= current_date < calendar.summer_start_date:
-                    schedule = calendar.normal_week_schedule
-                elif calendar.summer_start_date <= current_date < calendar.winter_start_date:
-                    schedule = calendar.summer_week_schedule
-                else:
-                    schedule = calendar.winter_week_schedule
-
-                if schedule:
-                    response_data.append({
-                        "date": str(current_date),
-                        "schedule": [str(t) for t in schedule.opened_hours],
-                    })
-                else:
-                    response_data.append({
-                        "date": str(current_date),
-                        "schedule": "No hay horario disponible",
-                    })
-
-            current_date += timedelta(days=1)
+        if (end_date - start_date).days + 1 > MAX_SCHEDULES_RANGE_DAYS:
+            return Response(
+                {"error": f"El rango de fechas no puede superar los {MAX_SCHEDULES_RANGE_DAYS} días."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Todos los horarios personalizados del rango se resuelven de una vez (sin consultas por día)
+        response_data = get_schedules_for_range(calendar, start_date, end_date)
+
+        # Modo compacto: agrupar los días consecutivos con el mismo horario
+        if request.query_params.get('compact', '').lower() in ('1', 'true'):
+            response_data = compact_schedules(response_data)
 
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -150,15 +174,17 @@ class RestaurantViewSet(viewsets.ModelViewSet):
     def get_available_tables(self, request, pk=None):
         """Obtener las mesas disponibles de un restaurante."""
         restaurant = self.get_object()
-        calendar = restaurant.calendar
 
-        if not calendar:
+        if not restaurant.calendar_id:
             return Response(
                 {"error": "Este restaurante no tiene un calendario asignado."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
         day_str = request.query_params.get("day")
+        if not day_str and request.query_params.get("start_date"):
+            return self.get_available_tables_range(request, restaurant, restaurant.calendar)
+
         if not day_str:
             return Response(
                 {"error": "Debe proporcionar el parámetro 'day' en formato 'YYYY-MM-DD'."},
@@ -173,52 +199,127 @@ class RestaurantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Obtener el Schedule para el día especificado
-        schedule = get_schedule_for_day(calendar, day)
+        def compute_availability():
+            # Franjas de apertura del día: los días cerrados no tienen horas, como en el modo de rango
+            opened_slots = get_opened_slots_for_range(restaurant.calendar, day, day)[day]
+
+            # Calcular las horas disponibles de todas las mesas con una sola consulta de reservas
+            return get_tables_availability(restaurant.tables.all(), day, opened_slots or 0)
+
+        # La disponibilidad se cachea por restaurante y día, y se invalida al cambiar sus reservas,
+        # mesas, horarios o calendario (ver restaurants/signals.py y reserves/signals.py)
+        response_data = get_cached_availability(restaurant.pk, day, compute_availability)
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='available-tables-cache')
+    def get_available_tables_cache(self, request):
+        """Obtener los aciertos y fallos de la caché de mesas disponibles."""
+        return Response(get_availability_cache_stats(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='occupancy')
+    def get_occupancy(self, request):
+        """Obtener la ocupación de las mesas de varios restaurantes (por mesa, restaurante y franja)."""
+        start_date_str = request.query_params.get("start_date")
+        end_date_str = request.query_params.get("end_date")
 
-        if not schedule:
+        if not start_date_str or not end_date_str:
             return Response(
-                {"error": f"No se encontró un Schedule para el día {day_str}."},
-                status=status.HTTP_404_NOT_FOUND
+                {"error": "Debes proporcionar 'start_date' y 'end_date'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use 'YYYY-MM-DD'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if start_date > end_date:
+            return Response(
+                {"error": "La fecha de inicio no puede ser posterior a la fecha de fin."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if (end_date - start_date).days + 1 > MAX_OCCUPANCY_RANGE_DAYS:
+            return Response(
+                {"error": f"El rango de fechas no puede superar los {MAX_OCCUPANCY_RANGE_DAYS} días."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Restaurantes separados por comas; por defecto, todos
+        restaurants_str = request.query_params.get("restaurants")
+        if restaurants_str:
+            try:
+                restaurant_ids = [int(restaurant_id) for restaurant_id in restaurants_str.split(",")]
+            except ValueError:
+                return Response(
+                    {"error": "El parámetro 'restaurants' debe ser una lista de IDs separados por comas."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            restaurant_ids = list(Restaurant.objects.values_list('id', flat=True))
+
+        return Response(get_fleet_occupancy(restaurant_ids, start_date, end_date), status=status.HTTP_200_OK)
+
+    def get_available_tables_range(self, request, restaurant, calendar):
+        """Obtener las mesas disponibles de un restaurante para un rango de días (mesas x días x horas)."""
+        start_date_str = request.query_params.get("start_date")
+        end_date_str = request.query_params.get("end_date")
+
+        if not end_date_str:
+            return Response(
+                {"error": "Debes proporcionar 'start_date' y 'end_date'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use 'YYYY-MM-DD'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if start_date > end_date:
+            return Response(
+                {"error": "La fecha de inicio no puede ser posterior a la fecha de fin."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        opening_hours = schedule.opened_hours
+        if (end_date - start_date).days + 1 > MAX_AVAILABILITY_RANGE_DAYS:
+            return Response(
+                {"error": f"El rango de fechas no puede superar los {MAX_AVAILABILITY_RANGE_DAYS} días."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Obtener todas las mesas del restaurante
-        tables = restaurant.tables.all()
+        # Resolver los horarios de todo el rango antes de empezar a enviar la respuesta
+        opened_slots_by_day = get_opened_slots_for_range(calendar, start_date, end_date)
 
-        # Filtrar las reservas para el día especificado, excluyendo las canceladas
-        reservations_day = Reserve.objects.filter(
-            start_reserve__date=day,
-            table__in=tables
-        ).exclude(assigned_order__status=OrderStatus.CANCELLED)
+        return StreamingHttpResponse(
+            stream_available_tables_range(start_date, end_date, restaurant.tables.all(), opened_slots_by_day),
+            content_type="application/json",
+        )
 
-        # Calcular las horas ocupadas por mesa de forma individual
-        occupied_hours_per_table = {
-            table.id: get_occupied_hours(
-                reservations_day.filter(table=table),
-                opening_hours
-            ) for table in tables
+
+def stream_available_tables_range(start_date, end_date, tables, opened_slots_by_day):
+    """Genera el JSON de disponibilidad de un rango de días mesa a mesa, sin construirlo entero en memoria."""
+    days = [
+        {
+            "date": str(day),
+            "schedule": mask_to_hours(slots) if slots is not None else "Cerrado",
         }
+        for day, slots in sorted(opened_slots_by_day.items())
+    ]
+    yield '{"start_date": %s, "end_date": %s, "days": %s, "tables": [' % (
+        json.dumps(str(start_date)), json.dumps(str(end_date)), json.dumps(days)
+    )
+
+    for index, table in enumerate(iter_tables_availability_range(tables, opened_slots_by_day)):
+        yield ("," if index else "") + json.dumps(table)
 
-        # Calcular las horas disponibles para cada mesa
-        response_data = []
-        for table in tables:
-            available_hours = get_available_hours(
-                opening_hours,
-                occupied_hours_per_table[table.id]
-            )
-
-            # Crear la estructura para cada mesa con detalles y horas disponibles
-            table_info = {
-                "pk": table.pk,
-                "x_position": table.x_position,
-                "y_position": table.y_position,
-                "min_chairs": table.min_chairs,
-                "max_chairs": table.max_chairs,
-                "is_active": table.is_active,
-                "available_hours": available_hours
-            }
-            response_data.append(table_info)
-
-        return Response(response_data, status=status.HTTP_200_OK)
\ No newline at end of file
+    yield "]}"
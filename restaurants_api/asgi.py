@@ -3,14 +3,31 @@ ASGI config for restaurants_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+It only serves the kitchen feed (Server-Sent Events, see ``utils.kitchen_feed``), whose long-lived
+connections need an event loop. The rest of the API is served through WSGI (``wsgi.py``): its
+views, and in particular the streamed exports, run synchronous database queries, which Django 3.2
+does not allow inside the event loop. See the ``feed`` service in docker-compose.yml.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurants_api.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from utils.kitchen_feed import KITCHEN_FEED_PATH, kitchen_feed_app, send_error  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Send kitchen feed requests to the SSE application and answer 404 to the rest."""
+    if scope['type'] != 'http':
+        return
+    if KITCHEN_FEED_PATH.match(scope['path']):
+        await kitchen_feed_app(scope, receive, send)
+        return
+    await send_error(send, 404, "No encontrado.")
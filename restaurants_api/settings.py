@@ -38,9 +38,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_extensions',
     'corsheaders',
     'rest_framework',
+    'django_filters',
     'ckeditor',
     'rest_framework.authtoken',
     'users',
@@ -104,6 +106,21 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Memcached, compartido por todos los procesos (web y feed) para que las invalidaciones de la caché
+# lleguen a todos (ver el servicio memcached de docker-compose.yml). Sin MEMCACHED_LOCATION se usa la
+# caché en memoria de Django, que es de cada proceso: solo sirve para desarrollo con un único proceso.
+
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -164,7 +181,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'utils.pagination.SelectablePagination',
     'PAGE_SIZE': 10,
 }
 
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:40
+
+from datetime import time
+from django.db import migrations, models
+
+# Franjas de media hora del día (como en utils/slots.py): el bit N es la franja N
+SLOT_SECONDS = 30 * 60
+BATCH_SIZE = 2000
+
+
+def hours_to_mask(hours):
+    # Máscara de franjas de una lista de horas de apertura (time o 'HH:MM:SS')
+    mask = 0
+    for hour in hours or []:
+        if isinstance(hour, str):
+            hour = time.fromisoformat(hour)
+        mask |= 1 << (hour.hour * 3600 + hour.minute * 60 + hour.second) // SLOT_SECONDS
+    return mask
+
+
+def fill_opened_slots(apps, schema_editor):
+    # Calcular la máscara de franjas de los horarios existentes, por lotes
+    Schedule = apps.get_model('schedules', 'Schedule')
+
+    batch = []
+    for schedule in Schedule.objects.only('opened_hours').iterator(chunk_size=BATCH_SIZE):
+        schedule.opened_slots = hours_to_mask(schedule.opened_hours)
+        batch.append(schedule)
+        if len(batch) == BATCH_SIZE:
+            Schedule.objects.bulk_update(batch, ['opened_slots'], batch_size=BATCH_SIZE)
+            batch = []
+    Schedule.objects.bulk_update(batch, ['opened_slots'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0003_alter_schedule_day'),
+        # Después de crear los horarios iniciales, para calcular también sus franjas
+        ('calendars', '0004_create_calendar_and_schedules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='opened_slots',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_opened_slots, migrations.RunPython.noop),
+    ]
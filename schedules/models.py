@@ -3,6 +3,7 @@ from django.contrib.postgres.fields import ArrayField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from datetime import date, time
 from utils.validators import validate_half_hour, validate_unique_schedule_day
+from utils.slots import hours_to_mask
 
 class Schedule(models.Model):
     """Modelo para horarios"""
@@ -16,6 +17,10 @@ class Schedule(models.Model):
         validators=[validate_half_hour]
     )
 
+    # Las mismas horas de apertura como máscara de 48 franjas de media hora (bit N = franja N).
+    # Se calcula al guardar y es lo que leen la disponibilidad y los horarios de la API.
+    opened_slots = models.BigIntegerField(default=0, editable=False)
+
     calendar = models.ForeignKey(
         'calendars.Calendar',
         on_delete=models.CASCADE,
@@ -32,6 +37,9 @@ class Schedule(models.Model):
     def save(self, *args, **kwargs):
         """Validar y guardar el objeto."""
         self.clean()
+        self.opened_slots = hours_to_mask(self.opened_hours)
+        if kwargs.get('update_fields') is not None and 'opened_hours' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'opened_slots'}
         super().save(*args, **kwargs)
 
     def __str__(self):
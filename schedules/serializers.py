@@ -3,6 +3,7 @@ from schedules.models import Schedule
 from django.core.exceptions import ValidationError
 from calendars.models import Calendar
 from utils.validators import validate_half_hour, validate_unique_schedule_day
+from utils.slots import mask_to_hours
 
 class ScheduleSerializer(serializers.ModelSerializer):
     """Serializer para el modelo Schedule"""
@@ -29,6 +30,12 @@ class ScheduleSerializer(serializers.ModelSerializer):
             'calendar',
         )
 
+    def to_representation(self, instance):
+        """Devolver las horas de apertura a partir de la máscara de franjas, sin convertir cada hora."""
+        data = super().to_representation(instance)
+        data['opened_hours'] = mask_to_hours(instance.opened_slots)
+        return data
+
     def validate(self, data):
         """Validar que no exista un Schedule con el mismo día en el mismo calendario"""
         calendar = data.get("calendar")
@@ -0,0 +1,64 @@
+import random
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from tables.models import Table
+from utils.table_assignment import find_best_tables
+
+# Capacidades (min_chairs, max_chairs) de las mesas generadas
+BENCHMARK_TABLE_SIZES = ((1, 2), (2, 4), (4, 6), (6, 8))
+
+
+def build_benchmark_tables(count, seed=0):
+    """Genera en memoria (sin guardar) un plano de mesas en cuadrícula con capacidades aleatorias."""
+    rng = random.Random(seed)
+    columns = max(1, int(count ** 0.5))
+    tables = []
+    for index in range(count):
+        min_chairs, max_chairs = rng.choice(BENCHMARK_TABLE_SIZES)
+        tables.append(Table(
+            pk=index + 1,
+            x_position=index % columns + 1,
+            y_position=index // columns + 1,
+            min_chairs=min_chairs,
+            max_chairs=max_chairs,
+        ))
+    return tables
+
+
+def run_table_assignment_benchmark(count, iterations, free_ratio=0.5, max_party_size=16, seed=0):
+    """Mide el tiempo de find_best_tables y devuelve (media, máximo) en milisegundos."""
+    rng = random.Random(seed)
+    tables = build_benchmark_tables(count, seed)
+    timings = []
+
+    for _ in range(iterations):
+        free_tables = [table for table in tables if rng.random() < free_ratio]
+        party_size = rng.randint(1, max_party_size)
+
+        start = perf_counter()
+        find_best_tables(free_tables, party_size)
+        timings.append((perf_counter() - start) * 1000)
+
+    return sum(timings) / len(timings), max(timings)
+
+
+class Command(BaseCommand):
+    """Mide el rendimiento de la asignación automática de mesas."""
+    help = 'Mide cuánto tarda la asignación automática de mesas (find_best_tables) en un restaurante generado en memoria.'
+
+    def add_arguments(self, parser):
+        """Argumentos del comando."""
+        parser.add_argument('--tables', type=int, default=200, help='Número de mesas del restaurante.')
+        parser.add_argument('--iterations', type=int, default=500, help='Número de asignaciones a medir.')
+        parser.add_argument('--free-ratio', type=float, default=0.5, help='Proporción de mesas libres.')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos generados.')
+
+    def handle(self, *args, **options):
+        """Ejecutar el comando."""
+        mean, worst = run_table_assignment_benchmark(
+            options['tables'], options['iterations'], options['free_ratio'], seed=options['seed']
+        )
+        self.stdout.write(
+            f"{options['tables']} mesas, {options['iterations']} asignaciones: "
+            f"media {mean:.3f} ms, máximo {worst:.3f} ms"
+        )
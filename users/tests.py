@@ -1,10 +1,13 @@
 # Django
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from unittest import mock
 
 # Python
 from PIL import Image
 import tempfile
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 # Django Rest Framework
 from rest_framework.test import APIClient
@@ -12,10 +15,43 @@ from rest_framework import status
 
 # Models
 from users.models import User
-from orders.models import Order, OrderStatus
+from orders.models import ArchivedOrder, Order, OrderStatus, IdempotencyKey, OrderIntake, OrderIntakeStatus
 from restaurants.models import Restaurant
+from calendars.models import Calendar
+from schedules.models import Schedule
+from tables.models import Table
+from reserves.models import Reserve, TableOccupancy
+from dishes.models import Dish
+from order_lines.models import OrderLine
+from cartcodes.models import CartCode
+from restaurant_dish_link.models import RestaurantDishLink
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework.authtoken.models import Token
+from utils.idempotency import delete_expired_idempotency_keys
+from utils.order_archive import archive_orders, get_user_order_history, serialize_order_history
+from utils.order_intake import (
+    INTAKE_MAX_ATTEMPTS, INTAKE_STALE_TIMEOUT, enqueue_order, get_intake_metrics, process_intake, process_intake_batch,
+    requeue_stale_intakes, run_intake_worker,
+)
+
+
+def create_calendar(opened_hours=("20:00:00", "20:30:00")):
+    """Crea un calendario (temporadas desde 2020) con el mismo horario en todas sus temporadas."""
+    calendar = Calendar.objects.create(
+        normal_start_date=date(2020, 1, 1),
+        summer_start_date=date(2020, 6, 1),
+        winter_start_date=date(2020, 12, 1),
+    )
+    schedule = Schedule.objects.create(calendar=calendar, opened_hours=list(opened_hours))
+    calendar.normal_week_schedule = schedule
+    calendar.summer_week_schedule = schedule
+    calendar.winter_week_schedule = schedule
+    calendar.save()
+    return calendar
 
 
 class UserTestCase(TestCase):
@@ -717,6 +753,81 @@ class GetOrderByPkTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+class OrderArchiveTests(TestCase):
+    """Pruebas del archivado de pedidos antiguos."""
+    def setUp(self):
+        """Configuración de datos de prueba."""
+        self.user = User.objects.create_user(
+            username='archivetester',
+            email='archive@madirex.com',
+            password='Password123!',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth_client = APIClient()
+        self.auth_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.restaurant = Restaurant.objects.create(name='Test Restaurant')
+        self.table = Table.objects.create(x_position=1, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant)
+        self.dish = Dish.objects.create(name='Dish', description='Description', price=10, calories=100, preparation_time=10)
+
+        # Pedido completado hace un año, con una línea y una reserva
+        created_at = timezone.now() - timedelta(days=365)
+        self.old_order = Order.objects.create(user=self.user, restaurant=self.restaurant, total=10, total_dishes=1, status=OrderStatus.COMPLETED)
+        OrderLine.objects.create(order=self.old_order, dish=self.dish, quantity=1, price=self.dish.price)
+        Reserve.objects.create(
+            start_reserve=created_at + timedelta(hours=1), finish_reserve=created_at + timedelta(hours=2),
+            assigned_order=self.old_order, assigned_chairs=2, table=self.table,
+        )
+        Order.objects.filter(pk=self.old_order.pk).update(created_at=created_at)
+        # Pedido antiguo todavía pendiente y pedido reciente: no se archivan
+        self.pending_order = Order.objects.create(user=self.user, restaurant=self.restaurant, total=20, total_dishes=2)
+        Order.objects.filter(pk=self.pending_order.pk).update(created_at=created_at - timedelta(days=1))
+        self.recent_order = Order.objects.create(user=self.user, restaurant=self.restaurant, total=30, total_dishes=3, status=OrderStatus.COMPLETED)
+
+    def test_archive_orders(self):
+        """Test para mover los pedidos antiguos con sus líneas y reservas al archivo"""
+        self.assertTrue(TableOccupancy.objects.filter(table=self.table).exists())
+
+        self.assertEqual(archive_orders(months=6, batch_size=1), 1)
+
+        self.assertFalse(Order.objects.filter(pk=self.old_order.pk).exists())
+        self.assertFalse(OrderLine.objects.filter(order_id=self.old_order.pk).exists())
+        self.assertFalse(Reserve.objects.filter(assigned_order_id=self.old_order.pk).exists())
+        self.assertFalse(TableOccupancy.objects.filter(table=self.table, reserves__gt=0).exists())
+        archived_order = ArchivedOrder.objects.get(pk=self.old_order.pk)
+        self.assertEqual(archived_order.data['order_lines'][0]['dish_name'], self.dish.name)
+        self.assertEqual(len(archived_order.data['reserves']), 1)
+        self.assertEqual(archive_orders(months=6), 0)
+
+    def test_get_orders_with_archived(self):
+        """Test para listar y obtener los pedidos archivados junto a los activos"""
+        archive_orders(months=6)
+
+        response = self.auth_client.get('/users/orders/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [order['pk'] for order in response.data['results']],
+            [self.recent_order.pk, self.old_order.pk, self.pending_order.pk],
+        )
+
+        first = self.auth_client.get('/users/orders/', {'pagination': 'cursor', 'page_size': 2})
+        second = self.auth_client.get(first.data['next'])
+        self.assertEqual([order['pk'] for order in second.data['results']], [self.pending_order.pk])
+
+        response = self.auth_client.get(f'/users/order/{self.old_order.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], '10.00')
+
+    def test_serialize_whole_order_history(self):
+        """Test para recorrer toda la historia sin paginar, sin contar los pedidos"""
+        archive_orders(months=6)
+
+        with CaptureQueriesContext(connection) as queries:
+            orders = serialize_order_history(get_user_order_history(self.user))
+        self.assertEqual([order['pk'] for order in orders], [self.recent_order.pk, self.old_order.pk, self.pending_order.pk])
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+
 class CancelOrderTests(TestCase):
     """Pruebas para cancelar un pedido."""
     def setUp(self):
@@ -779,3 +890,490 @@ class CancelOrderTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', json.loads(response.content))
         self.assertEqual(json.loads(response.content)['error'], "El pedido ya está cancelado.")
+
+
+class OrderTableAssignmentTests(TestCase):
+    """Pruebas para la asignación automática de mesas al crear un pedido."""
+    def setUp(self):
+        """Configuración de datos de prueba."""
+        self.user = User.objects.create_user(
+            username='ordertester',
+            email='orders@madirex.com',
+            password='Password123!',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth_client = APIClient()
+        self.auth_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.calendar = create_calendar()
+
+        self.restaurant = Restaurant.objects.create(name='Test Restaurant', calendar=self.calendar)
+        self.small_table = Table.objects.create(x_position=1, y_position=1, min_chairs=1, max_chairs=2, assigned_restaurant=self.restaurant)
+        self.big_table = Table.objects.create(x_position=2, y_position=1, min_chairs=2, max_chairs=6, assigned_restaurant=self.restaurant)
+
+    def create_order(self, party_size):
+        """Crear un pedido sin mesas indicando el número de comensales."""
+        return self.auth_client.post('/users/order/', {
+            'restaurant': self.restaurant.pk,
+            'party_size': party_size,
+            'start_reserve': '2030-03-04 20:00:00',
+            'finish_reserve': '2030-03-04 21:00:00',
+        }, format='json')
+
+    def test_order_assigns_best_table(self):
+        """Test para asignar la mesa que menos sillas desperdicia"""
+        response = self.create_order(2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reserve = Reserve.objects.get()
+        self.assertEqual(reserve.table, self.small_table)
+        self.assertEqual(reserve.assigned_chairs, 2)
+
+    def test_order_assigns_adjacent_tables(self):
+        """Test para juntar mesas contiguas si el grupo no cabe en una"""
+        response = self.create_order(7)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        chairs = dict(Reserve.objects.values_list('table_id', 'assigned_chairs'))
+        self.assertDictEqual(chairs, {self.small_table.pk: 2, self.big_table.pk: 5})
+
+    def test_order_without_free_tables(self):
+        """Test para un grupo que no cabe en las mesas libres"""
+        self.create_order(2)
+        response = self.create_order(7)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_order_with_invalid_party_size(self):
+        """Test para un número de comensales no válido"""
+        response = self.create_order('muchos')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class OrderPipelineTests(TestCase):
+    """Pruebas para la creación de pedidos en una sola transacción y con consultas acotadas."""
+    # Consultas máximas al crear un pedido, sea cual sea su número de líneas y mesas
+    QUERY_BUDGET = 25
+
+    def setUp(self):
+        """Configuración de datos de prueba."""
+        self.user = User.objects.create_user(
+            username='pipelinetester',
+            email='pipeline@madirex.com',
+            password='Password123!',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth_client = APIClient()
+        self.auth_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.calendar = create_calendar()
+
+        self.restaurant = Restaurant.objects.create(name='Pipeline Restaurant', calendar=self.calendar)
+        self.tables = [
+            Table.objects.create(x_position=x, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant)
+            for x in range(3)
+        ]
+        self.dishes = [
+            Dish.objects.create(
+                name=f'Plato {index}', description='Plato de prueba', price=Decimal('2.50'),
+                dish_type=Dish.DishType.MAIN_COURSE, calories=100, preparation_time=10, category='Test',
+            )
+            for index in range(20)
+        ]
+        self.links = [
+            RestaurantDishLink.objects.create(restaurant=self.restaurant, dish=dish, stock=10)
+            for dish in self.dishes
+        ]
+
+    def create_order(self, lines, tables, **extra):
+        """Crear un pedido con las líneas (plato, cantidad) y las mesas indicadas."""
+        return self.auth_client.post('/users/order/', {
+            'restaurant': self.restaurant.pk,
+            'order_lines': [{'dish': dish.pk, 'quantity': quantity} for dish, quantity in lines],
+            'tables': [table.pk for table in tables],
+            'start_reserve': '2030-03-04 20:00:00',
+            'finish_reserve': '2030-03-04 21:00:00',
+            **extra,
+        }, format='json')
+
+    def test_order_totals(self):
+        """Test para calcular los totales del pedido y de sus líneas"""
+        response = self.create_order([(self.dishes[0], 2), (self.dishes[1], 3)], self.tables[:2])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.total, Decimal('12.50'))
+        self.assertEqual(order.total_dishes, 5)
+        self.assertEqual(sorted(OrderLine.objects.values_list('total', flat=True)), [Decimal('5.00'), Decimal('7.50')])
+        self.assertEqual(Reserve.objects.filter(is_active=True).count(), 2)
+        self.assertEqual(len(response.data['order_lines']), 2)
+        self.assertEqual(len(response.data['reserves']), 2)
+        self.assertEqual(TableOccupancy.objects.filter(table=self.tables[0], reserves=1).count(), 2)
+
+    def test_order_query_budget(self):
+        """Test para que las consultas no dependan del número de líneas ni de mesas"""
+        # El primer pedido compila el índice del calendario (que se guarda al confirmar la transacción)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_order([(self.dishes[0], 1)], self.tables[:1])
+        Order.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as small_order:
+            response = self.create_order([(self.dishes[0], 1)], self.tables[:1])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        Order.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as big_order:
+            response = self.create_order([(dish, 2) for dish in self.dishes], self.tables)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(big_order), len(small_order))
+        self.assertLessEqual(len(big_order), self.QUERY_BUDGET)
+
+    def test_order_rolls_back_on_missing_dish(self):
+        """Test para no dejar nada creado si un plato no existe"""
+        response = self.create_order([(self.dishes[0], 1)], self.tables, order_lines=[{'dish': 999999}])
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Reserve.objects.exists())
+
+    def test_order_rolls_back_on_overlap(self):
+        """Test para rechazar el pedido entero si una de sus mesas ya está reservada"""
+        self.create_order([(self.dishes[0], 1)], self.tables[2:])
+        response = self.create_order([(self.dishes[0], 1)], self.tables)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Reserve.objects.count(), 1)
+        self.assertFalse(OrderLine.objects.exclude(order__in=Order.objects.all()).exists())
+
+    def test_order_redeems_and_refunds_cart_code(self):
+        """Test para canjear el cupón al crear el pedido y devolverlo al cancelarlo"""
+        cart_code = CartCode.objects.create(code='PIPELINE', percent_discount=0, fixed_discount=1, available_uses=1)
+        response = self.create_order([(self.dishes[0], 2)], self.tables[:1], cart_code_code='PIPELINE')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.get().total, Decimal('4.00'))
+        cart_code.refresh_from_db()
+        self.assertEqual(cart_code.available_uses, 0)
+
+        response = self.create_order([(self.dishes[0], 2)], self.tables[1:2], cart_code_code='PIPELINE')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "El código de carrito no tiene usos disponibles.")
+        self.assertEqual(Order.objects.count(), 1)
+
+        response = self.auth_client.post(f'/users/cancel_order/{Order.objects.get().pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cart_code.refresh_from_db()
+        self.assertEqual(cart_code.available_uses, 1)
+
+    def test_order_takes_and_restores_stock(self):
+        """Test para descontar el stock al crear el pedido y devolverlo al cancelarlo"""
+        response = self.create_order([(self.dishes[0], 3), (self.dishes[1], 1), (self.dishes[0], 2)], self.tables[:1])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.links[0].refresh_from_db()
+        self.links[1].refresh_from_db()
+        self.assertEqual((self.links[0].stock, self.links[1].stock), (5, 9))
+
+        response = self.auth_client.post(f'/users/cancel_order/{Order.objects.get().pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.links[0].refresh_from_db()
+        self.links[1].refresh_from_db()
+        self.assertEqual((self.links[0].stock, self.links[1].stock), (10, 10))
+
+    def test_order_without_stock(self):
+        """Test para rechazar el pedido entero si un plato no tiene stock suficiente"""
+        response = self.create_order([(self.dishes[0], 2), (self.dishes[1], 11)], self.tables[:1])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], f"No hay stock suficiente de los platos con ID {self.dishes[1].pk}.")
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(sorted(RestaurantDishLink.objects.values_list('stock', flat=True).distinct()), [10])
+
+    def test_order_without_stock_reports_only_missing_dishes(self):
+        """Test para no dar como agotado un plato con stock aunque pida más de la mitad"""
+        response = self.create_order([(self.dishes[0], 6), (self.dishes[1], 11)], self.tables[:1])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], f"No hay stock suficiente de los platos con ID {self.dishes[1].pk}.")
+        self.assertEqual(sorted(RestaurantDishLink.objects.values_list('stock', flat=True).distinct()), [10])
+
+    def test_order_table_chairs_out_of_range(self):
+        """Test para rechazar una mesa cuyas sillas asignadas no están entre min_chairs y max_chairs"""
+        Table.objects.filter(pk=self.tables[1].pk).update(min_chairs=6)
+        response = self.create_order([(self.dishes[0], 1)], self.tables[:2])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['assigned_chairs'], ["El número de sillas asignadas debe estar entre 6 y 4."])
+        self.assertFalse(Order.objects.exists())
+
+    def test_order_dish_not_in_menu(self):
+        """Test para rechazar un plato que no está en el menú del restaurante"""
+        self.links[0].delete()
+        response = self.create_order([(self.dishes[0], 1)], self.tables[:1])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], f"El plato con ID {self.dishes[0].pk} no está en el menú del restaurante.")
+        self.assertFalse(Order.objects.exists())
+
+
+
+class OrderIdempotencyTests(TestCase):
+    """Pruebas para la cabecera Idempotency-Key al crear pedidos."""
+    def setUp(self):
+        """Configuración de datos de prueba."""
+        self.user = User.objects.create_user(
+            username='idempotencytester',
+            email='idempotency@madirex.com',
+            password='Password123!',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth_client = APIClient()
+        self.auth_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.calendar = create_calendar()
+
+        self.restaurant = Restaurant.objects.create(name='Idempotency Restaurant', calendar=self.calendar)
+        self.table = Table.objects.create(x_position=1, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant)
+
+    def create_order(self, key, table=None):
+        """Crear un pedido con una clave de idempotencia."""
+        return self.auth_client.post('/users/order/', {
+            'restaurant': self.restaurant.pk,
+            'tables': [(table or self.table).pk],
+            'start_reserve': '2030-03-04 20:00:00',
+            'finish_reserve': '2030-03-04 21:00:00',
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeated_key_replays_response(self):
+        """Test para devolver la respuesta guardada sin crear otro pedido"""
+        first = self.create_order('retry-1')
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.create_order('retry-1')
+
+        # El reintento solo consulta la clave, sin pasar por el pedido
+        tables = ('"orders_order"', '"reserves_reserve"', '"order_lines_orderline"')
+        self.assertFalse([query for query in queries if any(table in query['sql'] for table in tables)])
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(second.content), json.loads(first.content))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_repeated_key_with_other_data(self):
+        """Test para rechazar una clave reutilizada con otros datos"""
+        self.create_order('retry-2')
+        other_table = Table.objects.create(x_position=2, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant)
+        response = self.create_order('retry-2', other_table)
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_key_runs_again(self):
+        """Test para volver a crear el pedido si la clave ha caducado"""
+        self.create_order('retry-3')
+        Order.objects.all().delete()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.create_order('retry-3')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_delete_expired_idempotency_keys(self):
+        """Test para eliminar en lotes solo las claves caducadas"""
+        now = timezone.now()
+        IdempotencyKey.objects.bulk_create([
+            IdempotencyKey(user=self.user, key=f'old-{index}', fingerprint='', expires_at=now - timedelta(hours=1))
+            for index in range(5)
+        ] + [IdempotencyKey(user=self.user, key='new', fingerprint='', expires_at=now + timedelta(hours=1))])
+
+        self.assertEqual(delete_expired_idempotency_keys(batch_size=2, now=now), 5)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class OrderIdempotencyConcurrencyTests(TransactionTestCase):
+    """Pruebas para peticiones simultáneas con la misma clave de idempotencia."""
+    REQUESTS = 8
+
+    def test_parallel_requests_create_one_order(self):
+        """Test para que los reintentos simultáneos esperen al primero y reutilicen su respuesta"""
+        user = User.objects.create_user(username='paralleltester', email='parallel@madirex.com', password='Password123!')
+        token = Token.objects.create(user=user)
+        calendar = create_calendar()
+        restaurant = Restaurant.objects.create(name='Parallel Restaurant', calendar=calendar)
+        table = Table.objects.create(x_position=1, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=restaurant)
+
+        def create_order(_):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+            try:
+                return client.post('/users/order/', {
+                    'restaurant': restaurant.pk,
+                    'tables': [table.pk],
+                    'start_reserve': '2030-03-04 20:00:00',
+                    'finish_reserve': '2030-03-04 21:00:00',
+                }, format='json', HTTP_IDEMPOTENCY_KEY='parallel').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.REQUESTS) as executor:
+            status_codes = list(executor.map(create_order, range(self.REQUESTS)))
+
+        self.assertEqual(status_codes, [status.HTTP_201_CREATED] * self.REQUESTS)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Reserve.objects.count(), 1)
+
+
+class OrderIntakeTests(TestCase):
+    """Pruebas para el modo asíncrono de creación de pedidos."""
+    def setUp(self):
+        """Configuración de datos de prueba."""
+        self.user = User.objects.create_user(
+            username='intaketester',
+            email='intake@madirex.com',
+            password='Password123!',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth_client = APIClient()
+        self.auth_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.calendar = create_calendar()
+
+        self.restaurant = Restaurant.objects.create(name='Intake Restaurant', calendar=self.calendar)
+        self.table = Table.objects.create(x_position=1, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=self.restaurant)
+
+    def enqueue_order(self, tables, start_reserve='2030-03-04 20:00:00'):
+        """Encolar un pedido."""
+        return self.auth_client.post('/users/order/?async=1', {
+            'restaurant': self.restaurant.pk,
+            'tables': tables,
+            'start_reserve': start_reserve,
+            'finish_reserve': '2030-03-04 21:00:00',
+        }, format='json')
+
+    def test_enqueue_and_process_order(self):
+        """Test para encolar un pedido, procesarlo y consultar su estado"""
+        response = self.enqueue_order([self.table.pk])
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], OrderIntakeStatus.PENDING)
+        self.assertFalse(Order.objects.exists())
+        status_url = response.data['status_url']
+        self.assertEqual(response['Location'], status_url)
+
+        self.assertEqual(process_intake_batch(), 1)
+
+        response = self.auth_client.get(status_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], OrderIntakeStatus.DONE)
+        self.assertEqual(response.data['status_code'], status.HTTP_201_CREATED)
+        self.assertEqual(response.data['order'], Order.objects.get().pk)
+        self.assertEqual(Reserve.objects.get().table, self.table)
+
+    def test_enqueue_invalid_order(self):
+        """Test para rechazar sin encolar un pedido con datos no válidos"""
+        response = self.enqueue_order([self.table.pk], start_reserve='mañana')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OrderIntake.objects.exists())
+
+    def test_failed_order_intake(self):
+        """Test para guardar el error de un pedido que no se puede crear"""
+        response = self.enqueue_order([999999])
+        process_intake_batch()
+
+        response = self.auth_client.get(response.data['status_url'])
+        self.assertEqual(response.data['status'], OrderIntakeStatus.FAILED)
+        self.assertEqual(response.data['status_code'], status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Order.objects.exists())
+
+    def test_order_intake_crash_creates_nothing(self):
+        """Test para no dejar el pedido creado si el worker falla antes de guardar el resultado"""
+        self.enqueue_order([self.table.pk])
+
+        with mock.patch('utils.order_intake._finish_intake', side_effect=RuntimeError('worker muerto')):
+            process_intake_batch()
+
+        intake = OrderIntake.objects.get()
+        self.assertEqual(intake.status, OrderIntakeStatus.PENDING)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Reserve.objects.exists())
+
+        process_intake_batch()
+        self.assertEqual(OrderIntake.objects.get().status, OrderIntakeStatus.DONE)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_finished_intake_is_not_processed_again(self):
+        """Test para no repetir un pedido de la cola que ya tiene su pedido creado"""
+        self.enqueue_order([self.table.pk])
+        process_intake_batch()
+        intake = OrderIntake.objects.get()
+
+        # Como si se hubiera reencolado y reservado otra vez después de crearse el pedido
+        OrderIntake.objects.filter(pk=intake.pk).update(status=OrderIntakeStatus.PROCESSING)
+        process_intake(intake)
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderIntake.objects.get().order, Order.objects.get())
+
+    def test_requeue_stale_intakes(self):
+        """Test para reencolar los pedidos abandonados y dar por fallidos los que ya no tienen más intentos"""
+        started_at = timezone.now() - INTAKE_STALE_TIMEOUT - timedelta(minutes=1)
+        retry = OrderIntake.objects.create(user=self.user, payload={}, status=OrderIntakeStatus.PROCESSING, attempts=1, started_at=started_at)
+        poison = OrderIntake.objects.create(
+            user=self.user, payload={}, status=OrderIntakeStatus.PROCESSING, attempts=INTAKE_MAX_ATTEMPTS, started_at=started_at,
+        )
+
+        self.assertEqual(requeue_stale_intakes(), 1)
+
+        self.assertEqual(OrderIntake.objects.get(pk=retry.pk).status, OrderIntakeStatus.PENDING)
+        poison.refresh_from_db()
+        self.assertEqual(poison.status, OrderIntakeStatus.FAILED)
+        self.assertEqual(poison.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIsNotNone(poison.finished_at)
+
+    def test_order_intake_of_other_user(self):
+        """Test para no mostrar los pedidos encolados de otro usuario"""
+        other = User.objects.create_user(username='intakeother', email='intakeother@madirex.com', password='Password123!')
+        intake = OrderIntake.objects.create(user=other, payload={})
+
+        response = self.auth_client.get(f'/users/order_intake/{intake.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OrderIntakeWorkerTests(TransactionTestCase):
+    """Pruebas para varios workers vaciando la cola de pedidos a la vez."""
+    WORKERS = 4
+
+    def test_parallel_workers_process_each_intake_once(self):
+        """Test para que SKIP LOCKED reparta los pedidos entre workers sin repetir ninguno"""
+        user = User.objects.create_user(username='workertester', email='worker@madirex.com', password='Password123!')
+        calendar = create_calendar()
+        restaurant = Restaurant.objects.create(name='Worker Restaurant', calendar=calendar)
+        tables = [
+            Table.objects.create(x_position=x, y_position=1, min_chairs=1, max_chairs=4, assigned_restaurant=restaurant)
+            for x in range(20)
+        ]
+        for table in tables:
+            enqueue_order(user, {
+                'restaurant': restaurant.pk,
+                'tables': [table.pk],
+                'start_reserve': '2030-03-04 20:00:00',
+                'finish_reserve': '2030-03-04 21:00:00',
+            })
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            processed = list(executor.map(lambda _: run_intake_worker(batch_size=3, once=True), range(self.WORKERS)))
+
+        self.assertEqual(sum(processed), len(tables))
+        self.assertEqual(OrderIntake.objects.filter(status=OrderIntakeStatus.DONE, attempts=1).count(), len(tables))
+        self.assertEqual(Order.objects.count(), len(tables))
+        self.assertEqual(get_intake_metrics()['depth'], 0)
@@ -1,5 +1,6 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
+from rest_framework.permissions import IsAuthenticated
 from users import views as user_views
 
 router = DefaultRouter()
@@ -7,5 +8,6 @@ router.register(r'users', user_views.UserViewSet, basename='users')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('users/order/<int:pk>/', user_views.UserViewSet.as_view({'get': 'order_detail'}, permission_classes=[IsAuthenticated]), name='order_detail'),
     path('users/cancel_order/<int:pk>/', user_views.UserViewSet.as_view({'post': 'cancel_order'}), name='cancel_order'),
 ]
\ No newline at end of file
@@ -0,0 +1,125 @@
+from collections import defaultdict
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from reserves.models import TableOccupancy
+from utils.slots import SLOT_SECONDS, SLOTS_PER_DAY, mask_to_hours
+
+# Margen que se resta al fin de la reserva (una reserva hasta las 12:00 no ocupa la franja de las 12:00)
+FINISH_MARGIN_SECONDS = 5 * 60
+
+
+def _time_to_microseconds(value):
+    """Devuelve los microsegundos transcurridos desde las 00:00 para una hora."""
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+
+def _to_current_timezone(value):
+    """Normaliza un datetime (o string) a la zona horaria actual, como lo devuelve la base de datos."""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value
+
+
+def reserve_day(start_reserve):
+    """Dado el inicio de una reserva, devuelve el día al que pertenece (en la zona horaria actual)."""
+    return _to_current_timezone(start_reserve).date()
+
+
+def reserve_to_mask(start_reserve, finish_reserve):
+    """
+    Dado el inicio y el fin de una reserva, devuelve la máscara de franjas que ocupa.
+
+    Una franja está ocupada si inicio <= franja < fin - 5 minutos, comparando solo la hora del día.
+    """
+    start_reserve = _to_current_timezone(start_reserve)
+    finish_reserve = _to_current_timezone(finish_reserve)
+    slot_us = SLOT_SECONDS * 1000000
+    start_us = _time_to_microseconds(start_reserve.time())
+    finish_us = _time_to_microseconds(finish_reserve.time()) - FINISH_MARGIN_SECONDS * 1000000
+
+    if finish_us < 0:
+        finish_us += 24 * 3600 * 1000000
+
+    # Primera franja >= inicio y primera franja >= fin (exclusiva)
+    first_slot = -(-start_us // slot_us)
+    end_slot = min(-(-finish_us // slot_us), SLOTS_PER_DAY)
+
+    if end_slot <= first_slot:
+        return 0
+    return ((1 << end_slot) - 1) & ~((1 << first_slot) - 1)
+
+
+def get_occupied_masks(tables, start_day, end_day=None):
+    """
+    Dadas unas mesas y un rango de días, devuelve las franjas ocupadas por mesa y día.
+
+    Lee la ocupación materializada (TableOccupancy) en una sola consulta y devuelve
+    un diccionario {(table_id, día): máscara}.
+    """
+    end_day = end_day or start_day
+    table_ids = [getattr(table, 'pk', table) for table in tables]
+
+    occupancy = TableOccupancy.objects.filter(
+        table_id__in=table_ids,
+        day__gte=start_day,
+        day__lte=end_day,
+        reserves__gt=0,
+    ).values_list('table_id', 'day', 'slot')
+
+    occupied_masks = defaultdict(int)
+    for table_id, day, slot in occupancy:
+        occupied_masks[(table_id, day)] |= 1 << slot
+
+    return occupied_masks
+
+
+def get_free_hours(opened_slots, occupied_mask):
+    """Dadas las franjas de apertura y las franjas ocupadas (máscaras), devuelve las horas disponibles."""
+    return mask_to_hours(opened_slots & ~occupied_mask)
+
+
+def table_info(table, available_hours):
+    """Devuelve los datos de una mesa junto con sus horas disponibles."""
+    return {
+        "pk": table.pk,
+        "x_position": table.x_position,
+        "y_position": table.y_position,
+        "min_chairs": table.min_chairs,
+        "max_chairs": table.max_chairs,
+        "is_active": table.is_active,
+        "available_hours": available_hours,
+    }
+
+
+def get_tables_availability(tables, day, opened_slots):
+    """Dadas las mesas de un restaurante, un día y sus franjas de apertura, devuelve las horas disponibles por mesa."""
+    tables = list(tables)
+    occupied_masks = get_occupied_masks(tables, day)
+
+    return [
+        table_info(table, get_free_hours(opened_slots, occupied_masks[(table.pk, day)]))
+        for table in tables
+    ]
+
+
+def iter_tables_availability_range(tables, opened_slots_by_day):
+    """
+    Dadas las mesas de un restaurante y las franjas de apertura por día, genera las horas disponibles
+    de cada mesa para cada día del rango.
+
+    Las reservas de todo el rango se cargan en una sola consulta. Los días cerrados (None) no tienen horas.
+    """
+    tables = list(tables)
+    days = sorted(opened_slots_by_day)
+    if not tables or not days:
+        return
+
+    occupied_masks = get_occupied_masks(tables, days[0], days[-1])
+
+    for table in tables:
+        yield table_info(table, {
+            str(day): get_free_hours(opened_slots_by_day[day] or 0, occupied_masks[(table.pk, day)])
+            for day in days
+        })
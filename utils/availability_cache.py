@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.db import transaction
+
+# Tiempo que se guarda la disponibilidad calculada de un restaurante y día
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+AVAILABILITY_CACHE_PREFIX = 'availability'
+AVAILABILITY_HITS_KEY = f'{AVAILABILITY_CACHE_PREFIX}:hits'
+AVAILABILITY_MISSES_KEY = f'{AVAILABILITY_CACHE_PREFIX}:misses'
+
+
+def _restaurant_version_key(restaurant_id):
+    """Clave de la versión de un restaurante (cambia al modificar sus mesas o su calendario)."""
+    return f'{AVAILABILITY_CACHE_PREFIX}:{restaurant_id}:version'
+
+
+def _day_version_key(restaurant_id, day):
+    """Clave de la versión de un día de un restaurante (cambia al modificar sus reservas u horario)."""
+    return f'{AVAILABILITY_CACHE_PREFIX}:{restaurant_id}:{day}:version'
+
+
+def _increment(key):
+    """Incrementa un contador de la caché, creándolo si no existe."""
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La clave ha expirado o se ha descartado entre add e incr
+        cache.set(key, 1, None)
+
+
+def get_availability_key(restaurant_id, day):
+    """
+    Dado un restaurante y un día, devuelve la clave con la que se guarda su disponibilidad.
+
+    La clave incluye las versiones del restaurante y del día, así que invalidar es solo cambiar
+    de versión: un cálculo que termine después de una invalidación se guarda en una clave antigua.
+    """
+    restaurant_key = _restaurant_version_key(restaurant_id)
+    day_key = _day_version_key(restaurant_id, day)
+    versions = cache.get_many([restaurant_key, day_key])
+    return f'{AVAILABILITY_CACHE_PREFIX}:{restaurant_id}:{day}:{versions.get(restaurant_key, 0)}:{versions.get(day_key, 0)}'
+
+
+def get_cached_availability(restaurant_id, day, compute):
+    """
+    Devuelve la disponibilidad de un restaurante para un día desde la caché o, si no está, la calcula con compute().
+
+    Si compute() devuelve None (por ejemplo, no hay horario) no se guarda nada.
+    """
+    key = get_availability_key(restaurant_id, day)
+    payload = cache.get(key)
+    if payload is not None:
+        _increment(AVAILABILITY_HITS_KEY)
+        return payload
+
+    _increment(AVAILABILITY_MISSES_KEY)
+    payload = compute()
+    if payload is not None:
+        cache.set(key, payload, AVAILABILITY_CACHE_TIMEOUT)
+    return payload
+
+
+def _invalidate(key):
+    """
+    Cambia la versión de una clave ahora y otra vez al confirmar la transacción actual.
+
+    El segundo cambio descarta lo que otra petición haya calculado y guardado leyendo los datos
+    de antes del commit.
+    """
+    _increment(key)
+    transaction.on_commit(lambda: _increment(key))
+
+
+def invalidate_availability_day(restaurant_id, day):
+    """Invalida la disponibilidad cacheada de un restaurante para un día."""
+    if restaurant_id is not None and day is not None:
+        _invalidate(_day_version_key(restaurant_id, day))
+
+
+def invalidate_availability_restaurant(restaurant_id):
+    """Invalida la disponibilidad cacheada de un restaurante para todos los días."""
+    if restaurant_id is not None:
+        _invalidate(_restaurant_version_key(restaurant_id))
+
+
+def get_availability_cache_stats():
+    """Devuelve los aciertos y fallos de la caché de disponibilidad."""
+    counters = cache.get_many([AVAILABILITY_HITS_KEY, AVAILABILITY_MISSES_KEY])
+    hits = counters.get(AVAILABILITY_HITS_KEY, 0)
+    misses = counters.get(AVAILABILITY_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_availability_cache_stats():
+    """Pone a cero los contadores de la caché de disponibilidad."""
+    cache.delete_many([AVAILABILITY_HITS_KEY, AVAILABILITY_MISSES_KEY])
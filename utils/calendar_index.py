@@ -0,0 +1,154 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from threading import Lock
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from calendars.models import Calendar
+from schedules.models import Schedule
+
+# Índices compilados por calendario, reutilizados entre peticiones mientras no cambie su versión.
+# Se guardan los CALENDAR_INDEX_CACHE_SIZE usados más recientemente
+CALENDAR_INDEX_CACHE_SIZE = 256
+_calendar_indexes = OrderedDict()
+_calendar_indexes_lock = Lock()
+
+
+class CalendarIndex:
+    """
+    Índice compilado e inmutable de un calendario.
+
+    Guarda los horarios de temporada, los horarios personalizados (ordenados por día) y los días
+    cerrados, de forma que cualquier día se resuelve sin consultas: los horarios personalizados
+    con una búsqueda binaria (O(log n)) y los días cerrados en un conjunto.
+    """
+    __slots__ = (
+        'calendar_id', 'version', 'normal_start_date', 'summer_start_date', 'winter_start_date',
+        'normal_week_schedule', 'summer_week_schedule', 'winter_week_schedule',
+        'custom_days', 'custom_schedules', 'closed_days',
+    )
+
+    def __init__(self, calendar, custom_schedules):
+        """Compila el índice a partir de un calendario (con sus horarios de temporada) y sus horarios personalizados."""
+        custom_schedules = sorted(
+            (schedule for schedule in custom_schedules if schedule.day is not None),
+            key=lambda schedule: schedule.day,
+        )
+        values = {
+            'calendar_id': calendar.pk,
+            'version': calendar.version,
+            'normal_start_date': calendar.normal_start_date,
+            'summer_start_date': calendar.summer_start_date,
+            'winter_start_date': calendar.winter_start_date,
+            'normal_week_schedule': calendar.normal_week_schedule,
+            'summer_week_schedule': calendar.summer_week_schedule,
+            'winter_week_schedule': calendar.winter_week_schedule,
+            'custom_days': tuple(schedule.day for schedule in custom_schedules),
+            'custom_schedules': tuple(custom_schedules),
+            'closed_days': frozenset(calendar.closed_days),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        """El índice no se puede modificar: si el calendario cambia se compila uno nuevo."""
+        raise AttributeError("CalendarIndex es inmutable.")
+
+    @property
+    def is_configured(self):
+        """Indica si el calendario tiene todas las fechas y horarios de temporada."""
+        return all((
+            self.normal_start_date, self.summer_start_date, self.winter_start_date,
+            self.normal_week_schedule, self.summer_week_schedule, self.winter_week_schedule,
+        ))
+
+    def get_custom_schedule(self, day):
+        """Dado un día, devuelve su horario personalizado o None."""
+        index = bisect_left(self.custom_days, day)
+        if index < len(self.custom_days) and self.custom_days[index] == day:
+            return self.custom_schedules[index]
+        return None
+
+    def get_custom_schedules_between(self, start_date, end_date):
+        """Dado un rango de días, devuelve {día: horario personalizado} de los días del rango."""
+        start = bisect_left(self.custom_days, start_date)
+        end = bisect_right(self.custom_days, end_date)
+        return dict(zip(self.custom_days[start:end], self.custom_schedules[start:end]))
+
+    def is_closed(self, day):
+        """Indica si un día está en los días cerrados del calendario."""
+        return day in self.closed_days
+
+    def get_season_schedule(self, day):
+        """Dado un día, devuelve el horario de su temporada (o None si la temporada no tiene horario)."""
+        if self.normal_start_date <= day < self.summer_start_date:
+            return self.normal_week_schedule
+        if self.summer_start_date <= day < self.winter_start_date:
+            return self.summer_week_schedule
+        return self.winter_week_schedule
+
+    def get_schedule(self, day):
+        """
+        Dado un día, devuelve su Schedule: el personalizado o, si no hay, el de su temporada.
+
+        Lanza ValidationError si el calendario no está configurado correctamente.
+        """
+        custom_schedule = self.get_custom_schedule(day)
+        if custom_schedule:
+            return custom_schedule
+
+        if not self.is_configured:
+            raise ValidationError("El calendario no está configurado correctamente")
+
+        schedule = self.get_season_schedule(day)
+        if schedule is None:
+            raise ValidationError(f"No se encontró un horario para el día {day}")
+        return schedule
+
+    def get_opened_slots(self, day):
+        """
+        Dado un día, devuelve la máscara de sus franjas de apertura, o None si está cerrado.
+
+        Los horarios personalizados tienen prioridad sobre los días cerrados y los de temporada.
+        """
+        custom_schedule = self.get_custom_schedule(day)
+        if custom_schedule:
+            return custom_schedule.opened_slots
+        if self.is_closed(day):
+            return None
+        return self.get_schedule(day).opened_slots
+
+
+def compile_calendar_index(calendar_id):
+    """Compila el índice de un calendario con dos consultas: el calendario con sus horarios de temporada y los personalizados."""
+    calendar = Calendar.objects.select_related(
+        'normal_week_schedule', 'summer_week_schedule', 'winter_week_schedule',
+    ).get(pk=calendar_id)
+    custom_schedules = Schedule.objects.filter(calendar_id=calendar_id, day__isnull=False)
+    return CalendarIndex(calendar, custom_schedules)
+
+
+def _store_calendar_index(index):
+    """Guarda un índice compilado, descartando el usado hace más tiempo si hay más de CALENDAR_INDEX_CACHE_SIZE."""
+    with _calendar_indexes_lock:
+        _calendar_indexes[index.calendar_id] = index
+        _calendar_indexes.move_to_end(index.calendar_id)
+        while len(_calendar_indexes) > CALENDAR_INDEX_CACHE_SIZE:
+            _calendar_indexes.popitem(last=False)
+
+
+def get_calendar_index(calendar):
+    """
+    Dado un calendario, devuelve su índice compilado.
+
+    Se reutiliza el índice ya compilado mientras tenga la misma versión que el calendario. Un índice
+    compilado dentro de una transacción solo se guarda al confirmarla: si se deshiciera, su versión
+    no llegaría a existir y la siguiente que tuviera el mismo número lo daría por bueno.
+    """
+    with _calendar_indexes_lock:
+        index = _calendar_indexes.get(calendar.pk)
+        if index is not None:
+            _calendar_indexes.move_to_end(calendar.pk)
+    if index is None or index.version != calendar.version:
+        index = compile_calendar_index(calendar.pk)
+        transaction.on_commit(lambda: _store_calendar_index(index))
+    return index
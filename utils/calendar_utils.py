@@ -1,50 +1,85 @@
-from schedules.models import Schedule
-from datetime import datetime
-from reserves.models import Reserve
+from utils.availability import reserve_to_mask
+from utils.slots import hour_to_slot, mask_to_hours
+from utils.calendar_index import get_calendar_index
 from datetime import timedelta
-from rest_framework.exceptions import ValidationError
 
 def get_schedule_for_day(calendar, day):
     """Dado un calendario y un día, devuelve el Schedule correspondiente."""
-    # Lógica para obtener el Schedule para un día específico
-    custom_schedule = Schedule.objects.filter(calendar=calendar, day=day).first()
+    # El índice compilado del calendario resuelve el día sin consultas (ver utils.calendar_index)
+    return get_calendar_index(calendar).get_schedule(day)
 
-    if custom_schedule:
-        return custom_schedule
 
-    if not calendar.normal_start_date or not calendar.summer_start_date or not calendar.winter_start_date or not calendar.normal_week_schedule or not calendar.summer_week_schedule or not calendar.winter_week_schedule:
-        raise ValidationError("El calendario no está configurado correctamente")
+def get_opened_slots_for_range(calendar, start_date, end_date):
+    """
+    Dado un calendario y un rango de días, devuelve {día: máscara de franjas de apertura}.
 
-    # Determinar la estación y obtener el Schedule correspondiente
-    if calendar.normal_start_date <= day < calendar.summer_start_date:
-        schedule = calendar.normal_week_schedule
-    elif calendar.summer_start_date <= day < calendar.winter_start_date:
-        schedule = calendar.summer_week_schedule
-    else:
-        schedule = calendar.winter_week_schedule
+    Los días cerrados tienen None. Los horarios personalizados tienen prioridad sobre los días
+    cerrados y los horarios de estación.
+    """
+    calendar_index = get_calendar_index(calendar)
 
-    # Comprobar si el Schedule es null antes de devolverlo
-    if schedule is None:
-        raise ValidationError(f"No se encontró un horario para el día {day}")
+    opened_slots = {}
+    day = start_date
+    while day <= end_date:
+        opened_slots[day] = calendar_index.get_opened_slots(day)
+        day += timedelta(days=1)
 
-    return schedule
+    return opened_slots
 
 
-def get_occupied_hours(reservations, opening_hours):
-    """Dadas las reservas y las horas de apertura, devuelve las horas ocupadas."""
-    occupied_hours = set()
+def get_schedules_for_range(calendar, start_date, end_date):
+    """
+    Dado un calendario y un rango de días, devuelve [{"date", "schedule"}] para cada día del rango.
 
-    for reservation in reservations:
-        start_reserve = reservation.start_reserve.time()
-        finish_reserve = (reservation.finish_reserve - timedelta(minutes=5)).time()
+    El horario es la lista de horas de apertura, "Cerrado" o "No hay horario disponible". Los horarios
+    personalizados del rango se obtienen de una vez del índice compilado del calendario.
+    """
+    calendar_index = get_calendar_index(calendar)
+    custom_schedules = calendar_index.get_custom_schedules_between(start_date, end_date)
+
+    schedules = []
+    day = start_date
+    while day <= end_date:
+        schedule = custom_schedules.get(day)
+        if schedule is None and calendar_index.is_closed(day):
+            hours = "Cerrado"
+        else:
+            schedule = schedule or calendar_index.get_season_schedule(day)
+            hours = mask_to_hours(schedule.opened_slots) if schedule else "No hay horario disponible"
+
+        schedules.append({"date": str(day), "schedule": hours})
+        day += timedelta(days=1)
+
+    return schedules
 
-        for hour in opening_hours:
-            time_hour = datetime.strptime(str(hour), "%H:%M:%S").time()
 
-            if start_reserve <= time_hour < finish_reserve:
-                occupied_hours.add(str(hour))
+def compact_schedules(schedules):
+    """
+    Dados los horarios por día (ver get_schedules_for_range), agrupa los días consecutivos con el
+    mismo horario en tramos {"start_date", "end_date", "days", "schedule"}.
+    """
+    runs = []
+    for entry in schedules:
+        if runs and runs[-1]["schedule"] == entry["schedule"]:
+            runs[-1]["end_date"] = entry["date"]
+            runs[-1]["days"] += 1
+        else:
+            runs.append({
+                "start_date": entry["date"],
+                "end_date": entry["date"],
+                "days": 1,
+                "schedule": entry["schedule"],
+            })
+    return runs
+
+
+def get_occupied_hours(reservations, opening_hours):
+    """Dadas las reservas y las horas de apertura, devuelve las horas ocupadas."""
+    occupied_mask = 0
+    for reservation in reservations:
+        occupied_mask |= reserve_to_mask(reservation.start_reserve, reservation.finish_reserve)
 
-    return occupied_hours
+    return {str(hour) for hour in opening_hours if occupied_mask >> hour_to_slot(hour) & 1}
 
 
 def get_available_hours(opening_hours, occupied_hours):
@@ -0,0 +1,167 @@
+import random
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from cartcodes.models import CartCode, CartCodeShard
+
+# Máximo de filas entre las que se puede repartir el contador de usos de un código
+MAX_COUNTER_SHARDS = 64
+# Intentos de devolver un uso si el reparto del contador cambia a la vez
+REFUND_ATTEMPTS = 3
+
+
+class CartCodeError(Exception):
+    """El código de carrito no se puede canjear (el mensaje indica el motivo)."""
+
+
+def get_active_cart_codes(now=None):
+    """Devuelve los códigos de carrito activos y sin caducar."""
+    now = now or timezone.now()
+    return CartCode.objects.filter(Q(expiration_date__isnull=True) | Q(expiration_date__gt=now), is_active=True)
+
+
+def get_redeemable_cart_codes(now=None):
+    """Devuelve los códigos de carrito que se pueden canjear: activos, sin caducar y con usos disponibles."""
+    return get_active_cart_codes(now).filter(available_uses__gte=1)
+
+
+def annotate_shard_uses(cart_codes):
+    """
+    Dado un queryset de códigos, añade shard_uses (la suma de los usos de sus partes) con una subconsulta,
+    para que get_available_uses no haga una consulta por cada código repartido.
+    """
+    shard_uses = CartCodeShard.objects.filter(cart_code=OuterRef('pk')).values('cart_code').annotate(
+        uses=Sum('available_uses'),
+    ).values('uses')
+    return cart_codes.annotate(shard_uses=Subquery(shard_uses))
+
+
+def get_available_uses(cart_code):
+    """
+    Devuelve los usos disponibles de un código: su campo available_uses o, si está repartido, la suma de sus
+    partes (la de annotate_shard_uses si el código viene anotado).
+    """
+    if not cart_code.is_sharded:
+        return cart_code.available_uses
+    if hasattr(cart_code, 'shard_uses'):
+        return cart_code.shard_uses or 0
+    return cart_code.shards.aggregate(uses=Sum('available_uses'))['uses'] or 0
+
+
+def set_cart_code_counter(cart_code, available_uses=None, counter_shards=None):
+    """
+    Guarda los usos disponibles de un código, repartidos en counter_shards filas si es mayor que 1.
+
+    Con available_uses=None se mantienen los usos que tenga el código, leídos después de bloquearlo.
+    Bloquea el código y sus partes, así que no se pierde ningún canje que ocurra a la vez.
+    """
+    with transaction.atomic():
+        locked = CartCode.objects.select_for_update().get(pk=cart_code.pk)
+        shard_uses = [shard.available_uses for shard in cart_code.shards.select_for_update()]
+        if available_uses is None:
+            available_uses = sum(shard_uses) if locked.is_sharded else locked.available_uses
+        counter_shards = counter_shards or locked.counter_shards
+        cart_code.shards.all().delete()
+
+        # Si el código viene anotado (ver annotate_shard_uses), la suma de sus partes también cambia
+        if hasattr(cart_code, 'shard_uses'):
+            cart_code.shard_uses = available_uses if counter_shards > 1 else None
+
+        if counter_shards > 1:
+            uses, remainder = divmod(available_uses, counter_shards)
+            CartCodeShard.objects.bulk_create([
+                CartCodeShard(cart_code=cart_code, index=index, available_uses=uses + (index < remainder))
+                for index in range(counter_shards)
+            ])
+            # Los usos están en las partes: el campo del código deja de usarse
+            available_uses = 0
+
+        cart_code.available_uses = available_uses
+        cart_code.counter_shards = counter_shards
+        cart_code.save(update_fields=['available_uses', 'counter_shards'])
+
+
+def check_cart_code(code, now=None):
+    """
+    Dado un código, devuelve su CartCode si ahora se puede canjear o lanza CartCodeError con el motivo.
+
+    Solo lee el código: el uso se descuenta después con redeem_cart_code.
+    """
+    now = now or timezone.now()
+    cart_code = CartCode.objects.filter(code=code).first()
+    if not cart_code:
+        raise CartCodeError("El código de carrito no es válido.")
+    if not cart_code.is_active:
+        raise CartCodeError("El código de carrito no está activo.")
+    if cart_code.expiration_date is not None and cart_code.expiration_date <= now:
+        raise CartCodeError("El código de carrito ha caducado.")
+    if get_available_uses(cart_code) < 1:
+        raise CartCodeError("El código de carrito no tiene usos disponibles.")
+    return cart_code
+
+
+def _redeem_shard(cart_code, now):
+    """
+    Descuenta un uso de una parte del contador elegida al azar.
+
+    Si esa parte se ha quedado sin usos se prueban las demás, en orden aleatorio.
+    """
+    indexes = list(range(cart_code.counter_shards))
+    random.shuffle(indexes)
+    # Sin joins, para que Django haga un UPDATE directo y PostgreSQL vuelva a comprobar los usos tras el bloqueo
+    shards = CartCodeShard.objects.filter(
+        cart_code__in=get_active_cart_codes(now).filter(pk=cart_code.pk).values('pk'), available_uses__gte=1,
+    )
+    for index in indexes:
+        if shards.filter(index=index).update(available_uses=F('available_uses') - 1):
+            return True
+    return False
+
+
+def redeem_cart_code(cart_code, now=None):
+    """
+    Descuenta un uso de un código de carrito con un único UPDATE condicional.
+
+    La base de datos comprueba a la vez que siga activo, sin caducar y con usos, así que dos canjes
+    simultáneos no pueden gastar el mismo uso. Los códigos con contador repartido descuentan el uso
+    de una de sus partes. Si no se puede canjear lanza CartCodeError con el motivo.
+    """
+    now = now or timezone.now()
+    if cart_code.is_sharded:
+        redeemed = _redeem_shard(cart_code, now)
+    else:
+        redeemed = get_redeemable_cart_codes(now).filter(pk=cart_code.pk).update(
+            available_uses=F('available_uses') - 1,
+        )
+
+    if not redeemed:
+        # Otro canje se ha llevado el último uso (o el código ha cambiado): obtener el motivo
+        check_cart_code(cart_code.code, now)
+        raise CartCodeError("El código de carrito no tiene usos disponibles.")
+
+
+def _refund_use(cart_code_id, counter_shards):
+    """Devuelve un uso con el reparto del contador indicado. Devuelve False si el código ya no tiene ese reparto."""
+    if counter_shards > 1:
+        return CartCodeShard.objects.filter(cart_code_id=cart_code_id, index=random.randrange(counter_shards)).update(
+            available_uses=F('available_uses') + 1,
+        )
+    return CartCode.objects.filter(pk=cart_code_id, counter_shards=1).update(available_uses=F('available_uses') + 1)
+
+
+def refund_cart_code(cart_code):
+    """
+    Devuelve un uso a un código de carrito con un único UPDATE (por ejemplo, al cancelar un pedido).
+
+    Si el contador se ha repartido de otra forma desde que se cargó el código, el UPDATE no encuentra
+    la fila y se repite con el reparto actual.
+    """
+    if cart_code is None:
+        return
+    counter_shards = cart_code.counter_shards
+    for _ in range(REFUND_ATTEMPTS):
+        if _refund_use(cart_code.pk, counter_shards):
+            return
+        counter_shards = CartCode.objects.filter(pk=cart_code.pk).values_list('counter_shards', flat=True).first()
+        if counter_shards is None:
+            return
@@ -0,0 +1,108 @@
+import re
+from functools import reduce
+from operator import or_
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import F, Q
+from dishes.models import Dish, DishSearchWord
+from restaurant_dish_link.models import RestaurantDishLink
+
+# Configuración de texto completo con la que el trigger calcula Dish.search_vector (ver dishes/migrations/0003_dish_search.py)
+DISH_SEARCH_CONFIG = 'spanish'
+DISH_SEARCH_MAX_LENGTH = 100
+DISH_SEARCH_MAX_RESULTS = 50
+# Platos que coinciden con la búsqueda y se ordenan por relevancia (el doble del máximo de resultados):
+# limita el trabajo con términos muy comunes
+DISH_SEARCH_CANDIDATES = 100
+# Palabras del texto que se corrigen y palabras parecidas del vocabulario que se prueban por cada una
+DISH_SEARCH_MAX_TERMS = 5
+DISH_SEARCH_WORD_ALTERNATIVES = 3
+# Similitud mínima de una palabra del vocabulario con el término (el umbral por defecto del operador % de pg_trgm)
+DISH_SEARCH_WORD_SIMILARITY = 0.3
+
+
+def get_similar_words(terms):
+    """
+    Devuelve, para cada término, las palabras del vocabulario de los platos más parecidas por trigramas
+    (con una consulta al índice GIN trigram), o una lista vacía si el término ya está en el vocabulario.
+    """
+    similarities = {f'similarity_{index}': TrigramSimilarity('word', term) for index, term in enumerate(terms)}
+    rows = list(
+        DishSearchWord.objects.filter(reduce(or_, (Q(word__trigram_similar=term) for term in terms))).annotate(
+            **similarities,
+        ).values('word', *similarities)
+    )
+
+    similar_words = {}
+    for index, term in enumerate(terms):
+        name = f'similarity_{index}'
+        words = [
+            row['word'] for row in sorted(rows, key=lambda row: (-row[name], row['word']))
+            if row[name] >= DISH_SEARCH_WORD_SIMILARITY
+        ][:DISH_SEARCH_WORD_ALTERNATIVES]
+        similar_words[term] = [] if term in words else words
+    return similar_words
+
+
+def get_search_query(text):
+    """
+    Devuelve la consulta de texto completo de una búsqueda: la del texto tal cual (websearch) o, si alguna
+    palabra no está en el vocabulario (DishSearchWord), la que la cambia por ella misma o una de las
+    palabras parecidas, para encontrar los platos aunque haya erratas.
+    """
+    query = SearchQuery(text, config=DISH_SEARCH_CONFIG, search_type='websearch')
+    terms = list(dict.fromkeys(word for word in re.findall(r'\w+', text.lower()) if len(word) > 2))[:DISH_SEARCH_MAX_TERMS]
+    if not terms:
+        return query
+
+    similar_words = get_similar_words(terms)
+    if not any(similar_words.values()):
+        return query
+
+    corrected = None
+    for term in terms:
+        alternatives = SearchQuery(term, config=DISH_SEARCH_CONFIG)
+        for word in similar_words[term]:
+            alternatives |= SearchQuery(word, config=DISH_SEARCH_CONFIG)
+        corrected = alternatives if corrected is None else corrected & alternatives
+    return query | corrected
+
+
+def get_search_candidates(query, restaurant_id=None):
+    """
+    Devuelve los pk de hasta DISH_SEARCH_CANDIDATES platos activos que coinciden con la consulta: primero los
+    que coinciden por el nombre (name_search_vector) y, si no llegan, los que coinciden por el resto de
+    campos (search_vector), cada grupo por pk para que el resultado no dependa del plan de la consulta.
+
+    Con restaurant_id se recorre el menú (RestaurantDishLink) por el índice (restaurante, plato), que ya da
+    los platos ordenados, en vez de la tabla de platos.
+    """
+    if restaurant_id is None:
+        dishes, prefix, pk = Dish.objects.filter(is_active=True), '', 'pk'
+    else:
+        dishes = RestaurantDishLink.objects.filter(restaurant_id=restaurant_id, dish__is_active=True)
+        prefix, pk = 'dish__', 'dish_id'
+
+    candidates = list(dishes.filter(**{f'{prefix}name_search_vector': query}).order_by(pk).values_list(
+        pk, flat=True,
+    )[:DISH_SEARCH_CANDIDATES])
+    if len(candidates) < DISH_SEARCH_CANDIDATES:
+        candidates += dishes.filter(**{f'{prefix}search_vector': query}).exclude(**{f'{pk}__in': candidates}).order_by(
+            pk,
+        ).values_list(pk, flat=True)[:DISH_SEARCH_CANDIDATES - len(candidates)]
+    return candidates
+
+
+def search_dishes(text, restaurant_id=None, limit=DISH_SEARCH_MAX_RESULTS):
+    """
+    Busca platos activos por nombre, categoría, ingredientes y descripción, ordenados por relevancia.
+
+    Un plato coincide si su search_vector contiene los términos, o sus correcciones (ver get_search_query).
+    Solo se ordenan los candidatos de get_search_candidates, así que el coste no depende de cuántos platos
+    lleven un término común, y los platos cuyo nombre coincide siempre entran. La relevancia suma el rango
+    de texto completo y la similitud del nombre. Con restaurant_id solo se buscan los platos de su menú.
+    """
+    query = get_search_query(text)
+    candidates = get_search_candidates(query, restaurant_id)
+    return Dish.objects.filter(pk__in=candidates).annotate(
+        rank=SearchRank(F('search_vector'), query) + TrigramSimilarity('name', text),
+    ).defer('search_vector', 'name_search_vector').order_by('-rank', 'pk')[:limit]
@@ -0,0 +1,187 @@
+import csv
+import heapq
+import io
+import json
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import ValidationError
+
+# Parámetro con el que se elige el formato de la exportación (?output=csv o ?output=ndjson).
+# No se usa ?format porque DRF lo reserva para elegir el renderer.
+EXPORT_FORMAT_QUERY_PARAM = 'output'
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+# Filas que se leen del cursor de servidor en cada viaje a la base de datos
+EXPORT_CHUNK_SIZE = 2000
+# Filas que se escriben juntas en cada trozo de la respuesta
+EXPORT_ROWS_PER_WRITE = 500
+
+ORDER_EXPORT_FIELDS = (
+    'id', 'restaurant_id', 'user_id', 'status', 'total', 'total_dishes', 'cart_code_id',
+    'created_at', 'finished_at',
+)
+ORDER_LINE_EXPORT_FIELDS = ('id', 'dish_id', 'dish__name', 'quantity', 'price', 'total')
+RESERVE_EXPORT_FIELDS = (
+    'id', 'assigned_order_id', 'assigned_order__restaurant_id', 'table_id', 'start_reserve',
+    'finish_reserve', 'assigned_chairs', 'is_active',
+)
+
+
+def get_export_format(request):
+    """Devuelve el formato de exportación pedido (csv por defecto) o lanza ValidationError si no existe."""
+    export_format = request.query_params.get(EXPORT_FORMAT_QUERY_PARAM, 'csv')
+    if export_format not in EXPORT_CONTENT_TYPES:
+        raise ValidationError({
+            EXPORT_FORMAT_QUERY_PARAM: f"Formato no válido. Formatos disponibles: {', '.join(EXPORT_CONTENT_TYPES)}.",
+        })
+    return export_format
+
+
+def _export_value(value):
+    """Convierte un valor de la base de datos al texto que se escribe en la exportación."""
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_csv(header, rows):
+    """Escribe la cabecera y las filas en CSV, agrupando EXPORT_ROWS_PER_WRITE filas por trozo."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for index, row in enumerate(rows, 1):
+        writer.writerow([_export_value(value) for value in row])
+        if index % EXPORT_ROWS_PER_WRITE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(objects):
+    """Escribe cada objeto en una línea JSON, agrupando EXPORT_ROWS_PER_WRITE objetos por trozo."""
+    lines = []
+    for item in objects:
+        lines.append(json.dumps(item, cls=DjangoJSONEncoder, ensure_ascii=False))
+        if len(lines) == EXPORT_ROWS_PER_WRITE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_gzip(chunks):
+    """Comprime en gzip los trozos de texto según se generan, sin acumular la respuesta."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(request):
+    """Indica si el cliente acepta la respuesta comprimida en gzip."""
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def _order_rows(orders):
+    """
+    Dado un queryset de pedidos, devuelve sus filas con las de sus líneas (un pedido sin líneas da una fila
+    con la línea vacía). Es una sola consulta leída por trozos con un cursor de servidor.
+    """
+    fields = ORDER_EXPORT_FIELDS + tuple(f'order_lines__{field}' for field in ORDER_LINE_EXPORT_FIELDS)
+    return orders.order_by('created_at', 'id', 'order_lines__id').values_list(*fields).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE,
+    )
+
+
+def _archived_order_rows(archived_orders):
+    """
+    Dado un queryset de pedidos archivados, devuelve sus filas con el mismo formato que _order_rows. Las líneas
+    se leen del JSON guardado al archivar el pedido (ver utils.order_archive).
+    """
+    rows = archived_orders.order_by('created_at', 'id').values_list(
+        'id', 'restaurant_id', 'user_id', 'status', 'total', 'total_dishes', 'created_at', 'finished_at', 'data',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for order_id, restaurant_id, user_id, order_status, total, total_dishes, created_at, finished_at, data in rows:
+        order = (
+            order_id, restaurant_id, user_id, order_status, total, total_dishes, data.get('cart_code'),
+            created_at, finished_at,
+        )
+        lines = sorted(data.get('order_lines', []), key=lambda line: line['id'])
+        if not lines:
+            yield order + (None,) * len(ORDER_LINE_EXPORT_FIELDS)
+        for line in lines:
+            yield order + (
+                line['id'], line['dish'], line['dish_name'], line['quantity'], line['price'], line['total'],
+            )
+
+
+def _group_order_lines(rows):
+    """Agrupa las filas de _order_rows (ordenadas por pedido) en un diccionario por pedido con sus líneas."""
+    order_size = len(ORDER_EXPORT_FIELDS)
+    current = None
+    for row in rows:
+        if current is None or current['id'] != row[0]:
+            if current is not None:
+                yield current
+            current = dict(zip(ORDER_EXPORT_FIELDS, row[:order_size]))
+            current['order_lines'] = []
+        if row[order_size] is not None:
+            current['order_lines'].append(dict(zip(ORDER_LINE_EXPORT_FIELDS, row[order_size:])))
+    if current is not None:
+        yield current
+
+
+def iter_order_export(orders, export_format, archived_orders=None):
+    """
+    Devuelve los trozos de texto de la exportación de unos pedidos: una fila por línea en CSV y un pedido por línea en NDJSON.
+
+    Si se pasan archived_orders, sus filas se intercalan por fecha de creación con las de orders, así que la
+    exportación no pierde los pedidos que archive_orders ha sacado de Order.
+    """
+    rows = _order_rows(orders)
+    if archived_orders is not None:
+        created_at = ORDER_EXPORT_FIELDS.index('created_at')
+        rows = heapq.merge(_archived_order_rows(archived_orders), rows, key=lambda row: (row[created_at], row[0]))
+    if export_format == 'csv':
+        header = ORDER_EXPORT_FIELDS + tuple(f'line_{field.replace("__", "_")}' for field in ORDER_LINE_EXPORT_FIELDS)
+        return iter_csv(header, rows)
+    return iter_ndjson(_group_order_lines(rows))
+
+
+def iter_reserve_export(reserves, export_format):
+    """Devuelve los trozos de texto de la exportación de unas reservas, una reserva por fila."""
+    rows = reserves.order_by('start_reserve', 'id').values_list(*RESERVE_EXPORT_FIELDS).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE,
+    )
+    header = tuple(field.replace('__', '_') for field in RESERVE_EXPORT_FIELDS)
+    if export_format == 'csv':
+        return iter_csv(header, rows)
+    return iter_ndjson(dict(zip(header, row)) for row in rows)
+
+
+def export_response(request, chunks, export_format, filename):
+    """
+    Devuelve un StreamingHttpResponse con los trozos de la exportación, comprimidos en gzip si el cliente lo acepta.
+
+    La memoria usada no depende del tamaño de la exportación: las filas se leen, se escriben y se envían por trozos.
+    """
+    gzipped = accepts_gzip(request)
+    if gzipped:
+        chunks = iter_gzip(chunks)
+    else:
+        chunks = (chunk.encode() for chunk in chunks)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,152 @@
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Extract
+from django.utils import timezone
+from reserves.models import Reserve
+from tables.models import Table
+from utils.availability import FINISH_MARGIN_SECONDS
+from utils.slots import SLOT_SECONDS, SLOTS_PER_DAY, SLOT_HOURS
+
+DAY_SECONDS = 24 * 60 * 60
+EPOCH_DATE = date(1970, 1, 1)
+
+
+def reserves_to_slots(start_epochs, finish_epochs):
+    """
+    Dados los inicios y fines de las reservas (segundos desde 1970 en hora local), devuelve
+    (día, primera franja, franja final exclusiva) de cada reserva.
+
+    Es la versión vectorizada de reserve_day y reserve_to_mask: inicio <= franja < fin - 5 minutos,
+    comparando solo la hora del día. Las reservas que no ocupan ninguna franja tienen primera == final.
+    """
+    start_epochs = np.asarray(start_epochs, dtype=np.float64)
+    finish_epochs = np.asarray(finish_epochs, dtype=np.float64)
+
+    days = np.floor_divide(start_epochs, DAY_SECONDS).astype(np.int64)
+    start_seconds = start_epochs - days * DAY_SECONDS
+    finish_seconds = np.mod(finish_epochs, DAY_SECONDS) - FINISH_MARGIN_SECONDS
+    finish_seconds = np.where(finish_seconds < 0, finish_seconds + DAY_SECONDS, finish_seconds)
+
+    first_slots = np.ceil(start_seconds / SLOT_SECONDS).astype(np.int64)
+    end_slots = np.minimum(np.ceil(finish_seconds / SLOT_SECONDS).astype(np.int64), SLOTS_PER_DAY)
+    end_slots = np.maximum(end_slots, first_slots)
+    return days, first_slots, end_slots
+
+
+def compute_fleet_occupancy(table_ids, table_restaurants, reserve_tables, start_epochs, finish_epochs, start_date, days):
+    """
+    Calcula la ocupación por franjas de muchas mesas y días a la vez con NumPy.
+
+    table_ids/table_restaurants describen las mesas (y su restaurante) y reserve_tables/start_epochs/
+    finish_epochs las reservas. Devuelve un diccionario con:
+
+    - occupancy: matriz (mesas, días, franjas) con el número de reservas de cada franja.
+    - tables: franjas ocupadas de cada mesa.
+    - restaurants: {restaurante: (mesas, franjas ocupadas)}.
+    - slots: mesas ocupadas en cada franja del día, sumando todos los días.
+    """
+    table_ids = np.asarray(table_ids, dtype=np.int64)
+    table_restaurants = np.asarray(table_restaurants, dtype=np.int64)
+    reserve_tables = np.asarray(reserve_tables, dtype=np.int64)
+
+    # Posición de la mesa de cada reserva dentro de table_ids
+    order = np.argsort(table_ids)
+    positions = order[np.searchsorted(table_ids, reserve_tables, sorter=order)] if len(table_ids) else reserve_tables
+
+    reserve_days, first_slots, end_slots = reserves_to_slots(start_epochs, finish_epochs)
+    day_offsets = reserve_days - (start_date - EPOCH_DATE).days
+    valid = (day_offsets >= 0) & (day_offsets < days) & (end_slots > first_slots)
+
+    # Aritmética de intervalos: +1 en la primera franja y -1 en la final, y suma acumulada por franjas
+    rows = positions[valid] * days + day_offsets[valid]
+    width = SLOTS_PER_DAY + 1
+    size = len(table_ids) * days * width
+    changes = np.bincount(rows * width + first_slots[valid], minlength=size)
+    changes -= np.bincount(rows * width + end_slots[valid], minlength=size)
+    occupancy = np.cumsum(changes.reshape(len(table_ids), days, width)[:, :, :SLOTS_PER_DAY], axis=2, dtype=np.int32)
+
+    occupied = occupancy > 0
+    table_slots = occupied.sum(axis=(1, 2))
+    restaurant_ids, restaurant_positions = np.unique(table_restaurants, return_inverse=True)
+    restaurant_tables = np.bincount(restaurant_positions, minlength=len(restaurant_ids))
+    restaurant_slots = np.bincount(restaurant_positions, weights=table_slots, minlength=len(restaurant_ids))
+
+    return {
+        "occupancy": occupancy,
+        "tables": table_slots,
+        "restaurants": {
+            int(restaurant_id): (int(tables), int(slots))
+            for restaurant_id, tables, slots in zip(restaurant_ids, restaurant_tables, restaurant_slots)
+        },
+        "slots": occupied.sum(axis=(0, 1)),
+    }
+
+
+def load_fleet_reserves(restaurant_ids, start_date, end_date):
+    """
+    Dados unos restaurantes y un rango de días, devuelve sus mesas y sus reservas activas como arrays.
+
+    Son dos consultas con values_list. Los inicios y fines se leen como segundos en hora local.
+    """
+    tables = np.array(
+        list(Table.objects.filter(assigned_restaurant_id__in=restaurant_ids).values_list('id', 'assigned_restaurant_id')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    reserves = Reserve.objects.filter(
+        is_active=True,
+        table__assigned_restaurant_id__in=restaurant_ids,
+        start_reserve__gte=start,
+        start_reserve__lt=end,
+    ).annotate(
+        start_epoch=Cast(Extract('start_reserve', 'epoch'), FloatField()),
+        finish_epoch=Cast(Extract('finish_reserve', 'epoch'), FloatField()),
+    ).values_list('table_id', 'start_epoch', 'finish_epoch')
+    reserves = np.array(list(reserves), dtype=np.float64).reshape(-1, 3)
+
+    return tables[:, 0], tables[:, 1], reserves[:, 0].astype(np.int64), reserves[:, 1], reserves[:, 2]
+
+
+def get_fleet_occupancy(restaurant_ids, start_date, end_date):
+    """
+    Dados unos restaurantes y un rango de días, devuelve su ocupación agregada por mesa, por restaurante
+    y por franja del día (número de franjas ocupadas y porcentaje sobre las franjas del rango).
+    """
+    days = (end_date - start_date).days + 1
+    table_ids, table_restaurants, reserve_tables, start_epochs, finish_epochs = load_fleet_reserves(
+        restaurant_ids, start_date, end_date
+    )
+    result = compute_fleet_occupancy(
+        table_ids, table_restaurants, reserve_tables, start_epochs, finish_epochs, start_date, days
+    )
+    table_total = days * SLOTS_PER_DAY
+
+    return {
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "tables": [
+            {
+                "pk": int(table_id),
+                "restaurant": int(restaurant_id),
+                "occupied_slots": int(slots),
+                "occupancy": round(int(slots) / table_total, 4),
+            }
+            for table_id, restaurant_id, slots in zip(table_ids, table_restaurants, result["tables"])
+        ],
+        "restaurants": [
+            {
+                "pk": restaurant_id,
+                "tables": tables,
+                "occupied_slots": slots,
+                "occupancy": round(slots / (tables * table_total), 4) if tables else 0.0,
+            }
+            for restaurant_id, (tables, slots) in result["restaurants"].items()
+        ],
+        "slots": {
+            hour: int(tables)
+            for hour, tables in zip(SLOT_HOURS, result["slots"])
+        },
+    }
@@ -0,0 +1,93 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from orders.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_REPLAYED_HEADER = 'Idempotent-Replayed'
+# Tiempo durante el que se puede reintentar una petición con la misma clave
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Claves caducadas que se eliminan por consulta al limpiar
+IDEMPOTENCY_CLEANUP_BATCH_SIZE = 1000
+
+
+def get_request_fingerprint(request):
+    """Devuelve la huella (SHA-256) de la ruta y los datos de una petición."""
+    payload = json.dumps([request.path, request.data], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _claim_idempotency_key(user, key, fingerprint):
+    """
+    Intenta quedarse con una clave y devuelve (IdempotencyKey, creada).
+
+    Si otra petición con la misma clave está en curso, el INSERT espera a que termine su transacción:
+    si la confirma se devuelve su clave (con la respuesta ya guardada) y si la deshace esta petición
+    se queda con la clave. Las claves caducadas se eliminan antes, así que se pueden reutilizar.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(user=user, key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=fingerprint, expires_at=now + IDEMPOTENCY_KEY_TTL,
+            ), True
+    except IntegrityError:
+        return IdempotencyKey.objects.get(user=user, key=key), False
+
+
+def run_idempotent(request, handler):
+    """
+    Ejecuta handler() (que devuelve un Response) una sola vez por clave Idempotency-Key y usuario.
+
+    Sin cabecera se ejecuta siempre. Con cabecera, la respuesta se guarda junto a la clave en la misma
+    transacción, y las peticiones repetidas (también las simultáneas) la devuelven sin ejecutar handler().
+    Reutilizar una clave con otros datos devuelve un 422. Si handler() lanza una excepción no se guarda
+    nada y la petición se puede reintentar.
+    """
+    key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+    if key is None:
+        return handler()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return Response(
+            {"error": f"La cabecera {IDEMPOTENCY_KEY_HEADER} debe tener entre 1 y {IDEMPOTENCY_KEY_MAX_LENGTH} caracteres."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fingerprint = get_request_fingerprint(request)
+    with transaction.atomic():
+        idempotency_key, created = _claim_idempotency_key(request.user, key, fingerprint)
+        if not created:
+            if idempotency_key.fingerprint != fingerprint:
+                return Response(
+                    {"error": "La clave de idempotencia ya se ha usado con otra petición."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            return Response(
+                idempotency_key.response,
+                status=idempotency_key.status_code,
+                headers={IDEMPOTENCY_REPLAYED_HEADER: 'true'},
+            )
+
+        response = handler()
+        idempotency_key.status_code = response.status_code
+        idempotency_key.response = response.data
+        idempotency_key.save(update_fields=['status_code', 'response'])
+    return response
+
+
+def delete_expired_idempotency_keys(batch_size=IDEMPOTENCY_CLEANUP_BATCH_SIZE, now=None):
+    """Elimina las claves de idempotencia caducadas en lotes de batch_size y devuelve cuántas se han eliminado."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        batch = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
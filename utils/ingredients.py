@@ -0,0 +1,123 @@
+import re
+import unicodedata
+from itertools import islice
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from dishes.models import Dish, Ingredient
+from restaurant_dish_link.models import RestaurantDishLink
+
+# Ingredientes o alérgenos que se aceptan en cada filtro del menú
+MENU_FILTER_MAX_TERMS = 20
+INGREDIENT_INDEX_BATCH_SIZE = 2000
+
+
+def normalize_ingredient(name):
+    """Normaliza el nombre de un ingrediente o alérgeno: minúsculas, sin tildes y con espacios simples."""
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())[:Ingredient._meta.get_field('name').max_length]
+
+
+def get_ingredient_names(ingredients):
+    """Devuelve los nombres normalizados de la lista de ingredientes de un plato (Dish.ingredients)."""
+    if not isinstance(ingredients, list):
+        return set()
+    names = {normalize_ingredient(ingredient) for ingredient in ingredients if isinstance(ingredient, str)}
+    names.discard('')
+    return names
+
+
+def get_ingredient_ids(names):
+    """Devuelve los ids de los ingredientes con esos nombres normalizados, creando los que falten."""
+    if not names:
+        return []
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+    return list(Ingredient.objects.filter(name__in=names).values_list('pk', flat=True))
+
+
+def sync_dish_ingredients(dish):
+    """Actualiza los ingredientes normalizados de un plato (Dish.ingredient_index) a partir de Dish.ingredients."""
+    dish.ingredient_index.set(get_ingredient_ids(get_ingredient_names(dish.ingredients)))
+
+
+def rebuild_ingredient_index():
+    """
+    Reconstruye desde cero los ingredientes normalizados de todos los platos, por ejemplo tras crear
+    platos con bulk_create (que no envía señales). Devuelve el número de enlaces plato-ingrediente.
+
+    Los platos se leen y sus enlaces se insertan por lotes de INGREDIENT_INDEX_BATCH_SIZE, así que la
+    memoria no depende del número de platos. Cambia la versión de los menús de todos los restaurantes
+    con platos, porque sus menús filtrados por ingredientes guardados en la caché ya no valen.
+    """
+    # Importación local: utils.menu_snapshot importa este módulo
+    from utils.menu_snapshot import invalidate_menus
+
+    through = Dish.ingredient_index.through
+    links = 0
+    with transaction.atomic():
+        through.objects.all().delete()
+        dishes = Dish.objects.values_list('pk', 'ingredients').iterator(chunk_size=INGREDIENT_INDEX_BATCH_SIZE)
+        while True:
+            dish_names = {
+                dish_id: get_ingredient_names(ingredients)
+                for dish_id, ingredients in islice(dishes, INGREDIENT_INDEX_BATCH_SIZE)
+            }
+            if not dish_names:
+                break
+            names = set().union(*dish_names.values())
+            Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+            ingredient_ids = dict(Ingredient.objects.filter(name__in=names).values_list('name', 'pk'))
+            batch = [
+                through(dish_id=dish_id, ingredient_id=ingredient_ids[name])
+                for dish_id, names in dish_names.items() for name in names
+            ]
+            through.objects.bulk_create(batch, batch_size=INGREDIENT_INDEX_BATCH_SIZE)
+            links += len(batch)
+
+        invalidate_menus(RestaurantDishLink.objects.values_list('restaurant_id', flat=True).distinct())
+    return links
+
+
+def parse_ingredient_terms(value):
+    """
+    Devuelve los términos normalizados, sin repetir y ordenados, de un parámetro separado por comas
+    ("nueces,leche"). Lanza ValueError si hay más de MENU_FILTER_MAX_TERMS.
+    """
+    terms = sorted({normalize_ingredient(term) for term in (value or '').split(',')} - {''})
+    if len(terms) > MENU_FILTER_MAX_TERMS:
+        raise ValueError(f"Como máximo se admiten {MENU_FILTER_MAX_TERMS} términos por filtro.")
+    return terms
+
+
+def match_ingredients(term):
+    """
+    Ingredientes que contienen el término como palabra completa: "leche" encuentra "leche" y
+    "leche de coco", pero no "lechuga". Se consulta la tabla de ingredientes, que es pequeña.
+    """
+    return Ingredient.objects.filter(name__regex=r'\m' + re.escape(term) + r'\M')
+
+
+def filter_menu_dish_ids(restaurant_id, include=(), exclude=(), exclude_allergens=()):
+    """
+    Devuelve los ids de los platos del menú de un restaurante que llevan todos los ingredientes de
+    include y ninguno de exclude ni con los alérgenos de exclude_allergens.
+
+    Se resuelve en una consulta: cada condición es un EXISTS sobre la tabla plato-ingrediente, que
+    está indexada por ingrediente, así que no se recorre la lista JSON de cada plato.
+    """
+    through = Dish.ingredient_index.through
+    links = RestaurantDishLink.objects.filter(restaurant_id=restaurant_id)
+
+    excluded = Q(allergens__overlap=list(exclude_allergens)) if exclude_allergens else Q(pk__in=[])
+    for term in exclude:
+        excluded |= Q(pk__in=match_ingredients(term))
+    if exclude or exclude_allergens:
+        links = links.filter(~Exists(through.objects.filter(
+            dish_id=OuterRef('dish_id'), ingredient__in=Ingredient.objects.filter(excluded),
+        )))
+
+    for term in include:
+        links = links.filter(Exists(through.objects.filter(
+            dish_id=OuterRef('dish_id'), ingredient__in=match_ingredients(term),
+        )))
+    return set(links.values_list('dish_id', flat=True))
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import logging
+import re
+from collections import defaultdict
+from urllib.parse import parse_qs
+import itsdangerous
+import psycopg2
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, connections
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+# Canal de PostgreSQL (LISTEN/NOTIFY) por el que se publican los eventos de la cocina
+KITCHEN_FEED_CHANNEL = 'kitchen_feed'
+ORDER_CREATED = 'order_created'
+ORDER_CANCELLED = 'order_cancelled'
+ORDER_FINISHED = 'order_finished'
+# Ruta del feed de un restaurante, la única que atiende la aplicación ASGI (ver restaurants_api/asgi.py)
+KITCHEN_FEED_PATH = re.compile(r'^/orders/kitchen-feed/(?P<restaurant_id>\d+)/?$')
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión
+KITCHEN_FEED_HEARTBEAT = 15
+# Eventos pendientes por pantalla; si una pantalla no los lee se la desconecta
+KITCHEN_FEED_QUEUE_SIZE = 100
+# Segundos de espera antes de reconectar el listener si se pierde la conexión
+KITCHEN_FEED_RECONNECT_DELAY = 1
+# NOTIFY admite mensajes de hasta 8000 bytes: si el pedido no cabe se envía sin líneas
+MAX_NOTIFY_PAYLOAD = 7900
+# Segundos de validez del token firmado del feed (?token): solo sirve para abrir la conexión
+KITCHEN_FEED_TOKEN_MAX_AGE = 60
+KITCHEN_FEED_TOKEN_SALT = 'kitchen-feed'
+
+
+def get_kitchen_event(order, event):
+    """Devuelve el evento de la cocina de un pedido: su estado y sus platos."""
+    if 'order_lines' in getattr(order, '_prefetched_objects_cache', {}):
+        lines = order.order_lines.all()
+    else:
+        lines = order.order_lines.select_related('dish')
+    return {
+        "event": event,
+        "order": order.pk,
+        "restaurant": order.restaurant_id,
+        "status": order.status,
+        "total_dishes": order.total_dishes,
+        "created_at": order.created_at,
+        "finished_at": order.finished_at,
+        "order_lines": [
+            {"dish": line.dish_id, "dish_name": line.dish.name, "quantity": line.quantity}
+            for line in lines
+        ],
+    }
+
+
+def publish_kitchen_event(order, event):
+    """
+    Publica un evento de un pedido en el canal de la cocina con pg_notify.
+
+    PostgreSQL solo entrega la notificación cuando se confirma la transacción, así que si el pedido
+    no llega a guardarse las pantallas no reciben nada.
+    """
+    data = get_kitchen_event(order, event)
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+        data["order_lines"] = None
+        payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [KITCHEN_FEED_CHANNEL, payload])
+
+
+class KitchenFeedBroker:
+    """
+    Reparte los eventos de la cocina entre las pantallas conectadas a este proceso.
+
+    Usa una única conexión a PostgreSQL que escucha (LISTEN) el canal de la cocina desde el bucle de
+    eventos, sin hilos ni consultas por pantalla: cada notificación se copia en la cola de las
+    pantallas de su restaurante.
+    """
+
+    def __init__(self, channel=KITCHEN_FEED_CHANNEL):
+        self.channel = channel
+        self.subscribers = defaultdict(set)
+        self.listener = None
+        self.loop = None
+
+    def subscribe(self, restaurant_id):
+        """Conecta una pantalla a los eventos de un restaurante y devuelve su cola."""
+        queue = asyncio.Queue(maxsize=KITCHEN_FEED_QUEUE_SIZE)
+        self.subscribers[restaurant_id].add(queue)
+        if self.listener is None:
+            self.start_listener()
+        return queue
+
+    def unsubscribe(self, restaurant_id, queue):
+        """Desconecta una pantalla. El listener sigue abierto para las siguientes."""
+        queues = self.subscribers.get(restaurant_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[restaurant_id]
+
+    def dispatch(self, payload):
+        """Copia un evento (el JSON de la notificación) en las colas de las pantallas de su restaurante."""
+        try:
+            event = json.loads(payload)
+            restaurant_id = int(event["restaurant"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Evento de cocina no válido: %s", payload)
+            return
+        for queue in list(self.subscribers.get(restaurant_id, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # La pantalla no lee los eventos: se vacía su cola y se le indica que se desconecte
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                self.unsubscribe(restaurant_id, queue)
+
+    def start_listener(self):
+        """Abre la conexión que escucha el canal y la registra en el bucle de eventos."""
+        self.loop = asyncio.get_running_loop()
+        try:
+            self.listener = psycopg2.connect(**connections['default'].get_connection_params())
+            self.listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with self.listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.channel}')
+        except psycopg2.Error:
+            logger.exception("No se ha podido escuchar el canal %s", self.channel)
+            self.close_listener()
+            self.loop.call_later(KITCHEN_FEED_RECONNECT_DELAY, self.reconnect)
+            return
+        self.loop.add_reader(self.listener.fileno(), self.read_notifications)
+
+    def read_notifications(self):
+        """Lee las notificaciones recibidas por el listener y las reparte."""
+        try:
+            self.listener.poll()
+        except psycopg2.Error:
+            logger.exception("Se ha perdido la conexión del canal %s", self.channel)
+            self.close_listener()
+            self.loop.call_later(KITCHEN_FEED_RECONNECT_DELAY, self.reconnect)
+            return
+        while self.listener.notifies:
+            self.dispatch(self.listener.notifies.pop(0).payload)
+
+    def reconnect(self):
+        """Vuelve a abrir el listener si sigue habiendo pantallas conectadas."""
+        if self.listener is None and self.subscribers:
+            self.start_listener()
+
+    def close_listener(self):
+        """Cierra la conexión que escucha el canal."""
+        if self.listener is None:
+            return
+        if not self.listener.closed:
+            self.loop.remove_reader(self.listener.fileno())
+            self.listener.close()
+        self.listener = None
+
+
+broker = KitchenFeedBroker()
+
+
+def format_event(event, event_id):
+    """Devuelve un evento en el formato de Server-Sent Events."""
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    return f'id: {event_id}\nevent: {event["event"]}\ndata: {data}\n\n'.encode()
+
+
+def get_feed_token_serializer():
+    """Firmador de los tokens del feed, con la SECRET_KEY del proyecto."""
+    return itsdangerous.URLSafeTimedSerializer(settings.SECRET_KEY, salt=KITCHEN_FEED_TOKEN_SALT)
+
+
+def create_feed_token(user, restaurant_id):
+    """
+    Devuelve un token firmado para abrir el feed de un restaurante durante KITCHEN_FEED_TOKEN_MAX_AGE
+    segundos. Va en la URL (EventSource no permite enviar cabeceras), así que no se usa el token de la API.
+    """
+    return get_feed_token_serializer().dumps({"user": user.pk, "restaurant": restaurant_id})
+
+
+def get_feed_token_user_id(key, restaurant_id):
+    """Devuelve el usuario de un token del feed si es válido, no ha caducado y es de ese restaurante; si no, None."""
+    try:
+        data = get_feed_token_serializer().loads(key, max_age=KITCHEN_FEED_TOKEN_MAX_AGE)
+    except itsdangerous.BadData:
+        return None
+    if not isinstance(data, dict) or data.get("restaurant") != restaurant_id:
+        return None
+    return data.get("user")
+
+
+@sync_to_async
+def get_feed_user(scope, restaurant_id):
+    """
+    Devuelve el administrador autenticado con el token de la API en la cabecera Authorization
+    (Token <clave>) o con un token del feed del restaurante en ?token (ver create_feed_token).
+    Si no lo es devuelve None.
+    """
+    headers = dict(scope.get('headers', ()))
+    authorization = headers.get(b'authorization', b'').decode().split()
+    key = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+
+    close_old_connections()
+    try:
+        if len(authorization) == 2 and authorization[0].lower() == 'token':
+            token = Token.objects.select_related('user').filter(key=authorization[1]).first()
+            user = token.user if token is not None else None
+        elif key:
+            user_id = get_feed_token_user_id(key, restaurant_id)
+            user = User.objects.filter(pk=user_id).first() if user_id is not None else None
+        else:
+            user = None
+    finally:
+        close_old_connections()
+    if user is None or not user.is_active or not user.is_admin:
+        return None
+    return user
+
+
+async def send_error(send, status_code, message):
+    """Envía una respuesta JSON de error y cierra la conexión."""
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({"error": message}).encode()})
+
+
+async def kitchen_feed_app(scope, receive, send, feed_broker=None):
+    """
+    Aplicación ASGI del feed de la cocina: mantiene abierta una respuesta text/event-stream con los
+    pedidos nuevos, cancelados y finalizados del restaurante, para administradores. Se sirve aparte
+    de la API (ver restaurants_api/asgi.py).
+
+    Las pantallas no hacen consultas: reciben los eventos que reparte el broker del proceso.
+    """
+    feed_broker = feed_broker or broker
+    restaurant_id = int(KITCHEN_FEED_PATH.match(scope['path']).group('restaurant_id'))
+    if scope['method'] != 'GET':
+        await send_error(send, 405, "Método no permitido.")
+        return
+    if await get_feed_user(scope, restaurant_id) is None:
+        await send_error(send, 401, "Se necesita el token de un administrador.")
+        return
+
+    queue = feed_broker.subscribe(restaurant_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': f'retry: {KITCHEN_FEED_RECONNECT_DELAY * 1000}\n\n'.encode(), 'more_body': True})
+
+        event_id = 0
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({next_event, disconnected}, timeout=KITCHEN_FEED_HEARTBEAT, return_when=asyncio.FIRST_COMPLETED)
+            if next_event not in done:
+                next_event.cancel()
+                if not disconnected.done():
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                continue
+            event = next_event.result()
+            if event is None:
+                break
+            event_id += 1
+            await send({'type': 'http.response.body', 'body': format_event(event, event_id), 'more_body': True})
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        feed_broker.unsubscribe(restaurant_id, queue)
+
+
+async def wait_for_disconnect(receive):
+    """Espera a que el cliente cierre la conexión."""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
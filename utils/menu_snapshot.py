@@ -0,0 +1,120 @@
+import gzip
+import hashlib
+import json
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from dishes.serializers import MenuDishSerializer
+from restaurant_dish_link.models import RestaurantDishLink
+from restaurants.models import MenuSnapshot, Restaurant
+from utils.ingredients import filter_menu_dish_ids
+
+MENU_GZIP_LEVEL = 6
+# Tiempo que se guarda el menú filtrado por ingredientes de una versión del menú
+MENU_FILTER_CACHE_TIMEOUT = 60 * 60
+
+
+def render_menu(restaurant_id):
+    """Devuelve el JSON del menú de un restaurante: sus platos, indicando si queda stock (in_stock)."""
+    dishes = []
+    for link in RestaurantDishLink.objects.filter(restaurant_id=restaurant_id).select_related('dish'):
+        # in_stock sale del propio enlace, sin consultas por plato
+        link.dish.in_stock = link.stock > 0
+        dishes.append(link.dish)
+    return JSONRenderer().render(MenuDishSerializer(dishes, many=True).data)
+
+
+def build_menu_snapshot(restaurant_id, version):
+    """
+    Genera el menú de un restaurante y lo guarda como la versión indicada. Devuelve el MenuSnapshot.
+
+    Solo se guarda si no hay ya una versión igual o más reciente, así que una generación lenta no
+    sobrescribe a otra posterior. Si el menú cambia mientras se genera, su versión aumenta y se vuelve
+    a generar en la siguiente lectura.
+    """
+    content = render_menu(restaurant_id)
+    content_gzip = gzip.compress(content, MENU_GZIP_LEVEL, mtime=0)
+    built_at = timezone.now()
+    MenuSnapshot.objects.filter(restaurant_id=restaurant_id, built_version__lt=version).update(
+        built_version=version, content=content, content_gzip=content_gzip, built_at=built_at,
+    )
+    return MenuSnapshot(
+        restaurant_id=restaurant_id, version=version, built_version=version,
+        content=content, content_gzip=content_gzip, built_at=built_at,
+    )
+
+
+def get_menu_snapshot(restaurant_id, compressed=False):
+    """
+    Devuelve el MenuSnapshot de un restaurante al día (generándolo si ha cambiado), o None si el
+    restaurante no existe.
+
+    Solo se lee la copia que se va a enviar: el JSON o, si compressed, el gzip.
+    """
+    snapshot = MenuSnapshot.objects.defer('content' if compressed else 'content_gzip').filter(
+        restaurant_id=restaurant_id,
+    ).first()
+    if snapshot is None:
+        if not Restaurant.objects.filter(pk=restaurant_id).exists():
+            return None
+        snapshot = MenuSnapshot(restaurant_id=restaurant_id)
+        MenuSnapshot.objects.bulk_create([snapshot], ignore_conflicts=True)
+    elif snapshot.built_version == snapshot.version:
+        return snapshot
+    return build_menu_snapshot(restaurant_id, snapshot.version)
+
+
+def get_menu_etag(snapshot, filter_digest=None, compressed=False):
+    """
+    ETag fuerte del menú: cambia con cada versión y, si está filtrado, con los filtros.
+
+    El gzip es otra representación del menú, con otros bytes, así que lleva su propio ETag (-gzip).
+    """
+    etag = f'menu-{snapshot.restaurant_id}-{snapshot.built_version}'
+    if filter_digest:
+        etag = f'{etag}-{filter_digest}'
+    if compressed:
+        etag = f'{etag}-gzip'
+    return f'"{etag}"'
+
+
+def get_menu_filter_digest(include, exclude, exclude_allergens):
+    """Resumen de unos filtros de ingredientes (ya normalizados y ordenados) para las claves y el ETag."""
+    filters = json.dumps([list(include), list(exclude), list(exclude_allergens)])
+    return hashlib.sha256(filters.encode()).hexdigest()[:16]
+
+
+def get_filtered_menu(snapshot, include=(), exclude=(), exclude_allergens=()):
+    """
+    Devuelve el JSON del menú generado con solo los platos que cumplen los filtros de ingredientes
+    (ver utils/ingredients.py filter_menu_dish_ids).
+
+    El resultado se guarda en la caché con la versión del menú en la clave: cualquier cambio en el
+    menú, sus platos o sus ingredientes cambia la versión, así que no hace falta invalidarlo.
+    """
+    key = (
+        f'menu:{snapshot.restaurant_id}:{snapshot.built_version}:'
+        f'{get_menu_filter_digest(include, exclude, exclude_allergens)}'
+    )
+    content = cache.get(key)
+    if content is None:
+        dish_ids = filter_menu_dish_ids(snapshot.restaurant_id, include, exclude, exclude_allergens)
+        content = JSONRenderer().render([dish for dish in json.loads(bytes(snapshot.content)) if dish['pk'] in dish_ids])
+        cache.set(key, content, MENU_FILTER_CACHE_TIMEOUT)
+    return content
+
+
+def invalidate_menus(restaurant_ids):
+    """
+    Cambia la versión del menú de unos restaurantes y, al confirmar la transacción, lo vuelve a generar.
+
+    Los menús que todavía no se han generado no se tocan: se generan en la primera lectura.
+    """
+    restaurant_ids = {restaurant_id for restaurant_id in restaurant_ids if restaurant_id is not None}
+    if not restaurant_ids:
+        return
+
+    MenuSnapshot.objects.filter(restaurant_id__in=restaurant_ids).update(version=F('version') + 1)
+    transaction.on_commit(lambda: [get_menu_snapshot(restaurant_id) for restaurant_id in restaurant_ids])
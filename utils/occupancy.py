@@ -0,0 +1,108 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from reserves.models import Reserve, TableOccupancy
+from utils.availability import reserve_day, reserve_to_mask
+from utils.slots import mask_to_slots
+
+# Tamaño de los lotes al reconstruir la ocupación
+REBUILD_BATCH_SIZE = 2000
+
+
+def update_occupancy(table_id, start_reserve, finish_reserve, delta):
+    """
+    Suma (delta=1) o resta (delta=-1) una reserva a la ocupación materializada de su mesa.
+
+    Las filas que se quedan a cero no se borran: otra transacción puede estar sumando en ellas a la vez
+    y su incremento se perdería. Quien lee la ocupación filtra reserves > 0; rebuild_occupancy las elimina.
+    """
+    slots = mask_to_slots(reserve_to_mask(start_reserve, finish_reserve))
+    if not slots:
+        return
+
+    day = reserve_day(start_reserve)
+    if delta > 0:
+        TableOccupancy.objects.bulk_create(
+            [TableOccupancy(table_id=table_id, day=day, slot=slot) for slot in slots],
+            ignore_conflicts=True,
+        )
+
+    TableOccupancy.objects.filter(table_id=table_id, day=day, slot__in=slots).update(reserves=F('reserves') + delta)
+
+
+def update_reserves_occupancy(reservations, delta):
+    """
+    Suma o resta varias reservas (tuplas table_id, start_reserve, finish_reserve) a la ocupación materializada.
+
+    Las reservas con el mismo día y franjas (por ejemplo, las mesas de un mismo pedido) se actualizan juntas.
+    Como en update_occupancy, las filas que se quedan a cero no se borran.
+    """
+    groups = defaultdict(set)
+    for table_id, start_reserve, finish_reserve in reservations:
+        slots = tuple(mask_to_slots(reserve_to_mask(start_reserve, finish_reserve)))
+        if slots:
+            groups[(reserve_day(start_reserve), slots)].add(table_id)
+
+    for (day, slots), table_ids in groups.items():
+        if delta > 0:
+            TableOccupancy.objects.bulk_create(
+                [TableOccupancy(table_id=table_id, day=day, slot=slot) for table_id in table_ids for slot in slots],
+                ignore_conflicts=True,
+            )
+
+        TableOccupancy.objects.filter(table_id__in=table_ids, day=day, slot__in=slots).update(
+            reserves=F('reserves') + delta,
+        )
+
+
+def compute_occupancy(reservations):
+    """Dadas tuplas (table_id, start_reserve, finish_reserve), devuelve {(table_id, día, franja): reservas}."""
+    occupancy = defaultdict(int)
+    for table_id, start_reserve, finish_reserve in reservations:
+        day = reserve_day(start_reserve)
+        for slot in mask_to_slots(reserve_to_mask(start_reserve, finish_reserve)):
+            occupancy[(table_id, day, slot)] += 1
+    return occupancy
+
+
+def compute_occupancy_from_reserves():
+    """Calcula la ocupación de todas las mesas a partir de las reservas no canceladas."""
+    reservations = Reserve.objects.filter(is_active=True).values_list('table_id', 'start_reserve', 'finish_reserve')
+    return compute_occupancy(reservations.iterator(chunk_size=REBUILD_BATCH_SIZE))
+
+
+def rebuild_occupancy():
+    """
+    Reconstruye desde cero la ocupación materializada, sin las filas a cero que dejan las cancelaciones.
+    Devuelve el número de filas creadas.
+    """
+    occupancy = compute_occupancy_from_reserves()
+
+    with transaction.atomic():
+        TableOccupancy.objects.all().delete()
+        TableOccupancy.objects.bulk_create(
+            (
+                TableOccupancy(table_id=table_id, day=day, slot=slot, reserves=reserves)
+                for (table_id, day, slot), reserves in occupancy.items()
+            ),
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+
+    return len(occupancy)
+
+
+def verify_occupancy():
+    """Compara la ocupación materializada con las reservas. Devuelve la lista de diferencias."""
+    expected = compute_occupancy_from_reserves()
+    stored = {
+        (table_id, day, slot): reserves
+        for table_id, day, slot, reserves in TableOccupancy.objects.filter(
+            reserves__gt=0
+        ).values_list('table_id', 'day', 'slot', 'reserves').iterator(chunk_size=REBUILD_BATCH_SIZE)
+    }
+
+    return [
+        (key, expected.get(key, 0), stored.get(key, 0))
+        for key in sorted(set(expected) | set(stored))
+        if expected.get(key, 0) != stored.get(key, 0)
+    ]
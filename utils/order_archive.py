@@ -0,0 +1,167 @@
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from order_lines.models import OrderLine
+from orders.models import ArchivedOrder, Order, OrderStatus
+from orders.serializers import OrderSerializer
+from reserves.models import Reserve
+from utils.availability import reserve_day
+from utils.availability_cache import invalidate_availability_day
+from utils.occupancy import update_reserves_occupancy
+
+# Meses tras los que se archivan los pedidos finalizados o cancelados
+ORDER_ARCHIVE_MONTHS = 6
+# Pedidos que se archivan por transacción: cada lote bloquea solo sus filas y durante poco tiempo
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+
+def get_archive_cutoff(months=ORDER_ARCHIVE_MONTHS, now=None):
+    """Devuelve la fecha de hace months meses (el día se ajusta al último del mes si no existe)."""
+    now = now or timezone.now()
+    month = now.month - 1 - months
+    year, month = now.year + month // 12, month % 12 + 1
+    for day in range(now.day, 0, -1):
+        try:
+            return now.replace(year=year, month=month, day=day)
+        except ValueError:
+            continue
+
+
+def get_archivable_orders(cutoff):
+    """
+    Pedidos que se pueden archivar: finalizados (completados o con finished_at) o cancelados, creados
+    antes de cutoff y sin reservas que terminen después, para que la disponibilidad no cambie.
+    """
+    return Order.objects.filter(
+        Q(status__in=[OrderStatus.COMPLETED, OrderStatus.CANCELLED]) | Q(finished_at__isnull=False),
+        created_at__lt=cutoff,
+    ).exclude(reserves__finish_reserve__gte=cutoff)
+
+
+def archive_order_batch(cutoff, batch_size=ORDER_ARCHIVE_BATCH_SIZE):
+    """
+    Archiva un lote de pedidos en una transacción y devuelve cuántos se han archivado.
+
+    Las filas se reservan con SELECT ... FOR UPDATE SKIP LOCKED, así que el lote no espera a los pedidos
+    que se estén modificando ni los bloquea. Cada pedido se guarda en ArchivedOrder con sus líneas y
+    reservas, y después se eliminan de sus tablas. Las reservas se eliminan con una única consulta
+    (sin las señales de cada una): la ocupación y la caché de disponibilidad se actualizan aquí.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            get_archivable_orders(cutoff).select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        orders = list(Order.objects.filter(pk__in=order_ids).select_related('restaurant', 'user').prefetch_related(
+            Prefetch('order_lines', queryset=OrderLine.objects.select_related('dish')),
+            'reserves',
+        ))
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order.pk, restaurant_id=order.restaurant_id, user_id=order.user_id, status=order.status,
+                total=order.total, total_dishes=order.total_dishes, discount=order.discount,
+                created_at=order.created_at, finished_at=order.finished_at, data=data,
+            )
+            for order, data in zip(orders, OrderSerializer(orders, many=True).data)
+        ])
+
+        active_reserves = [
+            (reserve.table_id, reserve.start_reserve, reserve.finish_reserve, order.restaurant_id)
+            for order in orders for reserve in order.reserves.all() if reserve.is_active
+        ]
+        update_reserves_occupancy([reservation[:3] for reservation in active_reserves], -1)
+        Reserve.objects.filter(assigned_order_id__in=order_ids)._raw_delete(Reserve.objects.db)
+        # Los resúmenes diarios (OrderDailyRollup) siguen contando los pedidos archivados
+        Order.objects.filter(pk__in=order_ids).delete()
+
+        for restaurant_id, day in {(reservation[3], reserve_day(reservation[1])) for reservation in active_reserves}:
+            invalidate_availability_day(restaurant_id, day)
+    return len(order_ids)
+
+
+def archive_orders(months=ORDER_ARCHIVE_MONTHS, batch_size=ORDER_ARCHIVE_BATCH_SIZE, now=None):
+    """Archiva en lotes los pedidos finalizados o cancelados de hace más de months meses y devuelve cuántos."""
+    cutoff = get_archive_cutoff(months, now)
+    archived = 0
+    while True:
+        batch = archive_order_batch(cutoff, batch_size)
+        if not batch:
+            return archived
+        archived += batch
+
+
+class OrderHistory:
+    """
+    Pedidos activos y archivados de un usuario como si fueran un único QuerySet de Order.
+
+    Admite lo que usan los paginadores de la API (count, filter, order_by y cortes): cada corte se pide
+    a las dos tablas, que tienen created_at y el id original del pedido, y los resultados se mezclan
+    en memoria con la misma ordenación.
+    """
+    model = Order
+
+    def __init__(self, orders, archived_orders, ordering=('-created_at', '-pk')):
+        """Guarda los QuerySet de pedidos activos y archivados."""
+        self.orders = orders
+        self.archived_orders = archived_orders
+        self.ordering = tuple(ordering)
+
+    def count(self):
+        """Número de pedidos activos y archivados."""
+        return self.orders.count() + self.archived_orders.count()
+
+    def __len__(self):
+        """Número de pedidos activos y archivados."""
+        return self.count()
+
+    def filter(self, *args, **kwargs):
+        """Aplica el mismo filtro a las dos tablas."""
+        return OrderHistory(
+            self.orders.filter(*args, **kwargs), self.archived_orders.filter(*args, **kwargs), self.ordering,
+        )
+
+    def order_by(self, *ordering):
+        """Ordena las dos tablas por los mismos campos."""
+        return OrderHistory(self.orders, self.archived_orders, ordering)
+
+    def merge(self, orders, archived_orders):
+        """Mezcla pedidos activos y archivados con la ordenación de la historia."""
+        results = list(orders) + list(archived_orders)
+        # Ordenación estable campo a campo, del último al primero
+        for name in reversed(self.ordering):
+            results.sort(key=lambda order: getattr(order, name.lstrip('-')), reverse=name.startswith('-'))
+        return results
+
+    def __iter__(self):
+        """Recorre todos los pedidos activos y archivados, ordenados."""
+        return iter(self.merge(self.orders.order_by(*self.ordering), self.archived_orders.order_by(*self.ordering)))
+
+    def __getitem__(self, index):
+        """Devuelve los pedidos de un corte [inicio:fin] mezclando las dos tablas."""
+        if not isinstance(index, slice) or index.step is not None or index.stop is None:
+            raise TypeError("OrderHistory solo admite cortes [inicio:fin].")
+        start = index.start or 0
+        results = self.merge(
+            self.orders.order_by(*self.ordering)[:index.stop],
+            self.archived_orders.order_by(*self.ordering)[:index.stop],
+        )
+        return results[start:index.stop]
+
+
+def get_user_order_history(user):
+    """Devuelve los pedidos activos (con sus datos relacionados precargados) y archivados de un usuario."""
+    orders = user.orders.select_related('restaurant', 'user').prefetch_related(
+        Prefetch('order_lines', queryset=OrderLine.objects.select_related('dish')),
+        'reserves',
+    )
+    return OrderHistory(orders, user.archived_orders.all())
+
+
+def serialize_order_history(orders):
+    """Devuelve la representación de pedidos activos (OrderSerializer) y archivados (la que se guardó)."""
+    return [
+        order.data if isinstance(order, ArchivedOrder) else OrderSerializer(order).data
+        for order in orders
+    ]
@@ -0,0 +1,180 @@
+import logging
+import time
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from rest_framework import status
+from orders.models import OrderIntake, OrderIntakeStatus
+from orders.serializers import OrderSerializer
+from utils.order_pipeline import OrderError, check_order_data, place_order
+
+logger = logging.getLogger(__name__)
+
+# Pedidos que reserva un worker de cada vez
+INTAKE_BATCH_SIZE = 20
+# Intentos de un pedido que falla por un error inesperado antes de darlo por fallido
+INTAKE_MAX_ATTEMPTS = 3
+# Tiempo tras el que un pedido en proceso se considera abandonado (el worker ha muerto) y se reencola
+INTAKE_STALE_TIMEOUT = timedelta(minutes=5)
+# Ventana con la que se calcula el rendimiento de la cola
+INTAKE_THROUGHPUT_WINDOW = timedelta(minutes=1)
+
+
+def enqueue_order(user, data):
+    """
+    Valida un pedido sin consultas y lo guarda en la cola de entrada.
+
+    Devuelve el OrderIntake creado o lanza OrderError si los datos no son válidos.
+    """
+    check_order_data(data)
+    return OrderIntake.objects.create(user=user, payload=data)
+
+
+def claim_intakes(batch_size=INTAKE_BATCH_SIZE):
+    """
+    Reserva hasta batch_size pedidos pendientes (los más antiguos) y los marca en proceso.
+
+    Usa SELECT ... FOR UPDATE SKIP LOCKED, así que varios workers reservan lotes distintos sin esperarse.
+    """
+    with transaction.atomic():
+        intakes = list(
+            OrderIntake.objects.select_for_update(skip_locked=True)
+            .filter(status=OrderIntakeStatus.PENDING)
+            .select_related('user')
+            .order_by('created_at')[:batch_size]
+        )
+        now = timezone.now()
+        for intake in intakes:
+            intake.status = OrderIntakeStatus.PROCESSING
+            intake.started_at = now
+            intake.attempts += 1
+        OrderIntake.objects.bulk_update(intakes, ['status', 'started_at', 'attempts'])
+    return intakes
+
+
+def _finish_intake(intake, status_code, response, order=None):
+    """Guarda el resultado de un pedido de la cola."""
+    intake.status = OrderIntakeStatus.DONE if order else OrderIntakeStatus.FAILED
+    intake.status_code = status_code
+    intake.response = response
+    intake.order = order
+    intake.finished_at = timezone.now()
+    intake.save(update_fields=['status', 'status_code', 'response', 'order', 'finished_at'])
+
+
+def _lock_intake(intake):
+    """
+    Bloquea un pedido de la cola que sigue en proceso y sin pedido creado y lo devuelve, o None si ya lo
+    ha terminado otro worker (por ejemplo, tras reencolarlo por lento). Mientras dure la transacción,
+    ni otro worker ni requeue_stale_intakes pueden tocarlo.
+    """
+    return OrderIntake.objects.select_for_update().select_related('user').filter(
+        pk=intake.pk, status=OrderIntakeStatus.PROCESSING, order__isnull=True,
+    ).first()
+
+
+def process_intake(intake):
+    """
+    Crea el pedido de la cola con place_order y guarda la respuesta que habría devuelto el modo síncrono.
+
+    El pedido y su resultado se guardan en la misma transacción, con el pedido de la cola bloqueado: si
+    el worker muere antes de confirmarla no queda nada creado, y si otro worker lo vuelve a procesar
+    espera al primero y lo salta. Los errores inesperados vuelven a dejar el pedido pendiente hasta
+    INTAKE_MAX_ATTEMPTS intentos.
+    """
+    try:
+        with transaction.atomic():
+            locked = _lock_intake(intake)
+            if locked is None:
+                return
+            try:
+                order = place_order(locked.user, locked.payload)
+            except OrderError as error:
+                _finish_intake(locked, error.status_code, error.data)
+            else:
+                _finish_intake(locked, status.HTTP_201_CREATED, OrderSerializer(order).data, order)
+    except Exception:
+        logger.exception("Error al procesar el pedido encolado %s", intake.pk)
+        with transaction.atomic():
+            locked = _lock_intake(intake)
+            if locked is None:
+                return
+            if locked.attempts < INTAKE_MAX_ATTEMPTS:
+                OrderIntake.objects.filter(pk=locked.pk).update(status=OrderIntakeStatus.PENDING)
+            else:
+                _finish_intake(locked, status.HTTP_500_INTERNAL_SERVER_ERROR, {"error": "No se ha podido crear el pedido."})
+
+
+def requeue_stale_intakes(timeout=INTAKE_STALE_TIMEOUT):
+    """
+    Vuelve a dejar pendientes los pedidos en proceso desde hace más de timeout y devuelve cuántos.
+
+    Los que ya se han intentado INTAKE_MAX_ATTEMPTS veces se dan por fallidos, para que un pedido que
+    siempre tumba al worker no se repita sin fin. Los que está procesando un worker están bloqueados
+    (ver process_intake): la actualización espera a que termine y ya no los encuentra en proceso.
+    """
+    now = timezone.now()
+    stale = OrderIntake.objects.filter(status=OrderIntakeStatus.PROCESSING, started_at__lt=now - timeout)
+    stale.filter(attempts__gte=INTAKE_MAX_ATTEMPTS).update(
+        status=OrderIntakeStatus.FAILED,
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        response={"error": "No se ha podido crear el pedido."},
+        finished_at=now,
+    )
+    return stale.filter(attempts__lt=INTAKE_MAX_ATTEMPTS).update(status=OrderIntakeStatus.PENDING)
+
+
+def process_intake_batch(batch_size=INTAKE_BATCH_SIZE):
+    """Reserva y procesa un lote de pedidos de la cola. Devuelve cuántos se han procesado."""
+    intakes = claim_intakes(batch_size)
+    for intake in intakes:
+        process_intake(intake)
+    return len(intakes)
+
+
+def run_intake_worker(batch_size=INTAKE_BATCH_SIZE, poll_interval=1.0, once=False):
+    """
+    Procesa la cola de pedidos lote a lote. Si no hay pedidos espera poll_interval segundos.
+
+    Con once=True termina cuando la cola se queda vacía. Devuelve cuántos pedidos ha procesado.
+    """
+    processed = 0
+    try:
+        while True:
+            requeue_stale_intakes()
+            count = process_intake_batch(batch_size)
+            processed += count
+            if count:
+                continue
+            if once:
+                return processed
+            time.sleep(poll_interval)
+    finally:
+        connection.close()
+
+
+def get_intake_metrics(now=None):
+    """
+    Devuelve el estado de la cola de pedidos:
+
+    - depth: pedidos pendientes.
+    - processing: pedidos en proceso.
+    - lag_seconds: antigüedad del pedido pendiente más antiguo.
+    - processed_last_minute / failed_last_minute: pedidos terminados en el último minuto.
+    - throughput_per_second: pedidos terminados por segundo en el último minuto.
+    """
+    now = now or timezone.now()
+    pending = OrderIntake.objects.filter(status=OrderIntakeStatus.PENDING)
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    finished = OrderIntake.objects.filter(finished_at__gte=now - INTAKE_THROUGHPUT_WINDOW)
+    processed = finished.count()
+
+    return {
+        "depth": pending.count(),
+        "processing": OrderIntake.objects.filter(status=OrderIntakeStatus.PROCESSING).count(),
+        "lag_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+        "processed_last_minute": processed,
+        "failed_last_minute": finished.filter(status=OrderIntakeStatus.FAILED).count(),
+        "throughput_per_second": round(processed / INTAKE_THROUGHPUT_WINDOW.total_seconds(), 3),
+    }
@@ -0,0 +1,297 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.settings import api_settings
+from dishes.models import Dish
+from order_lines.models import OrderLine
+from orders.models import OrderStatus
+from orders.serializers import OrderSerializer
+from reserves.models import Reserve, RESERVE_OVERLAP_MESSAGE, get_reserve_period, is_reserve_overlap_error
+from utils.availability import reserve_day
+from utils.availability_cache import invalidate_availability_day
+from utils.calendar_index import get_calendar_index
+from utils.cart_codes import CartCodeError, check_cart_code, redeem_cart_code
+from utils.kitchen_feed import ORDER_CREATED, publish_kitchen_event
+from utils.occupancy import update_reserves_occupancy
+from utils.stock import get_menu_links, get_out_of_stock, take_stock
+from utils.table_assignment import get_free_tables, find_best_tables, distribute_chairs
+
+RESERVE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class OrderError(Exception):
+    """Error al crear un pedido: se deshace la transacción y se devuelve data con status_code."""
+
+    def __init__(self, data, status_code=status.HTTP_400_BAD_REQUEST):
+        """Guarda la respuesta de error."""
+        super().__init__(data)
+        self.data = data
+        self.status_code = status_code
+
+
+def _error(message, status_code=status.HTTP_400_BAD_REQUEST):
+    """Devuelve un OrderError con un mensaje en la clave error."""
+    return OrderError({"error": message}, status_code)
+
+
+def _to_positive_int(value):
+    """Convierte un valor en un entero positivo, o devuelve None si no lo es."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 1 else None
+
+
+def get_cart_code(code):
+    """Dado un código de carrito, devuelve el CartCode (o None si no se indica) o lanza OrderError si no se puede usar."""
+    if not code:
+        return None
+
+    try:
+        return check_cart_code(code)
+    except CartCodeError as error:
+        raise _error(str(error))
+
+
+def parse_reserve_dates(data):
+    """Devuelve el inicio y el fin de la reserva del pedido o lanza OrderError si no son válidos."""
+    try:
+        start_reserve = datetime.strptime(data.get("start_reserve"), RESERVE_DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise _error("Formato de fecha y hora de inicio de la reserva inválido. Use 'YYYY-MM-DD HH:MM:SS'.")
+
+    if start_reserve < datetime.now():
+        raise _error("La fecha y hora de inicio de la reserva no puede ser menor a la fecha y hora actual")
+
+    try:
+        finish_reserve = datetime.strptime(data.get("finish_reserve"), RESERVE_DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise _error("Formato de fecha y hora de fin de la reserva inválido. Use 'YYYY-MM-DD HH:MM:SS'.")
+
+    if start_reserve >= finish_reserve:
+        raise OrderError({api_settings.NON_FIELD_ERRORS_KEY: [
+            "La fecha/hora de inicio debe ser anterior a la fecha/hora de finalización."
+        ]})
+
+    return timezone.make_aware(start_reserve), timezone.make_aware(finish_reserve)
+
+
+def check_order_data(data):
+    """
+    Validaciones de un pedido que no necesitan consultas (formato de los datos y fechas de la reserva).
+
+    Se usan para aceptar un pedido en la cola asíncrona; el resto se valida al crearlo con place_order.
+    """
+    if data.get("restaurant") in (None, ""):
+        raise OrderError({"restaurant": ["Este campo es requerido."]})
+    if not isinstance(data.get("order_lines") or [], list) or not all(
+        isinstance(line, dict) for line in data.get("order_lines") or []
+    ):
+        raise _error("Las líneas del pedido (order_lines) deben ser una lista de objetos.")
+    if not isinstance(data.get("tables") or [], list):
+        raise _error("Las mesas (tables) deben ser una lista.")
+    parse_reserve_dates(data)
+
+
+def build_order_lines(order, restaurant, lines):
+    """
+    Dado un pedido, su restaurante y las líneas recibidas, devuelve las OrderLine sin guardar y las
+    cantidades que se descuentan del stock de cada enlace del menú ({enlace: cantidad}).
+
+    Los platos se cargan con sus enlaces del menú en una sola consulta. Como bulk_create no llama a save(),
+    el total y el subtotal de cada línea se calculan aquí.
+    """
+    dish_ids = []
+    for line in lines:
+        dish_id = _to_positive_int(line.get("dish"))
+        if dish_id is None:
+            raise _error(f"El plato con ID {line.get('dish')} no fue encontrado.", status.HTTP_404_NOT_FOUND)
+        dish_ids.append(dish_id)
+
+    links = get_menu_links(restaurant.pk, set(dish_ids))
+    order_lines = []
+    quantities = defaultdict(int)
+    for line, dish_id in zip(lines, dish_ids):
+        link = links.get(dish_id)
+        if link is None:
+            if not Dish.objects.filter(pk=dish_id).exists():
+                raise _error(f"El plato con ID {dish_id} no fue encontrado.", status.HTTP_404_NOT_FOUND)
+            raise _error(f"El plato con ID {dish_id} no está en el menú del restaurante.")
+
+        quantity = _to_positive_int(line.get("quantity", 1))
+        if quantity is None:
+            raise _error(f"La cantidad del plato con ID {dish_id} debe ser un entero positivo.")
+
+        dish = link.dish
+        total = dish.price * quantity
+        order_lines.append(OrderLine(
+            order=order, dish=dish, quantity=quantity, price=dish.price, total=total, subtotal=total,
+        ))
+        quantities[link.pk] += quantity
+    return order_lines, quantities
+
+
+def get_order_tables(data, restaurant, start_reserve, finish_reserve):
+    """
+    Devuelve [(mesa, sillas asignadas)] para la reserva del pedido.
+
+    Si no se indican mesas pero sí comensales (party_size), se elige la mesa (o mesas contiguas)
+    que mejor encaje. Las mesas del restaurante se cargan una sola vez.
+    """
+    all_tables = {table.id: table for table in restaurant.tables.all()}
+    table_ids = data.get("tables") or []
+    party_size = data.get("party_size")
+
+    if not table_ids and party_size is not None:
+        party_size = _to_positive_int(party_size)
+        if party_size is None:
+            raise _error("El número de comensales (party_size) debe ser un entero positivo.")
+
+        free_tables = get_free_tables(all_tables.values(), start_reserve, finish_reserve)
+        best_tables = find_best_tables(free_tables, party_size)
+        if not best_tables:
+            raise _error(f"No hay mesas disponibles para {party_size} comensales en el horario indicado.")
+        order_tables = list(zip(best_tables, distribute_chairs(best_tables, party_size)))
+    else:
+        order_tables = []
+        for table_id in table_ids:
+            try:
+                table = all_tables.get(int(table_id))
+            except (TypeError, ValueError):
+                table = None
+            if table is None:
+                raise _error(f"La mesa con ID {table_id} no fue encontrada.", status.HTTP_404_NOT_FOUND)
+            order_tables.append((table, table.max_chairs))
+
+    for table, chairs in order_tables:
+        validate_assigned_chairs(table, chairs)
+    return order_tables
+
+
+def validate_assigned_chairs(table, chairs):
+    """Lanza OrderError si las sillas asignadas no están entre min_chairs y max_chairs de la mesa (como ReserveSerializer)."""
+    if not table.min_chairs <= chairs <= table.max_chairs:
+        raise OrderError({"assigned_chairs": [
+            f"El número de sillas asignadas debe estar entre {table.min_chairs} y {table.max_chairs}."
+        ]})
+
+
+def build_reserves(order, order_tables, start_reserve, finish_reserve):
+    """
+    Devuelve las Reserve sin guardar del pedido.
+
+    Las reservas activas que se superponen con cualquiera de las mesas se cargan en una sola consulta.
+    La restricción de exclusión de la base de datos sigue impidiendo las que se creen a la vez.
+    """
+    period = get_reserve_period(start_reserve, finish_reserve)
+    table_ids = {table.pk for table, chairs in order_tables}
+    busy_tables = set(Reserve.objects.filter(
+        table_id__in=table_ids, is_active=True, period__overlap=period,
+    ).values_list('table_id', flat=True))
+
+    reserves = []
+    for table, chairs in order_tables:
+        if table.pk in busy_tables:
+            raise OrderError({api_settings.NON_FIELD_ERRORS_KEY: [RESERVE_OVERLAP_MESSAGE]})
+        busy_tables.add(table.pk)
+
+        reserve = Reserve(
+            start_reserve=start_reserve, finish_reserve=finish_reserve,
+            assigned_order=order, assigned_chairs=chairs, table=table,
+        )
+        reserve.update_period()
+        reserves.append(reserve)
+    return reserves
+
+
+def apply_cart_code(total, cart_code):
+    """Aplica el descuento de un código de carrito a un total (sin bajar de 0)."""
+    if cart_code.fixed_discount > 0:
+        total -= Decimal(cart_code.fixed_discount)
+    elif cart_code.percent_discount > 0:
+        total -= total * Decimal(cart_code.percent_discount) / Decimal(100)
+    else:
+        raise _error("Tipo de cupón no válido")
+    return max(total, Decimal(0))
+
+
+def place_order(user, data):
+    """
+    Crea un pedido con sus líneas, sus reservas y el cupón aplicado en una sola transacción.
+
+    Las consultas no dependen del número de líneas ni de mesas: los platos se cargan con sus enlaces
+    del menú en una consulta, las líneas y las reservas se insertan con bulk_create, el stock se
+    descuenta con un único UPDATE y los totales se calculan en memoria.
+    Cualquier error lanza OrderError y deshace todo lo creado.
+    """
+    with transaction.atomic():
+        cart_code = get_cart_code(data.get("cart_code_code"))
+
+        order_serializer = OrderSerializer(data={
+            "restaurant": data.get("restaurant"),
+            "user": user.id,
+            "total": Decimal(data.get("total", 0)),
+            "total_dishes": data.get("total_dishes", 0),
+            "cart_code": cart_code.id if cart_code else None,
+            "status": OrderStatus.PENDING,
+        })
+        if not order_serializer.is_valid():
+            raise OrderError(order_serializer.errors)
+
+        start_reserve, finish_reserve = parse_reserve_dates(data)
+
+        restaurant = order_serializer.validated_data["restaurant"]
+        try:
+            get_calendar_index(restaurant.calendar).get_schedule(start_reserve.date())
+        except Exception as e:
+            raise _error(f'Error al obtener el horario para el día especificado. El calendario no se ha terminado de configurar correctamente. {e}')
+
+        order = order_serializer.save()
+        order_lines, stock_quantities = build_order_lines(order, restaurant, data.get("order_lines") or [])
+        order_tables = get_order_tables(data, restaurant, start_reserve, finish_reserve)
+        reserves = build_reserves(order, order_tables, start_reserve, finish_reserve)
+
+        OrderLine.objects.bulk_create(order_lines)
+        if not take_stock(stock_quantities):
+            dish_ids = ", ".join(str(dish_id) for dish_id in get_out_of_stock(stock_quantities))
+            raise _error(f"No hay stock suficiente de los platos con ID {dish_ids}.")
+
+        try:
+            with transaction.atomic():
+                Reserve.objects.bulk_create(reserves)
+        except IntegrityError as error:
+            if not is_reserve_overlap_error(error):
+                raise
+            raise OrderError({api_settings.NON_FIELD_ERRORS_KEY: [RESERVE_OVERLAP_MESSAGE]})
+
+        # bulk_create no envía post_save: la ocupación y la caché de disponibilidad se actualizan aquí
+        update_reserves_occupancy(
+            [(reserve.table_id, reserve.start_reserve, reserve.finish_reserve) for reserve in reserves], 1,
+        )
+        if reserves:
+            invalidate_availability_day(restaurant.pk, reserve_day(start_reserve))
+
+        subtotal = sum((line.subtotal for line in order_lines), Decimal(0))
+        order.total = apply_cart_code(subtotal, cart_code) if cart_code else subtotal
+        order.total_dishes = sum(line.quantity for line in order_lines)
+        order.discount = subtotal - order.total
+        order.save(update_fields=['total', 'total_dishes', 'discount', 'updated_at'])
+
+        # El uso se descuenta al final para bloquear la fila del cupón el menor tiempo posible
+        if cart_code:
+            try:
+                redeem_cart_code(cart_code)
+            except CartCodeError as error:
+                raise _error(str(error))
+
+        prefetch_related_objects(
+            [order], Prefetch('order_lines', queryset=OrderLine.objects.select_related('dish')), 'reserves',
+        )
+        # La notificación a las pantallas de la cocina se entrega al confirmar la transacción
+        publish_kitchen_event(order, ORDER_CREATED)
+    return order
@@ -0,0 +1,157 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from orders.models import ArchivedOrder, Order, OrderDailyRollup, OrderStatus
+
+# Tamaño de los lotes al reconstruir los resúmenes
+ROLLUP_BATCH_SIZE = 2000
+ROLLUP_FIELDS = ('orders', 'revenue', 'dishes', 'discount')
+
+
+def get_rollup_status(status, finished_at):
+    """Estado con el que cuenta un pedido en los resúmenes: los finalizados (finish_order) cuentan como completados."""
+    if finished_at is not None and status != OrderStatus.CANCELLED:
+        return OrderStatus.COMPLETED
+    return status
+
+
+def get_order_rollup(order):
+    """
+    Devuelve lo que suma un pedido a los resúmenes: ((restaurante, día, estado), (pedidos, ingresos,
+    platos, descuento)), o None si todavía no se ha guardado.
+
+    Solo lee los campos ya cargados del pedido, así que no hace consultas.
+    """
+    values = order.__dict__
+    if values.get('created_at') is None or values.get('restaurant_id') is None:
+        return None
+    key = (
+        values['restaurant_id'],
+        timezone.localdate(values['created_at']),
+        get_rollup_status(values.get('status'), values.get('finished_at')),
+    )
+    return key, (
+        1, Decimal(str(values.get('total') or 0)), values.get('total_dishes') or 0, Decimal(str(values.get('discount') or 0)),
+    )
+
+
+def update_rollup(key, values, delta):
+    """Suma (delta=1) o resta (delta=-1) unos valores al resumen de (restaurante, día, estado)."""
+    restaurant_id, day, status = key
+    if delta > 0:
+        OrderDailyRollup.objects.bulk_create(
+            [OrderDailyRollup(restaurant_id=restaurant_id, day=day, status=status)], ignore_conflicts=True,
+        )
+    OrderDailyRollup.objects.filter(restaurant_id=restaurant_id, day=day, status=status).update(**{
+        field: F(field) + value * delta for field, value in zip(ROLLUP_FIELDS, values)
+    })
+
+
+def apply_order_rollup_change(previous, current):
+    """
+    Actualiza los resúmenes cuando un pedido pasa de previous a current (valores de get_order_rollup).
+
+    Se aplica al confirmar la transacción, en consultas cortas: así los pedidos de un mismo restaurante
+    y día no esperan unos a otros por la fila del resumen mientras se crean.
+    """
+    if previous == current:
+        return
+
+    def apply():
+        if previous is not None:
+            update_rollup(*previous, -1)
+        if current is not None:
+            update_rollup(*current, 1)
+
+    transaction.on_commit(apply)
+
+
+def _aggregate_rollups(queryset, rollups):
+    """Suma a rollups los pedidos de un QuerySet (Order o ArchivedOrder) agrupados en la base de datos."""
+    rows = queryset.annotate(
+        day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()),
+        rollup_status=Case(
+            When(~Q(status=OrderStatus.CANCELLED), finished_at__isnull=False, then=Value(OrderStatus.COMPLETED)),
+            default=F('status'),
+            output_field=CharField(),
+        ),
+    ).values('restaurant_id', 'day', 'rollup_status').annotate(
+        orders=Count('pk'), revenue=Sum('total'), dishes=Sum('total_dishes'), discount=Sum('discount'),
+    ).order_by()
+
+    for row in rows.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+        totals = rollups[(row['restaurant_id'], row['day'], row['rollup_status'])]
+        for index, field in enumerate(ROLLUP_FIELDS):
+            totals[index] += row[field] or 0
+
+
+def compute_rollups():
+    """Calcula los resúmenes de todos los pedidos, activos y archivados: {(restaurante, día, estado): valores}."""
+    rollups = defaultdict(lambda: [0, Decimal(0), 0, Decimal(0)])
+    _aggregate_rollups(Order.objects.all(), rollups)
+    _aggregate_rollups(ArchivedOrder.objects.all(), rollups)
+    return {key: tuple(values) for key, values in rollups.items()}
+
+
+def rebuild_rollups():
+    """Reconstruye desde cero los resúmenes. Devuelve el número de filas creadas."""
+    rollups = compute_rollups()
+
+    with transaction.atomic():
+        OrderDailyRollup.objects.all().delete()
+        OrderDailyRollup.objects.bulk_create(
+            (
+                OrderDailyRollup(restaurant_id=restaurant_id, day=day, status=status, **dict(zip(ROLLUP_FIELDS, values)))
+                for (restaurant_id, day, status), values in rollups.items()
+            ),
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+
+    return len(rollups)
+
+
+def verify_rollups():
+    """Compara los resúmenes guardados con los pedidos. Devuelve la lista de diferencias."""
+    expected = compute_rollups()
+    stored = {
+        (restaurant_id, day, status): tuple(values)
+        for restaurant_id, day, status, *values in OrderDailyRollup.objects.filter(orders__gt=0).values_list(
+            'restaurant_id', 'day', 'status', *ROLLUP_FIELDS
+        ).iterator(chunk_size=ROLLUP_BATCH_SIZE)
+    }
+
+    empty = (0, Decimal(0), 0, Decimal(0))
+    return [
+        (key, expected.get(key, empty), stored.get(key, empty))
+        for key in sorted(set(expected) | set(stored))
+        if expected.get(key, empty) != stored.get(key, empty)
+    ]
+
+
+def get_revenue_report(restaurant_ids, start_date, end_date):
+    """
+    Devuelve los pedidos, ingresos, platos y descuentos por restaurante, día y estado entre dos fechas
+    (incluidas), y sus totales por restaurante sin los pedidos cancelados. Solo lee los resúmenes.
+    """
+    rows = OrderDailyRollup.objects.filter(
+        restaurant_id__in=restaurant_ids, day__range=(start_date, end_date), orders__gt=0,
+    ).order_by('restaurant_id', 'day', 'status')
+
+    days = []
+    totals = {}
+    for row in rows:
+        values = {field: getattr(row, field) for field in ROLLUP_FIELDS}
+        days.append({"restaurant": row.restaurant_id, "day": row.day, "status": row.status, **values})
+        if row.status == OrderStatus.CANCELLED:
+            continue
+        restaurant_totals = totals.setdefault(row.restaurant_id, {field: 0 for field in ROLLUP_FIELDS})
+        for field, value in values.items():
+            restaurant_totals[field] += value
+
+    return {
+        "days": days,
+        "restaurants": [{"restaurant": restaurant_id, **values} for restaurant_id, values in sorted(totals.items())],
+    }
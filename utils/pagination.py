@@ -0,0 +1,168 @@
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+# Parámetro con el que el cliente elige la paginación por cursor (?pagination=cursor)
+PAGINATION_QUERY_PARAM = 'pagination'
+CURSOR_PAGINATION = 'cursor'
+# Máximo de elementos por página que puede pedir el cliente con ?page_size
+MAX_KEYSET_PAGE_SIZE = 100
+
+
+def get_keyset_ordering(view, queryset):
+    """
+    Devuelve la ordenación de la paginación por cursor de una vista: su atributo keyset_ordering o,
+    si no lo tiene, de más reciente a más antiguo por created_at (si el modelo lo tiene) y pk.
+
+    La ordenación siempre termina en pk para que no haya empates entre elementos.
+    """
+    ordering = getattr(view, 'keyset_ordering', None)
+    if ordering is None:
+        try:
+            queryset.model._meta.get_field('created_at')
+            ordering = ('-created_at', '-pk')
+        except FieldDoesNotExist:
+            ordering = ('-pk',)
+    if ordering[-1].lstrip('-') != 'pk':
+        ordering = tuple(ordering) + ('-pk' if ordering[-1].startswith('-') else 'pk',)
+    return tuple(ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset): cada página se pide con los valores de ordenación del último elemento
+    de la anterior, así que la base de datos no recorre las filas saltadas (OFFSET) ni las cuenta (COUNT).
+
+    El tiempo por página es el mismo en la primera que en la página mil. La respuesta tiene next,
+    previous y results; los cursores son opacos y se usan en las URLs de next y previous.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor no válido.'
+
+    def get_page_size(self, request):
+        """Devuelve el tamaño de página: ?page_size (hasta MAX_KEYSET_PAGE_SIZE) o PAGE_SIZE."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(page_size, 1), MAX_KEYSET_PAGE_SIZE)
+
+    def encode_cursor(self, instance, reverse):
+        """Codifica el cursor de un elemento: sus valores de ordenación y la dirección."""
+        values = [str(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Decodifica un cursor y devuelve (valores, dirección). Lanza NotFound si no es válido."""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            values = payload['v']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            fields = [self.get_field(name.lstrip('-')) for name in self.ordering]
+            return [field.to_python(value) for field, value in zip(fields, values)], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_field(self, name):
+        """Devuelve el campo del modelo con ese nombre (pk es la clave primaria)."""
+        meta = self.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def get_keyset_filter(self, values, reverse):
+        """
+        Devuelve la condición de los elementos posteriores (o anteriores si reverse) a unos valores
+        de ordenación: (a > x) o (a = x y b > y) o ..., con < en los campos descendentes.
+        """
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            field = name.lstrip('-')
+            equal = {self.ordering[previous].lstrip('-'): values[previous] for previous in range(index)}
+            condition |= Q(**equal, **{f'{field}__{"lt" if descending else "gt"}': values[index]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Devuelve los elementos de la página pedida con ?cursor (o la primera)."""
+        self.request = request
+        self.model = queryset.model
+        self.ordering = get_keyset_ordering(view, queryset)
+        self.page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if cursor:
+            values, reverse = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.get_keyset_filter(values, reverse))
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, bool(cursor)
+
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        """URL de la página siguiente o None."""
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1], False))
+
+    def get_previous_link(self):
+        """URL de la página anterior o None."""
+        if not self.has_previous or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[0], True))
+
+    def get_paginated_response(self, data):
+        """Devuelve la respuesta paginada, sin total de elementos."""
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class SelectablePagination(BasePagination):
+    """
+    Paginación por defecto de la API: LimitOffsetPagination o, con ?pagination=cursor o ?cursor,
+    KeysetPagination. Una vista puede fijar la paginación por cursor con pagination_class = KeysetPagination.
+    """
+
+    def get_paginator(self, request):
+        """Devuelve el paginador que pide el cliente."""
+        if (
+            request.query_params.get(PAGINATION_QUERY_PARAM) == CURSOR_PAGINATION
+            or KeysetPagination.cursor_query_param in request.query_params
+        ):
+            return KeysetPagination()
+        return LimitOffsetPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Pagina con el paginador elegido."""
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Devuelve la respuesta del paginador elegido."""
+        return self.paginator.get_paginated_response(data)
+
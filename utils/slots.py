@@ -0,0 +1,33 @@
+from datetime import time
+
+# Las horas de apertura van siempre en punto o a y media (ver validate_half_hour),
+# así que un día se representa con 48 franjas de media hora: el bit N es la franja N.
+SLOT_SECONDS = 30 * 60
+SLOTS_PER_DAY = 48
+# Hora de inicio de cada franja tal y como se devuelve en la API ('HH:MM:SS')
+SLOT_HOURS = tuple(str(time(slot // 2, slot % 2 * 30)) for slot in range(SLOTS_PER_DAY))
+
+
+def hour_to_slot(hour):
+    """Dada una hora de apertura (time o 'HH:MM:SS'), devuelve su franja de media hora."""
+    if isinstance(hour, str):
+        hour = time.fromisoformat(hour)
+    return (hour.hour * 3600 + hour.minute * 60 + hour.second) // SLOT_SECONDS
+
+
+def hours_to_mask(hours):
+    """Dada una lista de horas de apertura, devuelve la máscara de franjas correspondiente."""
+    mask = 0
+    for hour in hours:
+        mask |= 1 << hour_to_slot(hour)
+    return mask
+
+
+def mask_to_slots(mask):
+    """Dada una máscara, devuelve la lista de franjas ocupadas."""
+    return [slot for slot in range(SLOTS_PER_DAY) if mask >> slot & 1]
+
+
+def mask_to_hours(mask):
+    """Dada una máscara, devuelve las horas de sus franjas ('HH:MM:SS') en orden."""
+    return [SLOT_HOURS[slot] for slot in range(SLOTS_PER_DAY) if mask >> slot & 1]
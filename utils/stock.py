@@ -0,0 +1,81 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from restaurant_dish_link.models import RestaurantDishLink
+from utils.menu_snapshot import invalidate_menus
+
+
+def get_menu_links(restaurant_id, dish_ids):
+    """
+    Dado un restaurante y unos platos, devuelve {plato: RestaurantDishLink} con el plato ya cargado.
+
+    Es una sola consulta. Si un plato está enlazado varias veces se usa siempre el primer enlace.
+    """
+    links = {}
+    for link in RestaurantDishLink.objects.filter(
+        restaurant_id=restaurant_id, dish_id__in=dish_ids,
+    ).select_related('dish').order_by('id'):
+        links.setdefault(link.dish_id, link)
+    return links
+
+
+def _quantity_case(quantities):
+    """Dado {enlace: cantidad}, devuelve la expresión SQL con la cantidad de cada enlace."""
+    return Case(
+        *[When(pk=link_id, then=Value(quantity)) for link_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def take_stock(quantities):
+    """
+    Dado {enlace: cantidad}, descuenta el stock de todos los enlaces con un único UPDATE condicional.
+
+    Solo se descuenta si ningún enlace se queda en negativo; la condición la comprueba la base de datos
+    al bloquear cada fila, así que dos pedidos a la vez no pueden gastar el mismo stock. Devuelve False
+    si algún enlace no tiene stock suficiente; en ese caso el UPDATE se deshace (con un savepoint), así
+    que ningún enlace queda descontado y get_out_of_stock lee el stock que había antes del pedido.
+    """
+    if not quantities:
+        return True
+    quantity = _quantity_case(quantities)
+    with transaction.atomic():
+        updated = RestaurantDishLink.objects.filter(pk__in=quantities, stock__gte=quantity).update(
+            stock=F('stock') - quantity,
+        )
+        if updated != len(quantities):
+            transaction.set_rollback(True)
+            return False
+
+    # Los platos que se quedan sin stock cambian el menú del restaurante (in_stock)
+    invalidate_menus(RestaurantDishLink.objects.filter(pk__in=quantities, stock__lte=0).values_list('restaurant_id', flat=True).distinct())
+    return True
+
+
+def get_out_of_stock(quantities):
+    """
+    Dado {enlace: cantidad}, devuelve los platos cuyo stock no alcanza para la cantidad pedida.
+
+    Debe llamarse cuando take_stock devuelve False, que no deja descontado ningún enlace.
+    """
+    return [
+        dish_id
+        for link_id, dish_id, stock in RestaurantDishLink.objects.filter(pk__in=quantities).values_list('pk', 'dish_id', 'stock')
+        if stock < quantities[link_id]
+    ]
+
+
+def restore_stock(order):
+    """Devuelve al stock del restaurante las cantidades de las líneas de un pedido (por ejemplo, al cancelarlo)."""
+    dish_quantities = defaultdict(int)
+    for dish_id, quantity in order.order_lines.values_list('dish_id', 'quantity'):
+        dish_quantities[dish_id] += quantity
+    if not dish_quantities:
+        return
+
+    links = get_menu_links(order.restaurant_id, dish_quantities)
+    quantities = {link.pk: dish_quantities[dish_id] for dish_id, link in links.items()}
+    if quantities:
+        RestaurantDishLink.objects.filter(pk__in=quantities).update(stock=F('stock') + _quantity_case(quantities))
+    if any(link.stock <= 0 for link in links.values()):
+        invalidate_menus([order.restaurant_id])
@@ -0,0 +1,106 @@
+from utils.availability import get_occupied_masks, reserve_day, reserve_to_mask
+
+# Máximo de mesas contiguas que se pueden juntar para un mismo grupo
+MAX_COMBINED_TABLES = 3
+# Mesas vecinas en el plano del restaurante (arriba, abajo, izquierda y derecha)
+ADJACENT_OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def get_min_assignable_chairs(table):
+    """Devuelve el mínimo de sillas que se pueden asignar a una mesa (una reserva ocupa al menos una)."""
+    return max(1, table.min_chairs)
+
+
+def get_free_tables(tables, start_reserve, finish_reserve):
+    """
+    Dadas unas mesas y el inicio y fin de una reserva, devuelve las mesas activas libres en ese horario.
+
+    Lee la ocupación de todas las mesas en una sola consulta (ver get_occupied_masks).
+    """
+    tables = [table for table in tables if table.is_active]
+    day = reserve_day(start_reserve)
+    reserve_mask = reserve_to_mask(start_reserve, finish_reserve)
+    occupied_masks = get_occupied_masks(tables, day)
+
+    return [table for table in tables if not occupied_masks[(table.pk, day)] & reserve_mask]
+
+
+def get_adjacent_tables(tables):
+    """Dada una lista de mesas, devuelve para cada posición de la lista las posiciones de sus mesas vecinas."""
+    positions = {(table.x_position, table.y_position): index for index, table in enumerate(tables)}
+    return [
+        [
+            positions[(table.x_position + dx, table.y_position + dy)]
+            for dx, dy in ADJACENT_OFFSETS
+            if (table.x_position + dx, table.y_position + dy) in positions
+        ]
+        for table in tables
+    ]
+
+
+def find_best_tables(tables, party_size, max_tables=MAX_COMBINED_TABLES):
+    """
+    Dadas las mesas libres y el número de comensales, devuelve la mesa o el grupo de mesas contiguas
+    que desperdicia menos sillas.
+
+    Un grupo sirve si la suma de sus max_chairs alcanza a los comensales y la suma de sus min_chairs
+    no los supera. A igual desperdicio se prefieren menos mesas. Devuelve una lista vacía si no hay ninguno.
+    """
+    tables = sorted(
+        (table for table in tables if table.max_chairs >= get_min_assignable_chairs(table)),
+        key=lambda table: (table.y_position, table.x_position, table.pk),
+    )
+    min_chairs = [get_min_assignable_chairs(table) for table in tables]
+    max_chairs = [table.max_chairs for table in tables]
+    adjacent = get_adjacent_tables(tables)
+
+    best_key = None
+    best_group = None
+    groups = [(index,) for index in range(len(tables))]
+    seen = set()
+
+    for size in range(1, max_tables + 1):
+        next_groups = []
+        for group in groups:
+            group_min = sum(min_chairs[index] for index in group)
+            if group_min > party_size:
+                # Añadir más mesas solo sube el mínimo
+                continue
+
+            group_max = sum(max_chairs[index] for index in group)
+            if group_max >= party_size:
+                # Añadir más mesas solo aumentaría el desperdicio
+                key = (group_max - party_size, size)
+                if best_key is None or key < best_key:
+                    best_key, best_group = key, group
+                continue
+
+            if size == max_tables:
+                continue
+            for index in group:
+                for neighbour in adjacent[index]:
+                    if neighbour in group:
+                        continue
+                    candidate = tuple(sorted(group + (neighbour,)))
+                    if candidate not in seen:
+                        seen.add(candidate)
+                        next_groups.append(candidate)
+
+        if best_key is not None and best_key[0] == 0:
+            break
+        groups = next_groups
+
+    return [tables[index] for index in best_group] if best_group else []
+
+
+def distribute_chairs(tables, party_size):
+    """Dadas las mesas asignadas a un grupo, reparte los comensales y devuelve las sillas de cada mesa."""
+    chairs = [get_min_assignable_chairs(table) for table in tables]
+    remaining = party_size - sum(chairs)
+
+    for index, table in enumerate(tables):
+        extra = min(remaining, table.max_chairs - chairs[index])
+        chairs[index] += extra
+        remaining -= extra
+
+    return chairs
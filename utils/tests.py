@@ -6,6 +6,17 @@ from utils.calendar_utils import get_schedule_for_day
 from calendars.models import Calendar
 from reserves.models import Reserve
 from utils.calendar_utils import get_occupied_hours, get_available_hours
+from utils.availability import reserve_to_mask, get_free_hours
+from utils.slots import hours_to_mask, mask_to_hours
+from utils.table_assignment import find_best_tables, distribute_chairs
+from utils import calendar_index
+from utils.calendar_index import get_calendar_index
+from unittest import mock
+from django.db import IntegrityError, transaction
+from rest_framework import exceptions
+from datetime import timedelta
+from tables.models import Table
+from tables.management.commands.benchmark_table_assignment import build_benchmark_tables
 
 from django.test import TestCase
 from datetime import datetime, date, time
@@ -70,6 +81,101 @@ class ScheduleUtilsTests(TestCase):
         schedule = get_schedule_for_day(self.calendar, day)
         self.assertEqual(schedule, self.winter_schedule)
 
+class CalendarIndexTests(TestCase):
+    """Pruebas para el índice compilado de un calendario."""
+    def setUp(self):
+        """Configuración de las pruebas."""
+        self.calendar = Calendar.objects.create(
+            normal_start_date=date(2022, 1, 1),
+            summer_start_date=date(2022, 6, 1),
+            winter_start_date=date(2022, 12, 1),
+            closed_days=[date(2022, 3, 1)],
+        )
+        self.normal_schedule = Schedule.objects.create(calendar=self.calendar, opened_hours=["08:00:00"])
+        self.summer_schedule = Schedule.objects.create(calendar=self.calendar, opened_hours=["09:00:00"])
+        self.winter_schedule = Schedule.objects.create(calendar=self.calendar, opened_hours=["10:00:00"])
+        self.calendar.normal_week_schedule = self.normal_schedule
+        self.calendar.summer_week_schedule = self.summer_schedule
+        self.calendar.winter_week_schedule = self.winter_schedule
+        self.calendar.save()
+
+        self.custom_schedules = [
+            Schedule.objects.create(calendar=self.calendar, day=date(2022, 1, 1) + timedelta(days=day), opened_hours=["20:00:00"])
+            for day in range(0, 300, 3)
+        ]
+
+    def test_resolve_without_queries(self):
+        """Prueba para resolver días sin consultas una vez compilado el índice"""
+        calendar = Calendar.objects.get(pk=self.calendar.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            get_calendar_index(calendar)
+
+        with self.assertNumQueries(0):
+            index = get_calendar_index(calendar)
+            self.assertEqual(index.get_schedule(date(2022, 1, 4)), self.custom_schedules[1])
+            self.assertEqual(index.get_schedule(date(2022, 1, 5)), self.normal_schedule)
+            self.assertEqual(index.get_schedule(date(2022, 7, 1)), self.summer_schedule)
+            self.assertEqual(index.get_schedule(date(2022, 12, 25)), self.winter_schedule)
+            self.assertIsNone(index.get_opened_slots(date(2022, 3, 1)))
+            self.assertEqual(index.get_opened_slots(date(2022, 3, 2)), hours_to_mask(["20:00:00"]))
+
+    def test_recompiled_when_version_changes(self):
+        """Prueba para recompilar el índice al cambiar un horario del calendario"""
+        index = get_calendar_index(Calendar.objects.get(pk=self.calendar.pk))
+
+        self.normal_schedule.opened_hours = ["08:30:00"]
+        self.normal_schedule.save()
+        new_index = get_calendar_index(Calendar.objects.get(pk=self.calendar.pk))
+
+        self.assertGreater(new_index.version, index.version)
+        self.assertEqual(new_index.get_opened_slots(date(2022, 1, 5)), hours_to_mask(["08:30:00"]))
+
+    def test_not_stored_until_commit(self):
+        """Prueba para no reutilizar un índice compilado en una transacción que se deshace"""
+        calendar = Calendar.objects.get(pk=self.calendar.pk)
+        try:
+            with transaction.atomic():
+                self.normal_schedule.opened_hours = ["08:30:00"]
+                self.normal_schedule.save()
+                get_calendar_index(Calendar.objects.get(pk=self.calendar.pk))
+                raise IntegrityError
+        except IntegrityError:
+            pass
+
+        self.assertNotIn(calendar.pk, calendar_index._calendar_indexes)
+        calendar.version += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            index = get_calendar_index(calendar)
+        self.assertEqual(index.get_opened_slots(date(2022, 1, 5)), hours_to_mask(["08:00:00"]))
+
+    def test_cache_size_is_bounded(self):
+        """Prueba para descartar los índices usados hace más tiempo"""
+        calendars = [self.calendar] + [
+            Calendar.objects.create(normal_start_date=date(2022, 1, 1), summer_start_date=date(2022, 6, 1), winter_start_date=date(2022, 12, 1))
+            for _ in range(3)
+        ]
+        with mock.patch.object(calendar_index, 'CALENDAR_INDEX_CACHE_SIZE', 2):
+            for calendar in calendars:
+                with self.captureOnCommitCallbacks(execute=True):
+                    get_calendar_index(calendar)
+            self.assertListEqual(list(calendar_index._calendar_indexes), [calendar.pk for calendar in calendars[-2:]])
+
+    def test_index_is_immutable(self):
+        """Prueba para comprobar que el índice no se puede modificar"""
+        index = get_calendar_index(self.calendar)
+        with self.assertRaises(AttributeError):
+            index.closed_days = frozenset()
+
+    def test_misconfigured_calendar(self):
+        """Prueba para un calendario sin horarios de temporada"""
+        calendar = Calendar.objects.create(
+            normal_start_date=date(2022, 1, 1),
+            summer_start_date=date(2022, 6, 1),
+            winter_start_date=date(2022, 12, 1),
+        )
+        with self.assertRaises(exceptions.ValidationError):
+            get_calendar_index(calendar).get_schedule(date(2022, 1, 5))
+
 class AvailableHoursTests(TestCase):
     def setUp(self):
         """Configuración de las pruebas."""
@@ -86,6 +192,101 @@ class AvailableHoursTests(TestCase):
             "Las horas disponibles no coinciden"
         )
 
+class AvailabilityMaskTests(TestCase):
+    """Pruebas para las máscaras de franjas de media hora."""
+    def test_hours_to_mask(self):
+        """Prueba para convertir horas de apertura en máscara"""
+        mask = hours_to_mask([time(0, 0), time(0, 30), "23:30:00"])
+        self.assertEqual(mask, 1 | 1 << 1 | 1 << 47)
+
+    def test_reserve_to_mask(self):
+        """Prueba para la máscara de una reserva (el fin menos 5 minutos no ocupa la última franja)"""
+        mask = reserve_to_mask(datetime(2022, 1, 2, 10, 0), datetime(2022, 1, 2, 12, 0))
+        self.assertEqual(mask, hours_to_mask(["10:00:00", "10:30:00", "11:00:00", "11:30:00"]))
+
+    def test_reserve_to_mask_not_aligned(self):
+        """Prueba para una reserva que no empieza ni termina en una franja exacta"""
+        mask = reserve_to_mask(datetime(2022, 1, 2, 10, 10), datetime(2022, 1, 2, 11, 3))
+        self.assertEqual(mask, hours_to_mask(["10:30:00"]))
+
+    def test_get_free_hours(self):
+        """Prueba para las horas libres a partir de la máscara ocupada"""
+        opened_slots = hours_to_mask([time(10, 0), time(10, 30), time(11, 0)])
+        occupied_mask = hours_to_mask(["10:30:00"])
+        self.assertListEqual(get_free_hours(opened_slots, occupied_mask), ["10:00:00", "11:00:00"])
+
+    def test_mask_to_hours(self):
+        """Prueba para convertir una máscara en horas de apertura"""
+        hours = ["00:00:00", "09:30:00", "23:30:00"]
+        self.assertListEqual(mask_to_hours(hours_to_mask(hours)), hours)
+
+    def test_schedule_opened_slots(self):
+        """Prueba para comprobar que el horario guarda sus horas de apertura como máscara"""
+        calendar = Calendar.objects.create(
+            normal_start_date=date(2022, 1, 1),
+            summer_start_date=date(2022, 6, 1),
+            winter_start_date=date(2022, 12, 1),
+        )
+        schedule = Schedule.objects.create(calendar=calendar, opened_hours=["12:00:00", "12:30:00"])
+        self.assertEqual(Schedule.objects.get(pk=schedule.pk).opened_slots, 1 << 24 | 1 << 25)
+
+        schedule.opened_hours = [time(20, 0)]
+        schedule.save()
+        self.assertEqual(Schedule.objects.get(pk=schedule.pk).opened_slots, 1 << 40)
+
+    def test_get_occupied_hours(self):
+        """Prueba para las horas ocupadas por una reserva"""
+        opening_hours = [time(hour, minute) for hour in range(8, 23) for minute in (0, 30)]
+        reservation = Reserve(
+            start_reserve=datetime(2022, 1, 2, 13, 15),
+            finish_reserve=datetime(2022, 1, 2, 15, 40),
+        )
+        occupied_hours = get_occupied_hours([reservation], opening_hours)
+
+        self.assertSetEqual(occupied_hours, {"13:30:00", "14:00:00", "14:30:00", "15:00:00", "15:30:00"})
+
+class TableAssignmentTests(TestCase):
+    """Pruebas para la asignación automática de mesas."""
+    def table(self, pk, x, y, min_chairs, max_chairs):
+        """Crear una mesa en memoria."""
+        return Table(pk=pk, x_position=x, y_position=y, min_chairs=min_chairs, max_chairs=max_chairs)
+
+    def test_find_best_single_table(self):
+        """Prueba para elegir la mesa que menos sillas desperdicia"""
+        tables = [self.table(1, 1, 1, 2, 8), self.table(2, 3, 1, 2, 4), self.table(3, 5, 1, 4, 6)]
+        self.assertListEqual([table.pk for table in find_best_tables(tables, 3)], [2])
+        self.assertListEqual([table.pk for table in find_best_tables(tables, 6)], [3])
+
+    def test_find_best_adjacent_tables(self):
+        """Prueba para juntar mesas contiguas cuando ninguna basta"""
+        tables = [self.table(1, 1, 1, 1, 4), self.table(2, 2, 1, 1, 4), self.table(3, 4, 1, 1, 6)]
+        self.assertListEqual(sorted(table.pk for table in find_best_tables(tables, 8)), [1, 2])
+
+    def test_find_best_tables_not_adjacent(self):
+        """Prueba para comprobar que no se juntan mesas separadas"""
+        tables = [self.table(1, 1, 1, 1, 4), self.table(2, 3, 1, 1, 4)]
+        self.assertListEqual(find_best_tables(tables, 8), [])
+
+    def test_find_best_tables_respects_min_chairs(self):
+        """Prueba para no asignar una mesa cuyo mínimo de sillas supera a los comensales"""
+        tables = [self.table(1, 1, 1, 4, 6), self.table(2, 5, 1, 1, 8)]
+        self.assertListEqual([table.pk for table in find_best_tables(tables, 2)], [2])
+
+    def test_distribute_chairs(self):
+        """Prueba para repartir los comensales entre las mesas asignadas"""
+        tables = [self.table(1, 1, 1, 2, 4), self.table(2, 2, 1, 0, 4)]
+        self.assertListEqual(distribute_chairs(tables, 7), [4, 3])
+        self.assertListEqual(distribute_chairs(tables, 3), [2, 1])
+
+    def test_find_best_tables_large_restaurant(self):
+        """Prueba para asignar mesas en el restaurante de 200 mesas del benchmark (los tiempos, en benchmark_table_assignment)"""
+        tables = build_benchmark_tables(200, seed=0)
+        for party_size in range(1, 17):
+            best_tables = find_best_tables(tables, party_size)
+            self.assertTrue(best_tables)
+            self.assertGreaterEqual(sum(table.max_chairs for table in best_tables), party_size)
+            self.assertLessEqual(sum(max(1, table.min_chairs) for table in best_tables), party_size)
+
 class ValidateAddressTests(TestCase):
     def test_validate_address_valid(self):
         """Prueba para una dirección válida"""